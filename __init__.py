@@ -1,9 +1,14 @@
 from exputils.experimentgenerator import generate_experiment_files
 from exputils.statisticcalculator import calc_experiment_statistics
 from exputils.statisticcalculator import calc_statistics_over_repetitions
+from exputils.statisticcalculator import build_campaign_index
+from exputils.statisticcalculator import load_experiment_statistics
+from exputils.statisticcalculator import consolidate_statistics
+from exputils.statisticcalculator import load_statistics_store
 from exputils.experimentstarter import start_experiments
 from exputils.experimentstarter import start_slurm_experiments
 from exputils.experimentstarter import start_torque_experiments
 import exputils.misc
+import exputils.statisticaccumulator
 
 __version__ = '0.0.9'
\ No newline at end of file
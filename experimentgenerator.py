@@ -1,11 +1,38 @@
 import os
 import re
-import copy
+import collections
+import collections.abc
+import itertools
+import locale
+import random
 import shutil
-from exputils.odsreader import ODSReader
+import stat
+import threading
+import concurrent.futures
+import filecmp
+import hashlib
+import json
+import pickle
+from exputils.odsreader import StreamingODSReader
 from collections import OrderedDict
 
-def generate_experiment_files(ods_filepath, directory=None, extra_files=None, extra_experiment_files=None, verbose=False):
+# name of the file in each experiment folder that identifies its generated content for the incremental mode
+EXPERIMENT_MANIFEST_FILENAME = '.experiment_manifest.json'
+
+# version of the manifest format, changing it regenerates all experiments in incremental mode
+EXPERIMENT_MANIFEST_VERSION = 1
+
+# modes to put the source files into the experiment folders, see copy_experiment_files
+LINK_MODES = ['copy', 'hardlink', 'symlink', 'reflink']
+
+# ioctl request of linux to clone a file (reflink) on copy-on-write filesystems such as btrfs or xfs
+FICLONE = 0x40049409
+
+# version of the configuration parser, changing it invalidates all cached configurations
+CONFIGURATION_CACHE_VERSION = 2
+
+
+def generate_experiment_files(ods_filepath, directory=None, extra_files=None, extra_experiment_files=None, verbose=False, n_jobs=None, executor=None, incremental=False, link_mode='copy', use_config_cache=False, recalculate_config_cache=False):
     '''
     Generates experiment files and configurations based on entries in a ODS file (LibreOffice Spreadsheet).
 
@@ -17,6 +44,15 @@ def generate_experiment_files(ods_filepath, directory=None, extra_files=None, ex
     :param ods_filepath: Path to the ODS file.
     :param directory: Directory where the experiments are generated.
     :param extra_files: Files that are mentioned in the ODS file but should be added to each experiment folder.
+    :param n_jobs: Number of worker threads that generate the experiments in parallel (see generate_files_from_config).
+    :param executor: Optional concurrent.futures.Executor that generates the experiments in parallel.
+    :param incremental: If True, only experiments whose configuration, templates or source files changed are regenerated.
+    :param link_mode: How source files are put into the experiment folders: 'copy', 'hardlink', 'symlink' or 'reflink'
+                      (see copy_experiment_files). Templated files are always written per folder.
+    :param use_config_cache: If True, the parsed configuration is cached in a file next to the ODS file and reused as
+                             long as the content of the ODS file does not change.
+    :param recalculate_config_cache: If True, the ODS file is parsed again and the cache is replaced.
+    :return: Dictionary with the added, changed and unchanged experiments (see generate_files_from_config).
     '''
 
     if directory is None:
@@ -28,31 +64,87 @@ def generate_experiment_files(ods_filepath, directory=None, extra_files=None, ex
     if verbose:
         print('Load config from {!r} ...'.format(ods_filepath))
 
-    config_data = load_configuration_data_from_ods(ods_filepath)
+    config_data = load_configuration_data_from_ods(ods_filepath, use_cache=use_config_cache, recalculate_cache=recalculate_config_cache)
 
     # generate experiment files based on the loaded configurations
     if verbose:
-        print('Generate experiments ...'.format(ods_filepath))
+        print('Generate experiments in {!r} ...'.format(directory))
+
+    return generate_files_from_config(config_data, directory, extra_files=extra_files, extra_experiment_files=extra_experiment_files, verbose=verbose, n_jobs=n_jobs, executor=executor, incremental=incremental, link_mode=link_mode)
+
+
+def load_configuration_data_from_ods(ods_filepath, use_cache=False, recalculate_cache=False, is_write_cache=True):
+    '''
+    Loads the configuration of the experiments from an ODS file.
+
+    :param ods_filepath: Path to the ODS file.
+    :param use_cache: If True, the parsed configuration is stored in a cache file next to the ODS file
+                      (see get_configuration_cache_filepath). The cache is used as long as the content of the ODS
+                      file and the parser version (CONFIGURATION_CACHE_VERSION) do not change.
+    :param recalculate_cache: If True, the ODS file is parsed again even if a valid cache exists and the cache is replaced.
+    :param is_write_cache: If False, an existing valid cache is used, but no cache file is written.
+    :return: Configuration data (see generate_files_from_config).
+    '''
+
+    if not use_cache:
+        return read_configuration_data_from_ods(ods_filepath)
+
+    with open(ods_filepath, 'rb') as file:
+        ods_hash = hashlib.sha1(file.read()).hexdigest()
+
+    cache_filepath = get_configuration_cache_filepath(ods_filepath)
+
+    if not recalculate_cache and os.path.isfile(cache_filepath):
+        try:
+            with open(cache_filepath, 'rb') as file:
+                cache = pickle.load(file)
+
+            if cache['version'] == CONFIGURATION_CACHE_VERSION and cache['ods_hash'] == ods_hash:
+                return cache['config_data']
+
+        except Exception:
+            # a broken or incompatible cache is replaced
+            pass
+
+    config_data = read_configuration_data_from_ods(ods_filepath)
+
+    if not is_write_cache:
+        return config_data
+
+    cache = dict(version=CONFIGURATION_CACHE_VERSION, ods_hash=ods_hash, config_data=config_data)
+
+    try:
+        with open(cache_filepath + '.tmp', 'wb') as file:
+            pickle.dump(cache, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(cache_filepath + '.tmp', cache_filepath)
+    except OSError:
+        # the cache is optional, e.g. if the folder of the ODS file is not writable
+        pass
+
+    return config_data
 
-    generate_files_from_config(config_data, directory, extra_files=extra_files, extra_experiment_files=extra_experiment_files, verbose=verbose)
 
+def get_configuration_cache_filepath(ods_filepath):
+    '''Returns the path of the cache file of the configuration, e.g. 'campaign/.experiment_configurations.ods.cache'.'''
+    return os.path.join(os.path.dirname(ods_filepath), '.{}.cache'.format(os.path.basename(ods_filepath)))
 
-def load_configuration_data_from_ods(ods_filepath):
+
+def read_configuration_data_from_ods(ods_filepath):
     '''
+    Parses the configuration of the experiments from an ODS file.
 
-    :param ods_filepath:
-    :return:
+    :param ods_filepath: Path to the ODS file.
+    :return: Configuration data (see generate_files_from_config).
     '''
 
     config_data = []
 
-    doc = ODSReader(ods_filepath, clonespannedcolumns=False)
+    doc = StreamingODSReader(ods_filepath, clonespannedcolumns=False)
     for sheet_name, sheet_data in doc.sheets.items():
 
         experiments_data = dict()
 
         experiments_data['directory'] = sheet_name
-        experiments_data['experiments'] = OrderedDict()
 
         file_config = []
 
@@ -163,6 +255,10 @@ def load_configuration_data_from_ods(ods_filepath):
         #######################################################
         # remaining rows: experiments
 
+        # the template metadata is shared by all experiments of the sheet, each experiment only stores its values
+        experiments_data['experiments'] = ExperimentConfigurationTable(
+            [(file_config[file_idx]['template_file_path'], file_config[file_idx]['file_name_template'], variable_names[file_idx]) for file_idx in range(len(file_config))])
+
         for row_idx in range(4, len(sheet_data)):
 
             experiment_id = sheet_data[row_idx][0]
@@ -170,41 +266,282 @@ def load_configuration_data_from_ods(ods_filepath):
             if experiment_id is not None:
                 experiment_id = int(experiment_id)
 
-                experiments_data['experiments'][experiment_id] = dict()
-
-                experiments_data['experiments'][experiment_id]['files'] = copy.deepcopy(file_config)
-
                 # repetitions info if it exists
                 if repetitions_info_col_idx is not None and sheet_data[row_idx][repetitions_info_col_idx] is not None:
-                    experiments_data['experiments'][experiment_id]['repetitions'] = int(sheet_data[row_idx][repetitions_info_col_idx])
+                    repetitions = int(sheet_data[row_idx][repetitions_info_col_idx])
                 else:
-                    experiments_data['experiments'][experiment_id]['repetitions'] = None
+                    repetitions = None
 
                 if repetition_source_file_locations_col_idx is not None and sheet_data[row_idx][repetition_source_file_locations_col_idx] is not None:
-                    experiments_data['experiments'][experiment_id]['repetition_source_file_locations'] = [i.strip() for i in sheet_data[row_idx][repetition_source_file_locations_col_idx].split(',')]
+                    repetition_source_file_locations = [i.strip() for i in sheet_data[row_idx][repetition_source_file_locations_col_idx].split(',')]
                 else:
-                    experiments_data['experiments'][experiment_id]['repetition_source_file_locations'] = None
+                    repetition_source_file_locations = None
 
                 if experiment_source_file_locations_col_idx is not None and sheet_data[row_idx][experiment_source_file_locations_col_idx] is not None:
-                    experiments_data['experiments'][experiment_id]['experiment_source_file_locations'] = [i.strip() for i in sheet_data[row_idx][experiment_source_file_locations_col_idx].split(',')]
+                    experiment_source_file_locations = [i.strip() for i in sheet_data[row_idx][experiment_source_file_locations_col_idx].split(',')]
                 else:
-                    experiments_data['experiments'][experiment_id]['experiment_source_file_locations'] = None
+                    experiment_source_file_locations = None
 
+                values = []
                 for file_idx in range(len(file_config)):
-
                     col_idx = file_borders[file_idx][0]
+                    for _ in variable_names[file_idx]:
+                        values.append(get_cell_data(sheet_data[row_idx][col_idx]))
+                        col_idx += 1
 
-                    experiments_data['experiments'][experiment_id]['files'][file_idx]['variables'] = dict()
+                experiments_data['experiments'].add(experiment_id, repetitions, repetition_source_file_locations, experiment_source_file_locations, values)
 
-                    for variable_name in variable_names[file_idx]:
+        config_data.append(experiments_data)
 
-                        experiments_data['experiments'][experiment_id]['files'][file_idx]['variables'][variable_name] = get_cell_data(sheet_data[row_idx][col_idx])
+    return config_data
 
-                        col_idx +=1
 
-        config_data.append(experiments_data)
+class ExperimentConfigurationTable(collections.abc.Mapping):
+    '''
+    Configurations of the experiments of a sheet, i.e. a dictionary with key=experiment id, value=configuration.
+
+    The template files and variable names are stored once for all experiments and each experiment only stores its
+    row of values. The configurations are ExperimentConfiguration views on the rows, which have the same form as the
+    configuration dictionaries described in generate_files_from_config.
+
+    :param files: List with a (template file path, file name template, variable names) tuple for each template file.
+    '''
+
+    def __init__(self, files):
+
+        self.files = []
+        start_idx = 0
+        for template_file_path, file_name_template, variable_names in files:
+            self.files.append(TemplateFileDefinition(template_file_path, file_name_template, variable_names, start_idx))
+            start_idx += len(variable_names)
+
+        # dictionary with key=experiment id, value=(repetitions, repetition sources, experiment sources, values)
+        self.rows = OrderedDict()
+
+    def add(self, experiment_id, repetitions, repetition_source_file_locations, experiment_source_file_locations, values):
+        '''
+        Adds an experiment.
+
+        :param values: Values of the variables of all template files, in the order of the files and their variable names.
+        '''
+
+        if repetition_source_file_locations is not None:
+            repetition_source_file_locations = tuple(repetition_source_file_locations)
+
+        if experiment_source_file_locations is not None:
+            experiment_source_file_locations = tuple(experiment_source_file_locations)
+
+        self.rows[experiment_id] = (repetitions, repetition_source_file_locations, experiment_source_file_locations, tuple(values))
+
+    def __getitem__(self, experiment_id):
+        return ExperimentConfiguration(self.files, self.rows[experiment_id])
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
 
-    return config_data
+
+class TemplateFileDefinition:
+    '''Template file and variable names of a sheet, shared by all experiments.'''
+
+    def __init__(self, template_file_path, file_name_template, variable_names, start_idx=0):
+        self.template_file_path = template_file_path
+        self.file_name_template = file_name_template
+        self.variable_names = list(variable_names)
+
+        # position of the first variable of the file in the row values of the experiments
+        self.start_idx = start_idx
+
+        # dictionary with key=variable name, value=index in the variables of the file
+        # if a name is used twice then the later value overrides the earlier, as for a dictionary
+        self.variable_indexes = dict()
+        for variable_idx, variable_name in enumerate(self.variable_names):
+            self.variable_indexes[variable_name] = variable_idx
+
+
+class ExperimentConfiguration(collections.abc.Mapping):
+    '''Read-only dictionary view on the row of an experiment in an ExperimentConfigurationTable.'''
+
+    keys_of_configuration = ('files', 'repetitions', 'repetition_source_file_locations', 'experiment_source_file_locations')
+
+    def __init__(self, files, row):
+        self.files = files
+        self.row = row
+
+    def __getitem__(self, key):
+
+        if key == 'files':
+            return [TemplateFileConfiguration(file, self.row[3][file.start_idx:file.start_idx + len(file.variable_names)]) for file in self.files]
+
+        elif key == 'repetitions':
+            return self.row[0]
+
+        elif key == 'repetition_source_file_locations':
+            return None if self.row[1] is None else list(self.row[1])
+
+        elif key == 'experiment_source_file_locations':
+            return None if self.row[2] is None else list(self.row[2])
+
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.keys_of_configuration)
+
+    def __len__(self):
+        return len(self.keys_of_configuration)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class TemplateFileConfiguration(collections.abc.Mapping):
+    '''Read-only dictionary view on the configuration of a template file of an experiment.'''
+
+    keys_of_configuration = ('template_file_path', 'file_name_template', 'variables')
+
+    def __init__(self, file, values):
+        self.file = file
+        self.values = values
+
+    def __getitem__(self, key):
+
+        if key == 'template_file_path':
+            return self.file.template_file_path
+
+        elif key == 'file_name_template':
+            return self.file.file_name_template
+
+        elif key == 'variables':
+            return TemplateFileVariables(self.file.variable_indexes, self.values)
+
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.keys_of_configuration)
+
+    def __len__(self):
+        return len(self.keys_of_configuration)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class TemplateFileVariables(collections.abc.Mapping):
+    '''Read-only dictionary view with key=variable name, value=variable value.'''
+
+    def __init__(self, variable_indexes, values):
+        self.variable_indexes = variable_indexes
+        self.values = values
+
+    def __getitem__(self, variable_name):
+        return self.values[self.variable_indexes[variable_name]]
+
+    def __iter__(self):
+        return iter(self.variable_indexes)
+
+    def __len__(self):
+        return len(self.variable_indexes)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class ExperimentSweep:
+    '''
+    Configurations of experiments that are generated lazily from a sweep specification instead of a spreadsheet.
+
+    Can be used as the 'experiments' of an experiment group for generate_files_from_config:
+
+        sweep = ExperimentSweep(grid_sweep(learning_rate=[0.1, 0.01], seed=[1, 2, 3]),
+                                files=[('run_experiment.py', 'run_experiment.py')],
+                                repetitions=5,
+                                repetition_source_file_locations=['code/rep_v01'])
+        generate_files_from_config([dict(directory='', experiments=sweep)], 'experiments')
+
+    :param sweep: Iterable of dictionaries with key=variable name, value=variable value, one per experiment. For example
+                  the result of grid_sweep, zip_sweep, random_sweep or a generator. The values are converted to strings.
+                  Generators can only be iterated once.
+    :param files: List with a (template file path, file name template) tuple for each template file.
+                  All template files get the variables of the experiment.
+    :param repetitions: Number of repetitions of each experiment or None.
+    :param repetition_source_file_locations: List of source files and directories for the repetitions or None.
+    :param experiment_source_file_locations: List of source files and directories for the experiments or None.
+    :param constants: Dictionary with variables that are the same for all experiments.
+    :param start_id: Id of the first experiment. The following experiments are numbered consecutively.
+    '''
+
+    def __init__(self, sweep, files, repetitions=None, repetition_source_file_locations=None, experiment_source_file_locations=None, constants=None, start_id=1):
+        self.sweep = sweep
+        self.files = files
+        self.repetitions = repetitions
+        # lists, because they are combined with the extra files by concatenation, e.g. also for given tuples
+        self.repetition_source_file_locations = list(repetition_source_file_locations) if repetition_source_file_locations is not None else None
+        self.experiment_source_file_locations = list(experiment_source_file_locations) if experiment_source_file_locations is not None else None
+        self.constants = constants if constants is not None else dict()
+        self.start_id = start_id
+
+    def items(self):
+        '''Generates (experiment id, experiment configuration) tuples.'''
+
+        for experiment_id, parameters in enumerate(self.sweep, start=self.start_id):
+
+            variables = OrderedDict()
+            for variable_name, variable_value in itertools.chain(self.constants.items(), parameters.items()):
+                variables[variable_name] = str(variable_value)
+
+            experiment_config = dict()
+            experiment_config['files'] = [dict(template_file_path=template_file_path, file_name_template=file_name_template, variables=variables)
+                                          for template_file_path, file_name_template in self.files]
+            experiment_config['repetitions'] = self.repetitions
+            experiment_config['repetition_source_file_locations'] = self.repetition_source_file_locations
+            experiment_config['experiment_source_file_locations'] = self.experiment_source_file_locations
+
+            yield experiment_id, experiment_config
+
+
+def grid_sweep(**parameters):
+    '''
+    Generates the cartesian product of the parameter values.
+
+    Example: grid_sweep(a=[1, 2], b=['x', 'y']) generates {a:1, b:'x'}, {a:1, b:'y'}, {a:2, b:'x'}, {a:2, b:'y'}
+    '''
+
+    names = list(parameters.keys())
+    for values in itertools.product(*parameters.values()):
+        yield OrderedDict(zip(names, values))
+
+
+def zip_sweep(**parameters):
+    '''
+    Generates the parameter values position by position. Stops at the shortest list of values.
+
+    Example: zip_sweep(a=[1, 2], b=['x', 'y']) generates {a:1, b:'x'}, {a:2, b:'y'}
+    '''
+
+    names = list(parameters.keys())
+    for values in zip(*parameters.values()):
+        yield OrderedDict(zip(names, values))
+
+
+def random_sweep(n_samples, seed=None, **parameters):
+    '''
+    Generates randomly sampled parameter values.
+
+    :param n_samples: Number of generated experiments.
+    :param seed: Seed of the random generator, so that the same sweep can be generated again.
+    :param parameters: Values for each parameter. Either a sequence from which a value is chosen or a function that
+                       gets a random.Random and returns a value, e.g. lambda rng: rng.uniform(0.0, 1.0).
+    '''
+
+    rng = random.Random(seed)
+
+    for _ in range(n_samples):
+        sample = OrderedDict()
+        for name, values in parameters.items():
+            sample[name] = values(rng) if callable(values) else rng.choice(values)
+        yield sample
 
 
 def get_cell_data(data):
@@ -219,13 +556,15 @@ def get_cell_data(data):
     return data
 
 
-def generate_files_from_config(config_data, directory='.', extra_files=None, extra_experiment_files=None, verbose=False):
+def generate_files_from_config(config_data, directory='.', extra_files=None, extra_experiment_files=None, verbose=False, n_jobs=None, executor=None, incremental=False, link_mode='copy'):
     '''
 
     Format of configuration data:
 
     config_data['directory']
     config_data['experiments']: dictionary with keys=experiment id, values=description:
+                                Any object with an items() method can be used, e.g. an ExperimentSweep that generates
+                                the experiments lazily.
 
 
     config_data['ids']: Ids of the experiments
@@ -235,7 +574,21 @@ def generate_files_from_config(config_data, directory='.', extra_files=None, ext
         template_file['variables']: Dictionary with key=variable name, value=variable value
 
     :param config_data:
-    :return:
+    :param n_jobs: Number of worker threads that generate experiments in parallel. None or 1 generates them serially,
+                   -1 uses one thread per CPU.
+    :param executor: Optional concurrent.futures.Executor (for example a ProcessPoolExecutor) that is used instead of
+                     the thread pool defined by n_jobs.
+                     If experiments are generated in parallel, errors are collected and raised together as an
+                     ExperimentGenerationError after all experiments were processed.
+    :param incremental: If True, a manifest with the hashes of the configuration, templates and source files is
+                        stored in each experiment folder. Experiments with an unchanged manifest are skipped and in
+                        changed experiments only files with a different content are rewritten.
+    :param link_mode: How source files are put into the experiment folders: 'copy', 'hardlink', 'symlink' or 'reflink'.
+                      Linked files share one physical copy of the sources, so they must not be changed afterwards.
+                      Modes that are not supported for a file fall back to a copy.
+    :return: Dictionary with the keys 'added', 'changed' and 'unchanged' that lists the (group directory, experiment id)
+             of the experiments. Without incremental mode, existing experiments are always regenerated and reported as
+             changed.
     '''
 
     if extra_files is None:
@@ -248,95 +601,295 @@ def generate_files_from_config(config_data, directory='.', extra_files=None, ext
     elif not isinstance(extra_experiment_files, list):
         extra_experiment_files = [extra_experiment_files]
 
-    for experiment_group_config in config_data:
+    if link_mode not in LINK_MODES:
+        raise ValueError('Unknown link mode {!r}!'.format(link_mode))
+
+    # each template and source file is resolved, read and parsed only once for all experiments and repetitions
+    source_cache = SourceFileCache()
+
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+
+    own_executor = None
+    if executor is None and n_jobs is not None and n_jobs > 1:
+        own_executor = concurrent.futures.ThreadPoolExecutor(max_workers=n_jobs)
+        executor = own_executor
 
-        # only create group folder if more than one sheet or the sheet name is not empty or 'Sheet1'
-        if len(config_data) == 1 and experiment_group_config['directory'] in ['Sheet1', '']:
-            group_directory = directory
+    # queue with ((group directory, experiment id), future) in the order of the configuration
+    # the number of pending experiments is bounded, so that lazily generated configurations are not all held in memory
+    futures = collections.deque()
+    max_pending_futures = 4 * (n_jobs or os.cpu_count() or 1)
+
+    report = OrderedDict([('added', []), ('changed', []), ('unchanged', [])])
+    errors = OrderedDict()
+
+    def collect_result(key, future):
+        error = future.exception()
+        if error is not None:
+            errors[key] = error
         else:
-            group_directory = os.path.join(directory, experiment_group_config['directory'])
+            report[future.result()].append(key)
 
-        # create the folder if not exists
-        if not os.path.isdir(group_directory):
-            os.makedirs(group_directory)
+    try:
+        for experiment_group_config in config_data:
 
-        # generate the experiment folders and files
-        for experiment_id, experiment_config in experiment_group_config['experiments'].items():
+            group_directory = get_group_directory(directory, experiment_group_config, len(config_data))
 
-            experiment_directory = os.path.join(group_directory, 'experiment_{:06d}'.format(experiment_id))
+            # create the folder if not exists
+            if not os.path.isdir(group_directory):
+                os.makedirs(group_directory)
 
-            # create folders for the repetitions if necessary:
-            if experiment_config['repetitions'] is None:
-                num_of_repetitions = 1
-            else:
-                num_of_repetitions = experiment_config['repetitions']
+            # generate the experiment folders and files
+            for experiment_id, experiment_config in experiment_group_config['experiments'].items():
 
-            for repetition_id in range(num_of_repetitions):
+                experiment_directory = get_experiment_directory(group_directory, experiment_id)
 
-                # only create repetition folders if repetitions are specified
-                if experiment_config['repetitions'] is None:
-                    experiment_files_directory = experiment_directory
+                if executor is None:
+                    status = generate_experiment(experiment_directory, experiment_config, experiment_id, extra_files, extra_experiment_files,
+                                                 source_cache=source_cache, incremental=incremental, link_mode=link_mode)
+                    report[status].append((group_directory, experiment_id))
                 else:
-                    experiment_files_directory = os.path.join(experiment_directory, 'repetition_{:06d}'.format(repetition_id))
+                    future = executor.submit(generate_experiment, experiment_directory, experiment_config, experiment_id, extra_files, extra_experiment_files,
+                                             source_cache=source_cache, incremental=incremental, link_mode=link_mode)
+                    futures.append(((group_directory, experiment_id), future))
 
-                # create folder if not exists
-                if not os.path.isdir(experiment_files_directory):
-                    os.makedirs(experiment_files_directory)
+                    while len(futures) > max_pending_futures:
+                        collect_result(*futures.popleft())
 
-                # generate the files for the experiment, or the repetition if they are defined
-                if experiment_config['repetition_source_file_locations'] is None:
-                    source_files = extra_files
-                else:
-                    source_files = experiment_config['repetition_source_file_locations'] + extra_files
+        # collect the results and errors of all remaining experiments
+        while futures:
+            collect_result(*futures.popleft())
 
-                generate_source_files(source_files, experiment_files_directory, experiment_config, experiment_id, repetition_id)
+    finally:
+        if own_executor is not None:
+            own_executor.shutdown()
 
-            # if there are experiment - repetitions defined, then generate the files for the experiment folder
-            if experiment_config['experiment_source_file_locations'] is None:
-                source_files = extra_experiment_files
-            else:
-                source_files = experiment_config['experiment_source_file_locations'] + extra_experiment_files
+    if errors:
+        raise ExperimentGenerationError(errors)
+
+    if verbose:
+        print('Experiments: {} added, {} changed, {} unchanged'.format(len(report['added']), len(report['changed']), len(report['unchanged'])))
+
+    return report
+
+
+def get_group_directory(directory, experiment_group_config, n_groups):
+    '''Returns the folder of an experiment group.'''
+
+    # only create group folder if more than one sheet or the sheet name is not empty or 'Sheet1'
+    if n_groups == 1 and experiment_group_config['directory'] in ['Sheet1', '']:
+        return directory
+    else:
+        return os.path.join(directory, experiment_group_config['directory'])
+
+
+def get_experiment_directory(group_directory, experiment_id):
+    '''Returns the folder of an experiment.'''
+    return os.path.join(group_directory, 'experiment_{:06d}'.format(experiment_id))
+
+
+def get_repetition_directories(experiment_directory, experiment_config):
+    '''
+    Returns a list with (repetition id, folder) for the repetitions of an experiment.
+    Without repetitions, the files are generated in the experiment folder under repetition id 0.
+    '''
+
+    if experiment_config['repetitions'] is None:
+        return [(0, experiment_directory)]
+    else:
+        return [(repetition_id, os.path.join(experiment_directory, 'repetition_{:06d}'.format(repetition_id)))
+                for repetition_id in range(experiment_config['repetitions'])]
+
+
+class ExperimentGenerationError(Exception):
+    '''
+    Error of a parallel experiment generation.
+
+    Its errors attribute is a dictionary with key=(group directory, experiment id), value=exception of the experiment.
+    '''
+
+    def __init__(self, errors):
+        self.errors = errors
+
+        lines = ['Generation failed for {} experiment(s):'.format(len(errors))]
+        for (group_directory, experiment_id), error in errors.items():
+            lines.append('\t- experiment {} in {!r}: {!r}'.format(experiment_id, group_directory, error))
+
+        super().__init__('\n'.join(lines))
+
+
+def generate_experiment(experiment_directory, experiment_config, experiment_id, extra_files, extra_experiment_files, source_cache=None, incremental=False, link_mode='copy'):
+    '''
+    Generates the folders and files of a single experiment and its repetitions.
+
+    :return: 'added' if the experiment folder did not exist, 'unchanged' if it was skipped in incremental mode,
+             otherwise 'changed'.
+    '''
+
+    if source_cache is None:
+        source_cache = SourceFileCache()
+
+    manifest = None
+    if incremental:
+        manifest = calc_experiment_manifest(experiment_config, experiment_id, extra_files, extra_experiment_files, source_cache=source_cache)
+        manifest['link_mode'] = link_mode
+
+        if manifest == load_experiment_manifest(experiment_directory):
+            return 'unchanged'
+
+    status = 'changed' if os.path.isdir(experiment_directory) else 'added'
+
+    repetition_source_files, experiment_source_files = get_experiment_source_files(experiment_config, extra_files, extra_experiment_files)
+
+    # create folders for the repetitions if necessary:
+    for repetition_id, experiment_files_directory in get_repetition_directories(experiment_directory, experiment_config):
+
+        # create folder if not exists
+        if not os.path.isdir(experiment_files_directory):
+            os.makedirs(experiment_files_directory)
+
+        # generate the files for the experiment, or the repetition if they are defined
+        generate_source_files(repetition_source_files, experiment_files_directory, experiment_config, experiment_id, repetition_id, source_cache=source_cache, incremental=incremental, link_mode=link_mode)
+
+    # if there are experiment - repetitions defined, then generate the files for the experiment folder
+    if experiment_source_files:
+        generate_source_files(experiment_source_files, experiment_directory, experiment_config, experiment_id, source_cache=source_cache, incremental=incremental, link_mode=link_mode)
+
+    if manifest is not None:
+        save_experiment_manifest(experiment_directory, manifest)
+
+    return status
+
+
+def get_experiment_source_files(experiment_config, extra_files, extra_experiment_files):
+    '''
+    Returns the source files of the repetitions (or the experiment if it has no repetitions) and of the experiment folder.
+    '''
+
+    if experiment_config['repetition_source_file_locations'] is None:
+        repetition_source_files = extra_files
+    else:
+        repetition_source_files = list(experiment_config['repetition_source_file_locations']) + list(extra_files)
+
+    if experiment_config['experiment_source_file_locations'] is None:
+        experiment_source_files = extra_experiment_files
+    else:
+        experiment_source_files = list(experiment_config['experiment_source_file_locations']) + list(extra_experiment_files)
+
+    return repetition_source_files, experiment_source_files
+
+
+def calc_experiment_manifest(experiment_config, experiment_id, extra_files, extra_experiment_files, source_cache=None):
+    '''
+    Calculates the manifest of an experiment which identifies its generated content.
+
+    The manifest holds the hash of the configuration (variables, repetitions, source locations) and the hashes of all
+    used template and source files.
+    '''
+
+    if source_cache is None:
+        source_cache = SourceFileCache()
+
+    repetition_source_files, experiment_source_files = get_experiment_source_files(experiment_config, extra_files, extra_experiment_files)
+
+    config = json.dumps([experiment_id,
+                         experiment_config['repetitions'],
+                         [[file_config['template_file_path'], file_config['file_name_template'], list(file_config['variables'].items())] for file_config in experiment_config['files']],
+                         repetition_source_files,
+                         experiment_source_files])
+
+    templates = dict()
+    for source_files in [repetition_source_files, experiment_source_files]:
+        for file_config in experiment_config['files']:
+            template_file_path = source_cache.resolve_template_file_path(file_config['template_file_path'], source_files)
+            if template_file_path is not None:
+                templates[template_file_path] = source_cache.get_template(template_file_path).content_hash
+
+    sources = dict()
+    for src in repetition_source_files + experiment_source_files:
+        sources.update(calc_source_file_hashes(src, source_cache))
+
+    return dict(version=EXPERIMENT_MANIFEST_VERSION,
+                config=hashlib.sha1(config.encode('utf-8')).hexdigest(),
+                templates=templates,
+                sources=sources)
+
+
+def calc_source_file_hashes(src, source_cache):
+    '''Returns a dictionary with key=file path, value=hash of the content for the source file or all files in the source directory.'''
+
+    hashes = dict()
+
+    if source_cache.isdir(src):
+        for item in source_cache.listdir(src):
+            hashes.update(calc_source_file_hashes(os.path.join(src, item), source_cache))
+    else:
+        hashes[src] = source_cache.get_hash(src)
+
+    return hashes
+
+
+def load_experiment_manifest(experiment_directory):
+    '''Loads the manifest of an experiment folder. Returns None if it does not exist or can not be read.'''
+
+    manifest_path = os.path.join(experiment_directory, EXPERIMENT_MANIFEST_FILENAME)
+
+    if not os.path.isfile(manifest_path):
+        return None
+
+    try:
+        with open(manifest_path, 'r') as file:
+            return json.load(file)
+    except ValueError:
+        return None
+
+
+def save_experiment_manifest(experiment_directory, manifest):
+    '''Saves the manifest of an experiment folder. The file is replaced atomically to never leave a partial manifest.'''
+
+    manifest_path = os.path.join(experiment_directory, EXPERIMENT_MANIFEST_FILENAME)
+
+    with open(manifest_path + '.tmp', 'w') as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
 
-            if source_files:
-                generate_source_files(source_files, experiment_directory, experiment_config, experiment_id)
+    os.replace(manifest_path + '.tmp', manifest_path)
 
 
-def generate_source_files(source_files, experiment_files_directory, experiment_config, experiment_id, repetition_id=None):
+def generate_source_files(source_files, experiment_files_directory, experiment_config, experiment_id, repetition_id=None, source_cache=None, incremental=False, link_mode='copy'):
+    '''
+    Generates the templated files of an experiment (or repetition) and copies its other source files.
+
+    :param source_cache: Optional SourceFileCache. Share it between calls so that each template and source file is
+                         only resolved, read and parsed once.
+    :param incremental: If True, existing files are only rewritten if their content changed.
+    :param link_mode: How the other source files are put into the folder (see copy_experiment_files).
+    '''
+
+    if source_cache is None:
+        source_cache = SourceFileCache()
 
     # create the source files that are given by templates
     for file_config in experiment_config['files']:
 
-        # check if the given file exists, otherwise it might be in one of the given directories under the source-files property of the experiment
-        template_file_path = None
-        if os.path.isfile(file_config['template_file_path']):
-            template_file_path = file_config['template_file_path']
-        else:
-            for src in source_files:
-                if os.path.isdir(src):
-                    if os.path.isfile(os.path.join(src, file_config['template_file_path'])):
-                        template_file_path = os.path.join(src, file_config['template_file_path'])
-                        break
+        template_file_path = source_cache.resolve_template_file_path(file_config['template_file_path'], source_files)
 
         if template_file_path is not None:
 
-            # Read in the template file
-            with open(template_file_path, 'r') as file:
-                file_content = file.read()
-
             # Replace the variables
-            file_content = file_content.replace('<experiment_id>', str(experiment_id))
-
-            if repetition_id is not None:
-                file_content = file_content.replace('<repetition_id>', str(repetition_id))
-
-            for variable_name, variable_value in file_config['variables'].items():
-                file_content = re.sub('<{}>'.format(variable_name),
-                                      variable_value,
-                                      file_content,
-                                      flags=re.IGNORECASE)
+            file_content = source_cache.get_template(template_file_path).render(file_config['variables'], experiment_id, repetition_id)
 
             # Write the final output file
             file_path = os.path.join(experiment_files_directory, file_config['file_name_template'].format(experiment_id))
+
+            if incremental and os.path.isfile(file_path):
+                with open(file_path, 'r') as file:
+                    if file.read() == file_content:
+                        continue
+
+            # never write through a link into the shared source file
+            if os.path.islink(file_path) or (os.path.isfile(file_path) and os.stat(file_path).st_nlink > 1):
+                os.remove(file_path)
+
             with open(file_path, 'w') as file:
                 file.write(file_content)
 
@@ -344,39 +897,573 @@ def generate_source_files(source_files, experiment_files_directory, experiment_c
     template_files = [file_config['template_file_path'] for file_config in experiment_config['files']]
 
     for src in source_files:
-        copy_experiment_files(src, experiment_files_directory, template_files)
+        copy_experiment_files(src, experiment_files_directory, template_files, incremental=incremental, link_mode=link_mode, source_cache=source_cache)
+
+
+def resolve_template_file_path(template_file_path, source_files, source_cache=None):
+    '''
+    Returns the path of a template file. If the given path does not exist, then the template might be in one of the
+    given source directories. Returns None if the template can not be found.
+    '''
+
+    if source_cache is None:
+        source_cache = SourceFileCache()
+
+    return source_cache.resolve_template_file_path(template_file_path, source_files)
+
+
+class SourceFileCache:
+    '''
+    Cache of the template and source files for one generation run.
+
+    File system lookups (stat, directory listings), the resolution of template files, the parsed templates, the
+    content of small source files and their hashes are only done once per path and reused by all experiments and
+    repetitions. This avoids repeated stat calls on network file systems. Source files must not change during a run.
+    The contents in memory are limited to max_contents_size bytes, the least recently used contents are removed first.
+    '''
+
+    # source files up to this size (bytes) are held in memory to copy them without reading them again
+    max_content_size = 1024 * 1024
+
+    # maximum size (bytes) of all contents that are held in memory
+    max_contents_size = 64 * 1024 * 1024
+
+    def __init__(self):
+
+        # dictionary with key=path, value='file', 'directory' or None if it does not exist
+        self.kinds = dict()
+
+        # dictionary with key=path, value=os.stat_result
+        self.stats = dict()
+
+        # dictionary with key=directory, value=list of item names
+        self.listings = dict()
+
+        # dictionary with key=(template file path, tuple of source files), value=resolved path or None
+        self.template_file_paths = dict()
+
+        # dictionary with key=template file path, value=CompiledTemplate
+        self.templates = dict()
+
+        # dictionary with key=file path, value=content, in the order of their last use
+        # the lock guards the order and the size, because the experiments can be generated by several threads
+        self.contents = OrderedDict()
+        self.n_content_bytes = 0
+        self.contents_lock = threading.Lock()
+
+        # dictionary with key=file path, value=hash of the content or None if the file does not exist
+        self.hashes = dict()
+
+    def __getstate__(self):
+        # the lock can not be copied to other processes, they get their own
+        state = self.__dict__.copy()
+        del state['contents_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.contents_lock = threading.Lock()
+
+    def get_kind(self, path):
+        if path not in self.kinds:
+            if os.path.isdir(path):
+                self.kinds[path] = 'directory'
+            elif os.path.isfile(path):
+                self.kinds[path] = 'file'
+            else:
+                self.kinds[path] = None
+        return self.kinds[path]
+
+    def isdir(self, path):
+        return self.get_kind(path) == 'directory'
+
+    def isfile(self, path):
+        return self.get_kind(path) == 'file'
+
+    def stat(self, path):
+        if path not in self.stats:
+            self.stats[path] = os.stat(path)
+        return self.stats[path]
+
+    def listdir(self, directory):
+        '''Lists a directory. The kinds of its items are known afterwards without extra stat calls.'''
+
+        if directory not in self.listings:
+            items = []
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    items.append(entry.name)
+                    if entry.is_dir():
+                        self.kinds[entry.path] = 'directory'
+                    elif entry.is_file():
+                        self.kinds[entry.path] = 'file'
+            self.listings[directory] = items
+
+        return self.listings[directory]
+
+    def resolve_template_file_path(self, template_file_path, source_files):
+        '''See resolve_template_file_path.'''
+
+        key = (template_file_path, tuple(source_files))
+
+        if key not in self.template_file_paths:
+
+            resolved_file_path = None
+            if self.isfile(template_file_path):
+                resolved_file_path = template_file_path
+            else:
+                for src in source_files:
+                    if self.isdir(src):
+                        if self.isfile(os.path.join(src, template_file_path)):
+                            resolved_file_path = os.path.join(src, template_file_path)
+                            break
+
+            self.template_file_paths[key] = resolved_file_path
+
+        return self.template_file_paths[key]
+
+    def get_template(self, template_file_path):
+        '''Returns the CompiledTemplate of a template file.'''
+
+        if template_file_path not in self.templates:
+            with open(template_file_path, 'r') as file:
+                self.templates[template_file_path] = CompiledTemplate(file.read())
+
+        return self.templates[template_file_path]
+
+    def get_content(self, file_path):
+        '''Returns the content of a source file, or None if it is larger than max_content_size or max_contents_size.'''
+
+        size = self.stat(file_path).st_size
+        if size > self.max_content_size or size > self.max_contents_size:
+            return None
+
+        with self.contents_lock:
+            if file_path in self.contents:
+                self.contents.move_to_end(file_path)
+                return self.contents[file_path]
+
+        with open(file_path, 'rb') as file:
+            content = file.read()
+
+        with self.contents_lock:
+            if file_path not in self.contents:
+                # remove the least recently used contents until the new content fits
+                while self.contents and self.n_content_bytes + len(content) > self.max_contents_size:
+                    _, removed_content = self.contents.popitem(last=False)
+                    self.n_content_bytes -= len(removed_content)
+
+                self.contents[file_path] = content
+                self.n_content_bytes += len(content)
+
+        return content
+
+    def get_hash(self, file_path):
+        '''Returns the hash of the content of a source file, or None if it does not exist.'''
+
+        if file_path not in self.hashes:
+            if not self.isfile(file_path):
+                self.hashes[file_path] = None
+            else:
+                content = self.get_content(file_path)
+                if content is not None:
+                    self.hashes[file_path] = hashlib.sha1(content).hexdigest()
+                else:
+                    # large files are hashed in blocks, so that they are not read into memory at once
+                    file_hash = hashlib.sha1()
+                    with open(file_path, 'rb') as file:
+                        for block in iter(lambda: file.read(self.max_content_size), b''):
+                            file_hash.update(block)
+                    self.hashes[file_path] = file_hash.hexdigest()
+
+        return self.hashes[file_path]
+
+
+class CompiledTemplate:
+    '''
+    Template file content that is parsed once into a list of segments, so that it can be rendered for many
+    experiments and repetitions with a single join.
+
+    Placeholders have the form <name>. <experiment_id> and <repetition_id> (case-sensitive) are replaced by the ids,
+    all other placeholders are matched case-insensitive against the variable names. Placeholders without a
+    matching variable stay in the output.
+
+    The result is identical to replacing the ids and then each variable with a case-insensitive re.sub in the order
+    of the variables. If variable names contain regex characters, values contain '<', '>' or backslashes, or a
+    placeholder is inside an open '<' of the text with a later '>', or is directly followed by '>', the rendering
+    falls back to this sequential substitution, because then the result depends on the order of the substitutions.
+    '''
+
+    placeholder_pattern = re.compile(r'<([^<>]*)>')
+
+    regex_characters = set('.^$*+?{}[]\\|()<>')
+
+    def __init__(self, content):
+
+        self.content = content
+
+        self.content_hash = hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+        # literal text and placeholders alternate, i.e. the placeholders are at the odd positions
+        self.segments = []
+
+        # (segment index, placeholder name, lower case placeholder name) for each placeholder
+        self.slots = []
+
+        pos = 0
+        for match in self.placeholder_pattern.finditer(content):
+            self.segments.append(content[pos:match.start()])
+            self.slots.append((len(self.segments), match.group(1), match.group(1).lower()))
+            self.segments.append(match.group(0))
+            pos = match.end()
+        self.segments.append(content[pos:])
+
+        # non-ascii placeholders could match variables by unicode case folding, which lower() does not reproduce
+        self.is_ascii = all(name.isascii() for _, name, _ in self.slots)
+
+        # a substituted value inside an open '<' of the literal text can form a new placeholder with a later '>', e.g.
+        # '<<a>>' or '<x<a>z>' with a='y' give '<y>' or '<xyz>', which the sequential substitution replaces again
+        self.has_adjacent_brackets = False
+        is_open = False
+        for segment_idx, _, _ in self.slots:
+            literal = self.segments[segment_idx - 1]
+            if literal.rfind('<') > literal.rfind('>'):
+                is_open = True
+            elif '>' in literal:
+                is_open = False
+
+            if is_open and any('>' in later_literal for later_literal in self.segments[segment_idx + 1::2]):
+                self.has_adjacent_brackets = True
+                break
+
+            if self.segments[segment_idx + 1].startswith('>'):
+                self.has_adjacent_brackets = True
+                break
+
+
+    def render(self, variables, experiment_id, repetition_id=None):
+        '''
+        Renders the template.
+
+        :param variables: Dictionary with key=variable name, value=variable value.
+        :param experiment_id: Value for <experiment_id>.
+        :param repetition_id: Value for <repetition_id>. If None, then <repetition_id> is handled as a variable.
+        :return: Rendered content.
+        '''
+
+        if self.has_adjacent_brackets:
+            return self.render_sequential(variables, experiment_id, repetition_id)
+
+        # the first variable with a certain name wins, as in the sequential substitution
+        values = dict()
+        for variable_name, variable_value in variables.items():
+            if not self.is_plain_substitution(variable_name, variable_value):
+                return self.render_sequential(variables, experiment_id, repetition_id)
+            values.setdefault(variable_name.lower(), variable_value)
+
+        segments = list(self.segments)
+        for segment_idx, name, key in self.slots:
+            if name == 'experiment_id':
+                segments[segment_idx] = str(experiment_id)
+            elif name == 'repetition_id' and repetition_id is not None:
+                segments[segment_idx] = str(repetition_id)
+            elif key in values:
+                segments[segment_idx] = values[key]
+
+        return ''.join(segments)
+
+
+    def is_plain_substitution(self, variable_name, variable_value):
+        '''Checks if the variable can be substituted independently of the other variables.'''
+        return (self.is_ascii
+                and variable_name.isascii()
+                and not self.regex_characters.intersection(variable_name)
+                and '<' not in variable_value
+                and '>' not in variable_value
+                and '\\' not in variable_value)
+
+
+    def render_sequential(self, variables, experiment_id, repetition_id=None):
+        '''Renders the template by replacing the ids and then each variable after another.'''
+
+        file_content = self.content.replace('<experiment_id>', str(experiment_id))
+
+        if repetition_id is not None:
+            file_content = file_content.replace('<repetition_id>', str(repetition_id))
+
+        for variable_name, variable_value in variables.items():
+            file_content = re.sub('<{}>'.format(variable_name),
+                                  variable_value,
+                                  file_content,
+                                  flags=re.IGNORECASE)
 
+        return file_content
 
-def copy_experiment_files(src, dst, template_files):
 
-    if os.path.isdir(src):
+def copy_experiment_files(src, dst, template_files, incremental=False, link_mode='copy', source_cache=None):
+    '''
+    Copies a source file or the content of a source directory into the destination directory.
+
+    :param incremental: If True, existing subdirectories are kept and existing files are only replaced if they differ.
+    :param link_mode: 'copy' copies the files.
+                      'hardlink' creates hard links to the source files (same filesystem).
+                      'symlink' creates symbolic links to the absolute paths of the source files.
+                      'reflink' creates copy-on-write clones of the source files (Linux with btrfs, xfs, ...).
+                      If the link can not be created, the file is copied instead.
+    :param source_cache: Optional SourceFileCache, so that source directories are only listed and small source files
+                         are only read once for all experiments.
+    '''
+
+    if source_cache is None:
+        source_cache = SourceFileCache()
+
+    if source_cache.isdir(src):
         # if directory, then copy the content
 
-        for item in os.listdir(src):
+        for item in source_cache.listdir(src):
             s = os.path.join(src, item)
 
             # if subdirectory, then delete any existing directory and make a new directory
 
-            if os.path.isdir(s):
+            if source_cache.isdir(s):
 
                 d = os.path.join(dst, item)
 
-                if os.path.isdir(d):
-                    shutil.rmtree(d, ignore_errors=True)
+                if incremental:
+                    if not os.path.isdir(d):
+                        os.mkdir(d)
+                else:
+                    if os.path.isdir(d):
+                        shutil.rmtree(d, ignore_errors=True)
 
-                os.mkdir(d)
+                    os.mkdir(d)
 
             else:
                 d = dst
 
-            copy_experiment_files(s, d, template_files)
+            copy_experiment_files(s, d, template_files, incremental=incremental, link_mode=link_mode, source_cache=source_cache)
 
     else:
         # if file, then copy it directly
 
         # do not copy the template files, because they were already processed
         if os.path.basename(src) not in [os.path.basename(f) for f in template_files]:
-            shutil.copy2(src, dst)
 
+            d = os.path.join(dst, os.path.basename(src)) if os.path.isdir(dst) else dst
+
+            if incremental and is_experiment_file_up_to_date(src, d, link_mode, source_cache=source_cache):
+                return
+
+            # remove existing files, so that a copy never writes through an existing link into its source
+            if os.path.lexists(d):
+                os.remove(d)
+
+            link_experiment_file(src, d, link_mode, source_cache=source_cache)
+
+
+def link_experiment_file(src, dst, link_mode='copy', source_cache=None):
+    '''
+    Puts the source file at the destination path according to the link mode. Falls back to a copy if the link fails.
+
+    Copies of files whose content is held by the source_cache are written from memory, with the permission bits and
+    times of the source file.
+    '''
+
+    try:
+        if link_mode == 'hardlink':
+            os.link(src, dst)
+            return
+
+        elif link_mode == 'symlink':
+            os.symlink(os.path.abspath(src), dst)
+            return
+
+        elif link_mode == 'reflink':
+            import fcntl
+
+            try:
+                with open(src, 'rb') as src_file, open(dst, 'wb') as dst_file:
+                    fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+            except OSError:
+                os.remove(dst)
+                raise
+
+            shutil.copystat(src, dst)
+            return
+
+    except (OSError, ImportError):
+        # not supported by the platform or filesystem
+        pass
+
+    content = source_cache.get_content(src) if source_cache is not None else None
+
+    if content is None:
+        shutil.copy2(src, dst)
+    else:
+        with open(dst, 'wb') as file:
+            file.write(content)
+
+        src_stat = source_cache.stat(src)
+        os.chmod(dst, stat.S_IMODE(src_stat.st_mode))
+        os.utime(dst, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+
+
+def is_experiment_file_up_to_date(src, dst, link_mode='copy', source_cache=None):
+    '''Checks if the destination file has the content of the source file in the form of the link mode.'''
 
+    if not os.path.lexists(dst):
+        return False
+
+    if os.path.islink(dst):
+        return link_mode == 'symlink' and os.readlink(dst) == os.path.abspath(src)
+
+    if os.path.samefile(src, dst):
+        return link_mode == 'hardlink'
+
+    if link_mode in ['symlink', 'hardlink']:
+        # a copy but a link is required, e.g. from a previous generation with another link mode
+        return False
+
+    content = source_cache.get_content(src) if source_cache is not None else None
+
+    if content is None:
+        return filecmp.cmp(src, dst, shallow=False)
+
+    if os.path.getsize(dst) != len(content):
+        return False
+
+    with open(dst, 'rb') as file:
+        return file.read() == content
+
+
+def plan_experiment_files(ods_filepath, directory=None, extra_files=None, extra_experiment_files=None, use_config_cache=False):
+    '''
+    Plans the generation of experiment files from an ODS file without writing anything (see plan_files_from_config).
+
+    :param use_config_cache: If True, an existing cache of the configuration is used (see
+                             load_configuration_data_from_ods). A missing cache is not created.
+
+    :return: Plan of the generation.
+    '''
+
+    if directory is None:
+        directory = os.path.dirname(ods_filepath)
+
+    if directory == '':
+        directory = '.'
+
+    config_data = load_configuration_data_from_ods(ods_filepath, use_cache=use_config_cache, is_write_cache=False)
+
+    return plan_files_from_config(config_data, directory, extra_files=extra_files, extra_experiment_files=extra_experiment_files)
+
+
+def plan_files_from_config(config_data, directory='.', extra_files=None, extra_experiment_files=None):
+    '''
+    Plans the generation of experiment files by generate_files_from_config without writing anything.
+    The templates are rendered in memory to compute the size of the generated files.
+
+    :return: Dictionary with the plan:
+             plan['directories']: List of directories that are created.
+             plan['rendered_files']: List of (file path, number of bytes) of the files that are generated from templates.
+             plan['copied_files']: List of (source path, file path, number of bytes) of the copied source files.
+                                   In link modes other than 'copy' these files are linked instead.
+             plan['missing_files']: List of source files that do not exist and would stop the generation, each listed
+                                    once also if it is used by several experiments or repetitions.
+             plan['n_directories'], plan['n_files']: Number of directories and files.
+             plan['rendered_bytes'], plan['copied_bytes'], plan['total_bytes']: Number of bytes of the files.
+    '''
 
+    if extra_files is None:
+        extra_files = []
+    elif not isinstance(extra_files, list):
+        extra_files = [extra_files]
+
+    if extra_experiment_files is None:
+        extra_experiment_files = []
+    elif not isinstance(extra_experiment_files, list):
+        extra_experiment_files = [extra_experiment_files]
+
+    plan = OrderedDict()
+    plan['directories'] = OrderedDict()
+    plan['rendered_files'] = []
+    plan['copied_files'] = []
+    plan['missing_files'] = OrderedDict()
+
+    # the base directory is created together with the group folders
+    plan['directories'][directory] = None
+
+    # each template and source file is only checked once for all experiments
+    source_cache = SourceFileCache()
+
+    for experiment_group_config in config_data:
+
+        group_directory = get_group_directory(directory, experiment_group_config, len(config_data))
+        plan['directories'][group_directory] = None
+
+        for experiment_id, experiment_config in experiment_group_config['experiments'].items():
+
+            experiment_directory = get_experiment_directory(group_directory, experiment_id)
+            plan['directories'][experiment_directory] = None
+
+            repetition_source_files, experiment_source_files = get_experiment_source_files(experiment_config, extra_files, extra_experiment_files)
+
+            for repetition_id, experiment_files_directory in get_repetition_directories(experiment_directory, experiment_config):
+                plan['directories'][experiment_files_directory] = None
+                plan_source_files(plan, repetition_source_files, experiment_files_directory, experiment_config, experiment_id, repetition_id, source_cache)
+
+            if experiment_source_files:
+                plan_source_files(plan, experiment_source_files, experiment_directory, experiment_config, experiment_id, None, source_cache)
+
+    plan['directories'] = list(plan['directories'].keys())
+    plan['missing_files'] = list(plan['missing_files'].keys())
+    plan['n_directories'] = len(plan['directories'])
+    plan['n_files'] = len(plan['rendered_files']) + len(plan['copied_files'])
+    plan['rendered_bytes'] = sum(n_bytes for _, n_bytes in plan['rendered_files'])
+    plan['copied_bytes'] = sum(n_bytes for _, _, n_bytes in plan['copied_files'])
+    plan['total_bytes'] = plan['rendered_bytes'] + plan['copied_bytes']
+
+    return plan
+
+
+def plan_source_files(plan, source_files, experiment_files_directory, experiment_config, experiment_id, repetition_id, source_cache):
+    '''Adds the files that generate_source_files would create to the plan.'''
+
+    encoding = locale.getpreferredencoding(False)
+
+    for file_config in experiment_config['files']:
+
+        template_file_path = source_cache.resolve_template_file_path(file_config['template_file_path'], source_files)
+
+        if template_file_path is not None:
+            file_content = source_cache.get_template(template_file_path).render(file_config['variables'], experiment_id, repetition_id)
+            file_path = os.path.join(experiment_files_directory, file_config['file_name_template'].format(experiment_id))
+            plan['rendered_files'].append((file_path, len(file_content.encode(encoding))))
+
+    template_files = [file_config['template_file_path'] for file_config in experiment_config['files']]
+
+    for src in source_files:
+        plan_copy_experiment_files(plan, src, experiment_files_directory, template_files, source_cache)
+
+
+def plan_copy_experiment_files(plan, src, dst, template_files, source_cache):
+    '''Adds the directories and files that copy_experiment_files would create to the plan.'''
+
+    if source_cache.isdir(src):
+
+        for item in source_cache.listdir(src):
+            s = os.path.join(src, item)
+
+            if source_cache.isdir(s):
+                d = os.path.join(dst, item)
+                plan['directories'][d] = None
+            else:
+                d = dst
+
+            plan_copy_experiment_files(plan, s, d, template_files, source_cache)
+
+    elif os.path.basename(src) not in [os.path.basename(f) for f in template_files]:
+
+        if not source_cache.isfile(src):
+            plan['missing_files'][src] = None
+        else:
+            plan['copied_files'].append((src, os.path.join(dst, os.path.basename(src)), source_cache.stat(src).st_size))
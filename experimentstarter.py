@@ -1,104 +1,882 @@
+import asyncio
+import concurrent.futures
+import contextlib
 import glob
 import os
+import re
 import subprocess
+import tempfile
 import time
+from collections import OrderedDict, deque
+
+# extension of the file next to a start script that holds the id of its last submitted job
+JOB_ID_FILE_EXTENSION = '.jobid'
+
+# append-only log at the root of the experiments with lines '<script path>\t<status>', the last line of a script counts
+STATUS_INDEX_FILENAME = '.status_index'
+
+# environment variable with the path of the status index for the started scripts, so that they can add their status
+STATUS_INDEX_ENV_VARIABLE = 'EXPUTILS_STATUS_INDEX'
+
+# number of threads that submit jobs at the same time if is_parallel is True and n_jobs is not given, bounded so that
+# the scheduler is not flooded with requests
+DEFAULT_SUBMIT_N_JOBS = 8
+
+# states of jobs in the queue of a scheduler that are pending or running
+QUEUED_JOB_STATES = dict(slurm=['PD', 'R', 'CF', 'CG', 'S', 'RQ', 'RS', 'RH'],
+                         torque=['Q', 'R', 'H', 'W', 'T', 'E', 'S'])
+
+
+def start_slurm_experiments(directory='.', start_scripts='*.slurm', is_parallel=True, verbose=False, post_start_wait_time=0,
+                            is_job_array=False, max_array_size=None, job_array_directory=None, sbatch_command='sbatch',
+                            queue_command='squeue', use_status_index=False, rebuild_status_index=False, n_jobs=None):
+    '''
+    Submits the start scripts under the directory via sbatch.
+
+    The id of each submitted job is written next to its script ('<script>.jobid'). Scripts whose last job is still
+    pending or running in the queue are not submitted again. The queue is requested once per call.
+
+    :param is_parallel: If True, the jobs are submitted by n_jobs threads at the same time, otherwise one after another,
+                        i.e. n_jobs is set to 1.
+    :param is_job_array: If True, the scripts are submitted as SLURM job arrays instead of one job per script (see
+                         submit_slurm_job_arrays). Scripts with the same #SBATCH options are grouped in one array.
+    :param max_array_size: Maximum number of tasks per job array. If None, the MaxArraySize of the SLURM configuration.
+    :param job_array_directory: Directory for the generated job array scripts and index files.
+                                Default: 'slurm_job_arrays' in the directory.
+    :param sbatch_command: Command to submit jobs, e.g. a path to a stand-in for tests.
+    :param queue_command: Command to list the jobs in the queue, e.g. a path to a stand-in for tests.
+    :param use_status_index: If True, the scripts are found via the status index (see find_start_scripts).
+    :param rebuild_status_index: If True, the status index is built again from the directory tree.
+    :param n_jobs: Number of threads that submit single jobs at the same time if is_parallel is True (see submit_jobs).
+                   Default: DEFAULT_SUBMIT_N_JOBS.
+    :return: For single jobs the result of submit_jobs, for job arrays the result of submit_slurm_job_arrays.
+    '''
+
+    if not is_parallel:
+        n_jobs = 1
+    elif n_jobs is None:
+        n_jobs = DEFAULT_SUBMIT_N_JOBS
+
+    script_paths = find_start_scripts(directory=directory,
+                                      start_scripts=start_scripts,
+                                      verbose=verbose,
+                                      get_queued_job_ids=lambda: get_queued_job_ids(queue_command, scheduler='slurm'),
+                                      use_status_index=use_status_index,
+                                      rebuild_status_index=rebuild_status_index)
+
+    env = get_status_index_environment(directory) if use_status_index else None
+
+    if is_job_array:
+        if job_array_directory is None:
+            job_array_directory = os.path.join(directory, 'slurm_job_arrays')
+
+        return submit_slurm_job_arrays(script_paths,
+                                       job_array_directory,
+                                       max_array_size=max_array_size,
+                                       sbatch_command=sbatch_command,
+                                       verbose=verbose,
+                                       post_start_wait_time=post_start_wait_time,
+                                       env=env)
+
+    return submit_jobs(script_paths,
+                       submit_command=sbatch_command,
+                       verbose=verbose,
+                       post_start_wait_time=post_start_wait_time,
+                       env=env,
+                       n_jobs=n_jobs)
+
+
+def start_torque_experiments(directory='.', start_scripts='*.torque', is_parallel=True, verbose=False, post_start_wait_time=0,
+                             qsub_command='qsub', queue_command='qstat', use_status_index=False, rebuild_status_index=False, n_jobs=None):
+    '''
+    Submits the start scripts under the directory via qsub.
+
+    The id of each submitted job is written next to its script ('<script>.jobid'). Scripts whose last job is still
+    pending or running in the queue are not submitted again. The queue is requested once per call.
+
+    :param is_parallel: If True, the jobs are submitted by n_jobs threads at the same time, otherwise one after another,
+                        i.e. n_jobs is set to 1.
+    :param qsub_command: Command to submit jobs, e.g. a path to a stand-in for tests.
+    :param queue_command: Command to list the jobs in the queue, e.g. a path to a stand-in for tests.
+    :param use_status_index: If True, the scripts are found via the status index (see find_start_scripts).
+    :param rebuild_status_index: If True, the status index is built again from the directory tree.
+    :param n_jobs: Number of threads that submit jobs at the same time if is_parallel is True (see submit_jobs).
+                   Default: DEFAULT_SUBMIT_N_JOBS.
+    :return: Result of submit_jobs.
+    '''
+
+    if not is_parallel:
+        n_jobs = 1
+    elif n_jobs is None:
+        n_jobs = DEFAULT_SUBMIT_N_JOBS
+
+    script_paths = find_start_scripts(directory=directory,
+                                      start_scripts=start_scripts,
+                                      verbose=verbose,
+                                      get_queued_job_ids=lambda: get_queued_job_ids(queue_command, scheduler='torque'),
+                                      use_status_index=use_status_index,
+                                      rebuild_status_index=rebuild_status_index)
+
+    return submit_jobs(script_paths,
+                       submit_command=qsub_command,
+                       verbose=verbose,
+                       post_start_wait_time=post_start_wait_time,
+                       env=get_status_index_environment(directory) if use_status_index else None,
+                       n_jobs=n_jobs)
+
+
+def start_experiments(directory='.', start_scripts='*.sh', start_command='{}', is_parallel=True, is_chdir=False, verbose=False, post_start_wait_time=0,
+                      max_workers=None, resource_limits=None, job_resources=None, use_status_index=False, rebuild_status_index=False):
+    '''
+    Starts all scripts under the directory that have not been started or that stopped with an error.
+
+    :param is_parallel: If True, the scripts run in parallel (at most max_workers at once), otherwise one after another.
+    :param is_chdir: If True, the script is given to the start command relative to its directory ('./<script>'),
+                     otherwise with its path. The scripts always run in their directory.
+    :param max_workers: Maximum number of scripts that run at the same time. None for no limit.
+    :param resource_limits: Optional dictionary with the available resources, e.g. dict(cores=64, memory=256).
+                            New scripts are only started if the resources of the running scripts leave enough room.
+    :param job_resources: Resources of each script (see run_scripts). Either a dictionary that is used for all scripts,
+                          e.g. dict(cores=4, memory=16), or a function that gets the script path and returns it.
+    :param use_status_index: If True, the scripts are found via the status index (see find_start_scripts).
+    :param rebuild_status_index: If True, the status index is built again from the directory tree.
+    :return: Dictionary with key=path of a started script, value=dictionary with its 'returncode' and 'wall_time'
+             in seconds.
+    '''
+
+    start_script_paths = find_start_scripts(directory=directory,
+                                            start_scripts=start_scripts,
+                                            verbose=verbose,
+                                            use_status_index=use_status_index,
+                                            rebuild_status_index=rebuild_status_index)
+
+    # if not parallel, then wait until current process is finished
+    if not is_parallel:
+        max_workers = 1
+
+    return run_scripts(start_script_paths,
+                       start_command=start_command,
+                       is_chdir=is_chdir,
+                       max_workers=max_workers,
+                       resource_limits=resource_limits,
+                       job_resources=job_resources,
+                       post_start_wait_time=post_start_wait_time,
+                       verbose=verbose,
+                       env=get_status_index_environment(directory) if use_status_index else None)
+
+
+def find_start_scripts(directory='.', start_scripts='*.sh', verbose=False, get_queued_job_ids=None, use_status_index=False, rebuild_status_index=False):
+    '''
+    Finds the scripts under the directory that should be started, i.e. scripts without status or whose status is
+    'none', 'not started', 'error' or 'unfinished'.
+
+    With the status index, the scripts and their status are read from the index file at the root of the directory
+    (STATUS_INDEX_FILENAME) instead of searching the directory tree and reading all status files. The index is built
+    from the tree if it does not exist. Scripts add their new status to the index file given by the environment variable
+    EXPUTILS_STATUS_INDEX. For the scripts that would be started, the status file is checked nevertheless, in case a
+    script did not update the index. Scripts that are added to the tree later are only found after a rebuild.
+
+    :param get_queued_job_ids: Optional function without arguments that returns the ids of the pending and running
+                               jobs of a scheduler. Scripts whose job or array task (see JOB_ID_FILE_EXTENSION) is
+                               among them are not started (see is_job_queued). The function is called at most once and only if a script has a job id.
+    :param use_status_index: If True, the scripts and their status are read from the status index.
+    :param rebuild_status_index: If True, the status index is built again from the directory tree.
+    :return: List with the paths of the scripts.
+    '''
+
+    if use_status_index:
+        index = None if rebuild_status_index else load_status_index(directory, start_scripts)
+        if index is None:
+            if verbose:
+                print('build status index for {!r} ...'.format(directory))
+            index = build_status_index(directory, start_scripts)
+
+        # holds tuples of (startscript_path, status)
+        scripts = []
+        for script_path, status in index.items():
+            if is_start_status(status):
+                file_status = read_script_status(script_path)
+                # remember status changes that the script did not add to the index
+                if file_status != status:
+                    update_status_index(get_status_index_filepath(directory), script_path, file_status)
+                status = file_status
+            scripts.append((script_path, status))
+
+    else:
+        # find all start scripts and their job status
+        files = glob.iglob(os.path.join(directory, '**', start_scripts), recursive=True)
+        scripts = [(file, read_script_status(file)) for file in files]
+
+    # the scripts that are started
+    start_script_paths = []
+
+    ignored_scripts = []
+
+    queued_job_ids = None
+    queued_base_job_ids = None
+
+    for [script_path, status] in scripts:
+
+        if is_start_status(status):
+
+            # do not restart experiments that have been added as jobs but have not finished yet
+            job_id = load_job_id(script_path) if get_queued_job_ids is not None else None
+            if job_id is not None:
+                if queued_job_ids is None:
+                    queued_job_ids = set(expanded_job_id
+                                         for queued_job_id in get_queued_job_ids()
+                                         for expanded_job_id in expand_job_ids(queued_job_id))
+                    queued_base_job_ids = get_base_job_ids(queued_job_ids)
+
+                if is_job_queued(job_id, queued_job_ids, queued_base_job_ids):
+                    ignored_scripts.append((script_path, 'queued as job {}'.format(job_id)))
+                    continue
+
+            start_script_paths.append(script_path)
+        else:
+            ignored_scripts.append((script_path, status))
+
+    if verbose:
+
+        if ignored_scripts:
+            print('Ignored scripts:')
+
+            for [script_path, status] in ignored_scripts:
+                print('\t- {!r} (status: {})'.format(script_path, status))
+
+    return start_script_paths
+
+
+def is_start_status(status):
+    '''Returns True if a script with the status should be started.'''
+    return status is None or status.lower() == 'none' or status.lower() == 'not started' or status.lower() == 'error' or status.lower() == 'unfinished'
+
+
+def read_script_status(script_path):
+    '''Returns the last line of the status file of a script or 'none' if it does not exist.'''
+
+    status_file_path = script_path + '.status'
+
+    if not os.path.isfile(status_file_path):
+        return 'none'
+
+    return read_last_line(status_file_path)
+
+
+def read_last_line(file_path, block_size=1024):
+    '''Returns the last non-empty line of a file by reading blocks from its end. Returns '' for an empty file.'''
+
+    with open(file_path, 'rb') as file:
+        file.seek(0, os.SEEK_END)
+        position = file.tell()
+        content = b''
+
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            file.seek(position)
+            content = file.read(read_size) + content
+
+            # the last line is complete if there is a line break before it
+            stripped_content = content.rstrip(b'\r\n')
+            if b'\n' in stripped_content:
+                return stripped_content.rsplit(b'\n', 1)[1].decode().rstrip('\r')
+
+    return content.rstrip(b'\r\n').decode().rstrip('\r')
+
+
+def get_status_index_filepath(directory):
+    return os.path.join(directory, STATUS_INDEX_FILENAME)
+
+
+def get_status_index_environment(directory):
+    '''Returns the environment for started scripts, with the path of the status index in EXPUTILS_STATUS_INDEX.'''
+    env = os.environ.copy()
+    env[STATUS_INDEX_ENV_VARIABLE] = os.path.abspath(get_status_index_filepath(directory))
+    return env
+
+
+def build_status_index(directory='.', start_scripts='*.sh'):
+    '''
+    Builds the status index of a directory from its tree by searching the start scripts and reading their status.
+
+    :return: Dictionary with key=script path, value=status.
+    '''
+
+    index = OrderedDict()
+    for script_path in sorted(glob.iglob(os.path.join(directory, '**', start_scripts), recursive=True)):
+        index[script_path] = read_script_status(script_path)
+
+    # write to a temporary file first, so that the index is never incomplete
+    index_file_path = get_status_index_filepath(directory)
+    with open(index_file_path + '.tmp', 'w') as file:
+        file.write('# start_scripts: {}\n'.format(start_scripts))
+        for script_path, status in index.items():
+            file.write('{}\t{}\n'.format(os.path.relpath(script_path, directory), status))
+    os.replace(index_file_path + '.tmp', index_file_path)
+
+    return index
+
+
+def load_status_index(directory='.', start_scripts='*.sh'):
+    '''
+    Loads the status index of a directory. For each script the last status in the index counts.
+
+    :return: Dictionary with key=script path, value=status. None if there is no index for the start_scripts.
+    '''
 
-def start_slurm_experiments(directory='.', start_scripts='*.slurm', is_parallel=True, verbose=False, post_start_wait_time=0):
+    index_file_path = get_status_index_filepath(directory)
 
-    return start_experiments(directory=directory,
-                             start_scripts=start_scripts,
-                             start_command='sbatch {}',
-                             is_parallel=is_parallel,
-                             is_chdir = True, # added, otherwise the sbatch does not work
-                             verbose=verbose,
-                             post_start_wait_time=post_start_wait_time)
+    if not os.path.isfile(index_file_path):
+        return None
 
+    with open(index_file_path, 'r') as file:
+        if file.readline().rstrip('\n') != '# start_scripts: {}'.format(start_scripts):
+            return None
 
-def start_torque_experiments(directory='.', start_scripts='*.torque', is_parallel=True, verbose=False, post_start_wait_time=0):
+        index = OrderedDict()
+        for line in file:
+            line = line.rstrip('\r\n')
+            if '\t' in line:
+                script_path, status = line.split('\t', 1)
+                # scripts can add themselves with their absolute path
+                if os.path.isabs(script_path):
+                    script_path = os.path.relpath(script_path, os.path.abspath(directory))
+                index[os.path.join(directory, script_path)] = status
 
-    return start_experiments(directory=directory,
-                             start_scripts=start_scripts,
-                             start_command='qsub {}',
-                             is_parallel=is_parallel,
-                             is_chdir = True, # added, otherwise the sbatch does not work
-                             verbose=verbose,
-                             post_start_wait_time=post_start_wait_time)
+    return index
 
 
-def start_experiments(directory='.', start_scripts='*.sh', start_command='{}', is_parallel=True, is_chdir=False, verbose=False, post_start_wait_time=0):
+def update_status_index(index_file_path, script_path, status):
+    '''
+    Adds the status of a script to a status index, e.g. from a script in python:
+    update_status_index(os.environ['EXPUTILS_STATUS_INDEX'], __file__, 'Finished')
+    '''
 
-    # TODO: do not restart experiments that have been added as jobs but have not been started yet
+    # a single short write in append mode, so that lines of simultaneous scripts are not mixed
+    with open(index_file_path, 'a') as file:
+        file.write('{}\t{}\n'.format(os.path.abspath(script_path), status))
 
-    # holds tuples of (startscript_path, status)
-    scripts = []
 
-    # find all start scripts
-    files = glob.iglob(os.path.join(directory, '**', start_scripts), recursive=True)
+def run_scripts(script_paths, start_command='{}', is_chdir=False, max_workers=None, resource_limits=None, job_resources=None, post_start_wait_time=0, verbose=False, poll_interval=0.05, env=None):
+    '''
+    Runs scripts as local processes with a bounded number of simultaneous processes.
 
-    # find if they have a job status
-    for file in files:
+    The scripts are started in the given order as soon as a slot is free and their resources fit into the resource
+    limits. A script whose resources exceed the limits is started once no other script is running.
 
-        status_file_path = file + '.status'
+    :param script_paths: Paths of the scripts.
+    :param max_workers: Maximum number of scripts that run at the same time. None for no limit.
+    :param resource_limits: Optional dictionary with key=resource name, value=available amount, e.g. dict(cores=64).
+    :param job_resources: Resources that each script uses, e.g. dict(cores=4). Either a dictionary for all scripts or a
+                          function that gets the script path and returns the dictionary. Missing resources count as 0.
+    :param poll_interval: Time in seconds between checks if running scripts have finished.
+    :param env: Environment variables of the processes. None to use the environment of the current process.
+    :return: Dictionary with key=script path, value=dictionary with its 'returncode' and 'wall_time' in seconds.
+    '''
 
-        if os.path.isfile(status_file_path):
-            # read status
-            with open(status_file_path, 'r') as f:
-                lines = f.read().splitlines()
-                status = lines[-1]
+    if resource_limits is None:
+        resource_limits = dict()
+
+    def get_job_resources(script_path):
+        if job_resources is None:
+            return dict()
+        elif callable(job_resources):
+            return job_resources(script_path) or dict()
         else:
-            status = 'none'
+            return job_resources
 
-        scripts.append((file, status))
+    def fits(resources):
+        for resource_name, limit in resource_limits.items():
+            if used_resources[resource_name] + resources.get(resource_name, 0) > limit:
+                return False
+        return True
 
+    results = OrderedDict((script_path, None) for script_path in script_paths)
 
-    # the processes that are started for each script
-    processes = []
+    pending_scripts = deque(script_paths)
 
-    ignored_scripts = []
+    # list with (script path, process, start time, resources) of the running scripts
+    running_jobs = []
 
-    if is_chdir:
-        cwd = os.getcwd()
+    used_resources = {resource_name: 0 for resource_name in resource_limits}
 
-    # start every found script
-    for [script_path, status] in scripts:
+    while pending_scripts or running_jobs:
+
+        # start new scripts while slots and resources are free
+        while pending_scripts and (max_workers is None or len(running_jobs) < max_workers):
+
+            resources = get_job_resources(pending_scripts[0])
 
-        if status is None or status.lower() == 'none' or status.lower() == 'not started' or status.lower() == 'error' or status.lower() == 'unfinished':
-            # start the script
+            if running_jobs and not fits(resources):
+                break
+
+            script_path = pending_scripts.popleft()
 
             if verbose:
-                print('start {!r} (status: {}) ...'.format(script_path, status))
+                print('start {!r} ...'.format(script_path))
+
+            process = start_process(script_path, start_command, is_chdir, env=env)
+            running_jobs.append((script_path, process, time.time(), resources))
+
+            for resource_name in used_resources:
+                used_resources[resource_name] += resources.get(resource_name, 0)
+
+            if post_start_wait_time > 0:
+                time.sleep(post_start_wait_time)
 
-            script_directory = os.path.dirname(script_path)
+        # collect the finished scripts
+        still_running_jobs = []
+        for script_path, process, start_time, resources in running_jobs:
 
-            if is_chdir:
-                os.chdir(script_directory)
-                process = subprocess.Popen(start_command.format(os.path.join('.', os.path.basename(script_path))).split())
+            if process.poll() is None:
+                still_running_jobs.append((script_path, process, start_time, resources))
             else:
-                process = subprocess.Popen(start_command.format(script_path).split(), cwd=script_directory)
+                results[script_path] = dict(returncode=process.returncode, wall_time=time.time() - start_time)
+
+                for resource_name in used_resources:
+                    used_resources[resource_name] -= resources.get(resource_name, 0)
+
+                if verbose:
+                    print('finished {!r} (return code: {}, wall time: {:.1f} s)'.format(script_path, process.returncode, results[script_path]['wall_time']))
+
+        if len(still_running_jobs) == len(running_jobs) and running_jobs:
+            time.sleep(poll_interval)
+
+        running_jobs = still_running_jobs
+
+    return results
+
+
+def start_process(script_path, start_command='{}', is_chdir=False, env=None):
+    '''Starts the process of a script in the directory of the script.'''
+
+    # the working directory is set for the new process only, so that the launcher can be used from several threads
+    script_directory = os.path.dirname(script_path) or '.'
+
+    if is_chdir:
+        command = start_command.format(os.path.join('.', os.path.basename(script_path)))
+    else:
+        command = start_command.format(script_path)
+
+    return subprocess.Popen(command.split(), cwd=script_directory, env=env)
+
+
+def submit_jobs(script_paths, submit_command='sbatch', verbose=False, post_start_wait_time=0, env=None, n_jobs=None):
+    '''
+    Submits scripts to a scheduler, each in the directory of the script, and writes the id of each job next to its
+    script ('<script>.jobid').
+
+    :param submit_command: Command to submit a script, e.g. 'sbatch' or 'qsub'.
+    :param post_start_wait_time: Time in seconds that each submitting thread waits after a submission.
+    :param env: Environment variables for the submission. None to use the environment of the current process.
+    :param n_jobs: Number of threads that submit scripts at the same time. None or 1 submits them one after another,
+                   -1 uses one thread per CPU.
+    :return: Dictionary with key=script path, value=dictionary with the 'returncode' of the submission and the
+             'job_id' (None if it could not be parsed).
+    '''
+
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+
+    def submit(script_path):
+        return submit_job(script_path, submit_command=submit_command, verbose=verbose, post_start_wait_time=post_start_wait_time, env=env)
+
+    if n_jobs is not None and n_jobs > 1:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(submit, script_paths))
+    else:
+        results = [submit(script_path) for script_path in script_paths]
+
+    return OrderedDict(zip(script_paths, results))
+
+
+def submit_job(script_path, submit_command='sbatch', verbose=False, post_start_wait_time=0, env=None):
+    '''
+    Submits a script to a scheduler in the directory of the script and writes the id of the job next to the script.
+
+    :return: Dictionary with the 'returncode' of the submission and the 'job_id' (None if it could not be parsed).
+    '''
+
+    if verbose:
+        print('submit {!r} ...'.format(script_path))
+
+    process = subprocess.run(submit_command.split() + [os.path.join('.', os.path.basename(script_path))],
+                             cwd=os.path.dirname(script_path) or '.',
+                             stdout=subprocess.PIPE,
+                             universal_newlines=True,
+                             env=env)
+
+    if verbose:
+        print(process.stdout, end='')
+
+    job_id = parse_job_id(process.stdout)
+
+    if process.returncode == 0 and job_id is not None:
+        save_job_id(script_path, job_id)
+
+    if post_start_wait_time > 0:
+        time.sleep(post_start_wait_time)
+
+    return dict(returncode=process.returncode, job_id=job_id)
+
+
+def save_job_id(script_path, job_id):
+    '''Writes the id of the job of a script in the file next to the script.'''
+    with open(script_path + JOB_ID_FILE_EXTENSION, 'w') as file:
+        file.write(job_id + '\n')
+
+
+def load_job_id(script_path):
+    '''Returns the id of the last job of a script or None if it has no job id file.'''
+
+    job_id_file_path = script_path + JOB_ID_FILE_EXTENSION
 
-            # if not parallel, then wait until current process is finished
-            if not is_parallel:
-                process.wait()
+    if not os.path.isfile(job_id_file_path):
+        return None
+
+    with open(job_id_file_path, 'r') as file:
+        return file.read().strip() or None
+
+
+def expand_job_ids(job_id):
+    '''
+    Returns the ids of the jobs or array tasks that a job id of the queue or of a job id file stands for, in the form
+    '<job>' or '<job>_<task>'. The server name is removed and ranges of array tasks are expanded, e.g.
+    '123.server' -> ['123'], '123[4].server' -> ['123_4'], '123_[1-3,7%2]' -> ['123_1', '123_2', '123_3', '123_7'].
+    A job id without task (e.g. '123' or '123[]') stands for all tasks of the job.
+    '''
+
+    match = re.match(r'^(\d+)(?:_\[?([^\]]*)\]?|\[([^\]]*)\])?(?:\..*)?$', job_id)
+    if match is None:
+        return [job_id]
+
+    base_job_id = match.group(1)
+    task_ids = match.group(2) if match.group(2) is not None else match.group(3)
+
+    if not task_ids:
+        return [base_job_id]
+
+    job_ids = []
+    # slurm ranges: '<first>-<last>[:<step>]' separated by ',', with an optional limit of running tasks ('%<n>')
+    for task_range in task_ids.split('%')[0].split(','):
+        task_range, _, step = task_range.partition(':')
+        first, _, last = task_range.partition('-')
+        for task_id in range(int(first), int(last or first) + 1, int(step or 1)):
+            job_ids.append('{}_{}'.format(base_job_id, task_id))
+
+    return job_ids
+
+
+def get_base_job_ids(job_ids):
+    '''Returns the set of the jobs of expanded job ids, i.e. array task ids are reduced to their job, '123_4' -> '123'.'''
+    return set(job_id.split('_', 1)[0] for job_id in job_ids)
+
+
+def is_job_queued(job_id, queued_job_ids, queued_base_job_ids=None):
+    '''
+    Returns True if a job or array task is in the queue.
+
+    :param job_id: Job id, e.g. of a job id file.
+    :param queued_job_ids: Set with the expanded job ids of the queue (see expand_job_ids).
+    :param queued_base_job_ids: Set with the jobs of the queued job ids (see get_base_job_ids). Give it when many job
+                                ids are checked against the same queue, otherwise it is built for each call.
+    '''
+
+    if queued_base_job_ids is None:
+        queued_base_job_ids = get_base_job_ids(queued_job_ids)
+
+    for expanded_job_id in expand_job_ids(job_id):
+        base_job_id = expanded_job_id.split('_', 1)[0]
+
+        # a queued job without task stands for all its tasks, a job id without task for all queued tasks of the job
+        if expanded_job_id in queued_job_ids or base_job_id in queued_job_ids:
+            return True
+        if expanded_job_id == base_job_id and base_job_id in queued_base_job_ids:
+            return True
+
+    return False
+
+
+def get_queued_job_ids(queue_command='squeue', scheduler='slurm'):
+    '''
+    Requests the ids of the pending and running jobs from the queue of a scheduler with a single call.
+
+    :param queue_command: Command to list the queue, e.g. 'squeue' for slurm or 'qstat' for torque.
+    :param scheduler: 'slurm' or 'torque'. Defines the arguments and the parsing of the output.
+    :return: List with the job ids.
+    '''
+
+    if scheduler == 'slurm':
+        arguments = ['--noheader', '--format=%i %t']
+        if os.environ.get('USER'):
+            arguments.append('--user={}'.format(os.environ['USER']))
+        state_idx = 1
+    elif scheduler == 'torque':
+        arguments = []
+        state_idx = 4
+    else:
+        raise ValueError('Unknown scheduler {!r}!'.format(scheduler))
+
+    process = subprocess.run(queue_command.split() + arguments, stdout=subprocess.PIPE, universal_newlines=True)
+    if process.returncode != 0:
+        raise ValueError('Could not request the job queue with {!r} (return code: {})!'.format(queue_command, process.returncode))
+
+    job_ids = []
+    for line in process.stdout.splitlines():
+        words = line.split()
+        # ignore header lines
+        if len(words) > state_idx and words[0][0].isdigit() and words[state_idx] in QUEUED_JOB_STATES[scheduler]:
+            job_ids.append(words[0])
+
+    return job_ids
+
+
+def submit_slurm_job_arrays(script_paths, job_array_directory, max_array_size=None, sbatch_command='sbatch', verbose=False, post_start_wait_time=0, env=None):
+    '''
+    Submits SLURM start scripts as job arrays, so that a few scheduler calls submit many scripts.
+
+    Scripts whose #SBATCH options are the same (without the job name and output options) are grouped into arrays of at
+    most max_array_size tasks. For each array an index file lists the script paths, where line i+1 belongs to the
+    array task id i, and an array script runs the script of its task in the directory of the script. The output of
+    each script is written to '<script>.out' and '<script>.err'. The job id of each script is '<array job id>_<task id>'.
+
+    :return: List with a dictionary for each array: 'array_script', 'index_file', 'script_paths', 'returncode' of the
+             submission and the 'job_id' (None if it could not be parsed).
+    '''
+
+    if max_array_size is None:
+        max_array_size = get_slurm_max_array_size()
+
+    if not os.path.isdir(job_array_directory):
+        os.makedirs(job_array_directory)
+
+    # group the scripts by their options
+    groups = OrderedDict()
+    for script_path in script_paths:
+        groups.setdefault(get_slurm_job_array_options(script_path), []).append(os.path.abspath(script_path))
+
+    # unique names, because index files must stay until all tasks of earlier arrays have started, also if several
+    # calls run at the same time, the index file is created exclusively and its name is used for the array script
+    name_prefix = 'job_array_{}_'.format(time.strftime('%Y%m%d_%H%M%S'))
+
+    job_arrays = []
+    for options, group_script_paths in groups.items():
+        for start_idx in range(0, len(group_script_paths), max_array_size):
+
+            array_script_paths = group_script_paths[start_idx:start_idx + max_array_size]
+
+            index_file, index_file_path = tempfile.mkstemp(suffix='.index', prefix=name_prefix, dir=job_array_directory)
+            index_file_path = os.path.abspath(index_file_path)
+            array_script_path = index_file_path[:-len('.index')] + '.array'
+
+            with os.fdopen(index_file, 'w') as file:
+                file.write(''.join(script_path + '\n' for script_path in array_script_paths))
+
+            with open(array_script_path, 'w') as file:
+                file.write(SLURM_JOB_ARRAY_SCRIPT_TEMPLATE.format(options=''.join(option + '\n' for option in options),
+                                                                  last_task_id=len(array_script_paths) - 1,
+                                                                  index_file_path=index_file_path))
+
+            if verbose:
+                print('submit job array {!r} with {} scripts ...'.format(array_script_path, len(array_script_paths)))
+
+            process = subprocess.run(sbatch_command.split() + [array_script_path], cwd=job_array_directory, stdout=subprocess.PIPE, universal_newlines=True, env=env)
+            job_id = parse_job_id(process.stdout)
+
+            if process.returncode == 0 and job_id is not None:
+                for task_id, script_path in enumerate(array_script_paths):
+                    save_job_id(script_path, '{}_{}'.format(job_id, task_id))
+
+            job_arrays.append(dict(array_script=array_script_path,
+                                   index_file=index_file_path,
+                                   script_paths=array_script_paths,
+                                   returncode=process.returncode,
+                                   job_id=job_id))
 
             if post_start_wait_time > 0:
                 time.sleep(post_start_wait_time)
 
-            processes.append(process)
+    return job_arrays
 
-            if is_chdir:
-                os.chdir(cwd)
 
-        else:
-            ignored_scripts.append((script_path, status))
+# script of a slurm job array, its task id selects the line of the index file with the start script
+SLURM_JOB_ARRAY_SCRIPT_TEMPLATE = '''#!/bin/bash
+{options}#SBATCH --array=0-{last_task_id}
 
-    if verbose:
+SCRIPT_PATH=$(sed -n "$((SLURM_ARRAY_TASK_ID + 1))p" "{index_file_path}")
+SCRIPT_NAME=$(basename "$SCRIPT_PATH")
 
-        if ignored_scripts:
-            print('Ignored scripts:')
+cd "$(dirname "$SCRIPT_PATH")"
+bash "./$SCRIPT_NAME" > "$SCRIPT_NAME.out" 2> "$SCRIPT_NAME.err"
+'''
 
-            for [script_path, status] in ignored_scripts:
-                print('\t- {!r} (status: {})'.format(script_path, status))
+# options of start scripts that are specific for each script and not used for job arrays
+SLURM_SCRIPT_SPECIFIC_OPTIONS = ['-o', '--output', '-e', '--error', '-J', '--job-name', '-a', '--array']
+
+
+def get_slurm_job_array_options(script_path):
+    '''Returns the #SBATCH lines of a script that are used for a job array, i.e. without the script specific options.'''
+
+    options = []
+    with open(script_path, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if line.startswith('#SBATCH'):
+                option_name = line[len('#SBATCH'):].split()[0].split('=')[0] if len(line.split()) > 1 else ''
+                if option_name not in SLURM_SCRIPT_SPECIFIC_OPTIONS:
+                    options.append(line)
+
+    return tuple(options)
+
+
+def get_slurm_max_array_size(default=1001):
+    '''Returns the maximum number of tasks of a job array according to the SLURM configuration (MaxArraySize).'''
+
+    try:
+        output = subprocess.run(['scontrol', 'show', 'config'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True).stdout
+    except OSError:
+        return default
+
+    for line in output.splitlines():
+        if line.strip().startswith('MaxArraySize'):
+            try:
+                return int(line.split('=')[1])
+            except (IndexError, ValueError):
+                return default
+
+    return default
+
+
+def parse_job_id(submit_output):
+    '''
+    Returns the job id from the output of sbatch ('Submitted batch job <id>' or '<id>[;cluster]' with --parsable)
+    or qsub ('<id>.<server>').
+    '''
+
+    for line in (submit_output or '').splitlines():
+        words = line.strip().split()
+        if words:
+            job_id = words[-1].split(';')[0]
+            if job_id[0].isdigit():
+                return job_id
+
+    return None
+
+
+async def start_experiments_async(directory='.', start_scripts='*.sh', start_command='{}', max_workers=None, is_log_output=True, verbose=False):
+    '''
+    Starts the scripts like start_experiments, but as an asynchronous generator that yields status events while the
+    scripts run (see run_scripts_async).
+
+    Example:
+
+        async def main():
+            async for event in exputils.experimentstarter.start_experiments_async('experiments', max_workers=8):
+                print(event['event'], event['script_path'])
+
+        asyncio.run(main())
+
+    If the generator is closed or cancelled (e.g. by Ctrl-C in asyncio.run), the running scripts are terminated.
+    '''
+
+    start_script_paths = find_start_scripts(directory=directory, start_scripts=start_scripts, verbose=verbose)
+
+    events = run_scripts_async(start_script_paths, start_command=start_command, max_workers=max_workers, is_log_output=is_log_output)
+    try:
+        async for event in events:
+            yield event
+    finally:
+        await events.aclose()
+
+
+async def run_scripts_async(script_paths, start_command='{}', max_workers=None, is_log_output=True, terminate_timeout=5):
+    '''
+    Runs scripts as asyncio subprocesses and yields an event dictionary whenever a script starts or finishes:
+
+        dict(event='started', script_path=..., pid=...)
+        dict(event='finished', script_path=..., returncode=..., wall_time=...)
+        dict(event='error', script_path=..., error=...) if the script could not be started
+
+    :param max_workers: Maximum number of scripts that run at the same time. None for no limit.
+    :param is_log_output: If True, the stdout and stderr of each script are written to '<script>.out' and '<script>.err'.
+    :param terminate_timeout: Time in seconds that running scripts get to stop after a termination signal when the
+                              generator is closed or cancelled. Afterwards they are killed.
+    '''
+
+    events = asyncio.Queue()
+    semaphore = asyncio.Semaphore(max_workers) if max_workers is not None else None
+
+    # running processes with key=script path
+    processes = dict()
+
+    async def run(script_path):
+        try:
+            if semaphore is None:
+                await run_process(script_path)
+            else:
+                async with semaphore:
+                    await run_process(script_path)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            await events.put(dict(event='error', script_path=script_path, error=error))
+
+    async def run_process(script_path):
+
+        script_directory = os.path.dirname(os.path.abspath(script_path))
+        args = start_command.format(os.path.abspath(script_path)).split()
+
+        with contextlib.ExitStack() as stack:
+
+            if is_log_output:
+                stdout = stack.enter_context(open(script_path + '.out', 'wb'))
+                stderr = stack.enter_context(open(script_path + '.err', 'wb'))
+            else:
+                stdout = subprocess.DEVNULL
+                stderr = subprocess.DEVNULL
+
+            start_time = time.time()
+            process = await asyncio.create_subprocess_exec(*args, cwd=script_directory, stdout=stdout, stderr=stderr)
+            processes[script_path] = process
+
+            await events.put(dict(event='started', script_path=script_path, pid=process.pid))
+
+            returncode = await process.wait()
+            del processes[script_path]
+
+        await events.put(dict(event='finished', script_path=script_path, returncode=returncode, wall_time=time.time() - start_time))
+
+    tasks = [asyncio.ensure_future(run(script_path)) for script_path in script_paths]
+
+    try:
+        n_finished_scripts = 0
+        while n_finished_scripts < len(tasks):
+            event = await events.get()
+            if event['event'] != 'started':
+                n_finished_scripts += 1
+            yield event
+
+    finally:
+        for task in tasks:
+            task.cancel()
+
+        # terminate the running scripts and wait for them, so that no zombie processes remain
+        running_processes = [process for process in processes.values() if process.returncode is None]
+
+        for process in running_processes:
+            try:
+                process.terminate()
+            except ProcessLookupError:
+                pass
+
+        if running_processes:
+            done, not_done = await asyncio.wait([asyncio.ensure_future(process.wait()) for process in running_processes], timeout=terminate_timeout)
+
+            if not_done:
+                for process in running_processes:
+                    if process.returncode is None:
+                        process.kill()
+                await asyncio.wait(not_done)
 
-    # wait until all processes are finished
-    for process in processes:
-        process.wait()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -35,3 +35,73 @@ def numpy_vstack_2d_default(array1, array2, default_value=np.nan):
         new_values[:] = default_value
 
         return np.vstack((np.hstack((array1, new_values)), array2))
+
+
+def numpy_vstack_2d_default_batch(arrays, default_value=np.nan, dtype=None, is_masked=False, out=None):
+    '''
+    Stacks many 1d or 2d arrays of different lengths as rows of a matrix, like repeated calls of
+    numpy_vstack_2d_default, but allocates the matrix only once.
+
+    :param arrays: List or generator of 1d arrays (one row) or 2d arrays (several rows). Empty arrays are ignored.
+    :param default_value: Value for the missing columns of shorter rows.
+    :param dtype: Type of the matrix. Default: the common type of the arrays, and of the default value if rows are padded.
+    :param is_masked: If True, a masked array is returned whose missing columns are masked. Then, the type of the
+                      arrays is kept and the missing columns are set to the default value only if it fits the type,
+                      otherwise to 0.
+    :param out: Optional pre-allocated matrix with the final shape that is filled and returned.
+    :return: Matrix with a row for each row of the arrays.
+    '''
+
+    # the rows are only referenced, so that a generator is gone through once
+    matrices = []
+    for array in arrays:
+        array = np.asarray(array)
+
+        if len(array) == 0:
+            continue
+
+        if array.ndim == 1:
+            array = np.reshape(array, (1, len(array)))
+        elif array.ndim != 2:
+            raise ValueError('Only 1d and 2d arrays can be stacked!')
+
+        matrices.append(array)
+
+    n_rows = sum(matrix.shape[0] for matrix in matrices)
+    n_columns = max((matrix.shape[1] for matrix in matrices), default=0)
+    is_padded = any(matrix.shape[1] < n_columns for matrix in matrices)
+
+    if dtype is None:
+        dtype = np.result_type(*matrices) if matrices else np.asarray(default_value).dtype
+        if is_padded and not is_masked:
+            dtype = np.result_type(dtype, np.asarray(default_value).dtype)
+
+    fill_value = default_value
+    if is_masked and np.result_type(dtype, np.asarray(default_value).dtype).kind != np.dtype(dtype).kind:
+        fill_value = 0
+
+    if out is None:
+        out = np.empty((n_rows, n_columns), dtype=dtype)
+    elif out.shape != (n_rows, n_columns):
+        raise ValueError('The out matrix has shape {} instead of {}!'.format(out.shape, (n_rows, n_columns)))
+
+    mask = np.zeros((n_rows, n_columns), dtype=bool) if is_masked else None
+
+    # each element is written once
+    row_idx = 0
+    for matrix in matrices:
+        n_matrix_rows, n_matrix_columns = matrix.shape
+
+        out[row_idx:row_idx + n_matrix_rows, :n_matrix_columns] = matrix
+
+        if n_matrix_columns < n_columns:
+            out[row_idx:row_idx + n_matrix_rows, n_matrix_columns:] = fill_value
+            if is_masked:
+                mask[row_idx:row_idx + n_matrix_rows, n_matrix_columns:] = True
+
+        row_idx += n_matrix_rows
+
+    if is_masked:
+        return np.ma.masked_array(out, mask=mask)
+
+    return out
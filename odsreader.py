@@ -19,9 +19,12 @@
 #  - removed getSheet method
 #  - renamed ODSReader.SHEETS to ODSReader.sheets
 #  - read out c.data instead of n.data in line 82
+#  - added StreamingODSReader
 
 # Thanks to grt for the fixes
 
+import zipfile
+from xml.etree import ElementTree
 import odf.opendocument
 from odf.table import Table, TableRow, TableCell
 from odf.text import P
@@ -102,4 +105,126 @@ class ODSReader:
             #else:
             #    print ("Empty or commented row (", row_comment, ")")
 
-        self.sheets[name] = arrRows
\ No newline at end of file
+        self.sheets[name] = arrRows
+
+class StreamingODSReader:
+    '''
+    Reads the sheets of an ODS file like the ODSReader, but streams the content.xml out of the zip file with an
+    incremental XML parser instead of loading the whole document. Processed rows are released directly and repeated
+    empty cells are only counted, which keeps memory low for large spreadsheets.
+
+    :param file: Path or file object of the ODS file.
+    :param clonespannedcolumns: Same as for the ODSReader.
+    :param sheet_names: Name or list of names of the sheets that are read. If None, then all sheets are read.
+    :param row_range: Optional (start, stop) tuple to read only the rows with start <= index < stop of each sheet.
+                      Indexes refer to the rows in the sheets property, i.e. without empty rows.
+    '''
+
+    table_namespace = 'urn:oasis:names:tc:opendocument:xmlns:table:1.0'
+    text_namespace = 'urn:oasis:names:tc:opendocument:xmlns:text:1.0'
+
+    table_tag = '{{{}}}table'.format(table_namespace)
+    row_tag = '{{{}}}table-row'.format(table_namespace)
+    cell_tag = '{{{}}}table-cell'.format(table_namespace)
+    p_tag = '{{{}}}p'.format(text_namespace)
+    span_tag = '{{{}}}span'.format(text_namespace)
+
+    name_attribute = '{{{}}}name'.format(table_namespace)
+    repeated_attribute = '{{{}}}number-columns-repeated'.format(table_namespace)
+    spanned_attribute = '{{{}}}number-columns-spanned'.format(table_namespace)
+
+    def __init__(self, file, clonespannedcolumns=None, sheet_names=None, row_range=None):
+        self.clonespannedcolumns = clonespannedcolumns
+
+        if isinstance(sheet_names, str):
+            sheet_names = [sheet_names]
+        self.sheet_names = sheet_names
+
+        self.row_range = row_range
+
+        self.sheets = {}
+
+        with zipfile.ZipFile(file) as zip_file:
+            with zip_file.open('content.xml') as content_file:
+                self.readContent(content_file)
+
+    def readContent(self, content_file):
+
+        name = None
+        table = None
+        arrRows = None
+        row_idx = 0
+
+        for event, elem in ElementTree.iterparse(content_file, events=('start', 'end')):
+
+            if elem.tag == self.table_tag:
+                if event == 'start':
+                    name = elem.get(self.name_attribute)
+                    table = elem
+                    arrRows = [] if self.sheet_names is None or name in self.sheet_names else None
+                    row_idx = 0
+                else:
+                    if arrRows is not None:
+                        self.sheets[name] = arrRows
+                    table = None
+                    elem.clear()
+
+                    # stop if all requested sheets are read
+                    if self.sheet_names is not None and all(sheet_name in self.sheets for sheet_name in self.sheet_names):
+                        break
+
+            elif elem.tag == self.row_tag and event == 'end' and table is not None:
+
+                if arrRows is not None and (self.row_range is None or row_idx < self.row_range[1]):
+                    arrCells = self.readRow(elem)
+
+                    # if row contained something
+                    if len(arrCells):
+                        if self.row_range is None or row_idx >= self.row_range[0]:
+                            arrRows.append(arrCells)
+                        row_idx += 1
+
+                # release the processed rows
+                elem.clear()
+                table.clear()
+
+    # reads a row into an array of cells, in the same way as ODSReader.readSheet
+    def readRow(self, row):
+        arrCells = GrowingList()
+
+        count = 0
+        for cell in row.iter(self.cell_tag):
+            # repeated value?
+            repeat = cell.get(self.repeated_attribute)
+            if not repeat:
+                repeat = 1
+                spanned = int(cell.get(self.spanned_attribute) or 0)
+                # clone spanned cells
+                if self.clonespannedcolumns is not None and spanned > 1:
+                    repeat = spanned
+
+            # text and span text that are direct children of the paragraphs
+            texts = []
+            for p in cell.iter(self.p_tag):
+                if p.text:
+                    texts.append(p.text)
+                for n in p:
+                    if n.tag == self.span_tag:
+                        if n.text:
+                            texts.append(n.text)
+                        for c in n:
+                            if c.tail:
+                                texts.append(c.tail)
+                    if n.tail:
+                        texts.append(n.tail)
+            textContent = ''.join(texts)
+
+            # ignore comments cells, and only count empty cells without expanding them
+            if textContent and textContent[0] != "#":
+                for rr in range(int(repeat)):
+                    arrCells[count] = textContent
+                    count += 1
+            elif not textContent:
+                count += int(repeat)
+
+        return arrCells
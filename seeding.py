@@ -1,14 +1,137 @@
 import numpy as np
 import random
-import torch
+
+# torch is optional, without it only the python and numpy generators are seeded
+try:
+    import torch
+except ImportError:
+    torch = None
+
+# entry of the spawn key of a SeedSequence for an id that is not given (see get_seed_sequence)
+ABSENT_SEED_ID = 2**32 - 1
 
 
 def set_seed(seed):
     seed = int(seed)
-    torch.manual_seed(seed)
-    torch.cuda.manual_seed(seed)
-    torch.cuda.manual_seed_all(seed)  # if you are using multi-GPU.
+    if torch is not None:
+        torch.manual_seed(seed)
+        torch.cuda.manual_seed(seed)
+        torch.cuda.manual_seed_all(seed)  # if you are using multi-GPU.
     np.random.seed(seed)  # Numpy module.
     random.seed(seed)  # Python random module.
-    torch.backends.cudnn.benchmark = False
-    torch.backends.cudnn.deterministic = True
+    if torch is not None:
+        torch.backends.cudnn.benchmark = False
+        torch.backends.cudnn.deterministic = True
+
+
+def get_seed_sequence(root_seed, experiment_id=None, repetition_id=None, worker_id=None):
+    '''
+    Returns the numpy SeedSequence of an experiment, repetition or worker that is derived from the root seed of a
+    campaign. Sequences with different ids are independent, as if they were spawned from the root sequence, so
+    repetitions that run in parallel or one after another in the same process do not have correlated random numbers.
+
+    The spawn key has always one entry per level, with ABSENT_SEED_ID for ids that are None, so that for example the
+    sequence of experiment 2 differs from the sequence of repetition 2 without experiment id. Because of the fixed
+    length, the sequences also differ from the children that are spawned from them, e.g. the children of experiment 1
+    are not the sequences of the repetitions of experiment 1.
+    '''
+
+    spawn_key = []
+    for level_id in [experiment_id, repetition_id, worker_id]:
+        if level_id is None:
+            spawn_key.append(ABSENT_SEED_ID)
+        else:
+            level_id = int(level_id)
+            if level_id < 0 or level_id >= ABSENT_SEED_ID:
+                raise ValueError('Ids must be in [0, {}), but {} is given!'.format(ABSENT_SEED_ID, level_id))
+            spawn_key.append(level_id)
+
+    return np.random.SeedSequence(int(root_seed), spawn_key=tuple(spawn_key))
+
+
+def get_generator(root_seed, experiment_id=None, repetition_id=None, worker_id=None):
+    '''Returns an independent numpy Generator for an experiment, repetition or worker (see get_seed_sequence).'''
+    return np.random.Generator(np.random.PCG64(get_seed_sequence(root_seed, experiment_id, repetition_id, worker_id)))
+
+
+def spawn_generators(n_generators, root_seed, experiment_id=None, repetition_id=None):
+    '''Returns independent numpy Generators for n workers of an experiment or repetition.'''
+    return [get_generator(root_seed, experiment_id, repetition_id, worker_id) for worker_id in range(n_generators)]
+
+
+def set_seed_sequence(seed_sequence):
+    '''
+    Seeds the global random number generators of python, numpy and torch (if installed) with seeds that are generated
+    by a numpy SeedSequence, instead of a single integer as set_seed does.
+    '''
+
+    python_seed, numpy_seed, torch_seed = [int(state) for state in seed_sequence.generate_state(3, dtype=np.uint64)]
+
+    random.seed(python_seed)
+    np.random.seed(numpy_seed % 2**32)
+    if torch is not None:
+        torch.manual_seed(torch_seed % 2**63)
+        torch.cuda.manual_seed_all(torch_seed % 2**63)
+        torch.backends.cudnn.benchmark = False
+        torch.backends.cudnn.deterministic = True
+
+
+def set_experiment_seed(root_seed, experiment_id=None, repetition_id=None, worker_id=None):
+    '''
+    Seeds the global random number generators of python, numpy and torch (if installed) for an experiment, repetition or worker from
+    the root seed of a campaign, e.g. in an experiment template: set_experiment_seed(42, <experiment_id>, <repetition_id>)
+
+    :return: Independent numpy Generator for the experiment, repetition or worker.
+    '''
+
+    seed_sequence = get_seed_sequence(root_seed, experiment_id, repetition_id, worker_id)
+
+    # the global generators and the returned generator get different children of the sequence
+    global_seed_sequence, generator_seed_sequence = seed_sequence.spawn(2)
+
+    set_seed_sequence(global_seed_sequence)
+
+    return np.random.Generator(np.random.PCG64(generator_seed_sequence))
+
+
+def get_rng_state(generators=None):
+    '''
+    Returns the state of the global random number generators of python, numpy and torch (None if it is not
+    installed), and of the given numpy Generators, e.g. to store it in a checkpoint.
+
+    :param generators: Optional list of numpy Generators.
+    :return: Dictionary with the states.
+    '''
+
+    state = dict(python=random.getstate(),
+                 numpy=np.random.get_state(),
+                 torch=torch.get_rng_state() if torch is not None else None,
+                 torch_cuda=torch.cuda.get_rng_state_all() if torch is not None and torch.cuda.is_available() else None,
+                 generators=[generator.bit_generator.state for generator in generators or []])
+
+    return state
+
+
+def set_rng_state(state, generators=None):
+    '''
+    Restores the state of the global random number generators and of the given numpy Generators (see get_rng_state).
+
+    :param generators: Optional list of numpy Generators in the same order as for get_rng_state.
+    '''
+
+    generators = generators or []
+
+    if len(generators) != len(state['generators']):
+        raise ValueError('The state has {} generators, but {} are given!'.format(len(state['generators']), len(generators)))
+
+    random.setstate(state['python'])
+    np.random.set_state(state['numpy'])
+    if state['torch'] is not None:
+        if torch is None:
+            raise ValueError('The state contains a torch state, but torch is not installed!')
+        torch.set_rng_state(state['torch'])
+    if state['torch_cuda'] is not None and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['torch_cuda'])
+
+    for generator, generator_state in zip(generators, state['generators']):
+        generator.bit_generator.state = generator_state
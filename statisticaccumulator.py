@@ -0,0 +1,178 @@
+import numpy as np
+from collections import OrderedDict
+
+# Accumulators aggregate the values of repetitions one after another, so that the data of all repetitions does not
+# need to be in memory at the same time (see calc_statistics_over_repetitions with statistics of type 'streaming').
+# Each accumulator has the methods add(value), merge(other) to combine accumulators of different parts of the
+# repetitions, and result() that returns an array or a dictionary of arrays.
+
+
+class MeanVarianceAccumulator:
+    '''
+    Elementwise count, mean, variance and standard deviation of the values over the repetitions with Welford's
+    algorithm. All values must have the same shape.
+
+    :param ddof: Delta degrees of freedom of the variance, as for np.var.
+    '''
+
+    def __init__(self, ddof=0):
+        self.ddof = ddof
+        self.count = 0
+        self.mean = None
+        self.m2 = None
+
+    def add(self, value):
+        value = np.asarray(value, dtype=float)
+
+        if self.count == 0:
+            self.count = 1
+            self.mean = value.copy()
+            self.m2 = np.zeros_like(value)
+        else:
+            self.count += 1
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (value - self.mean)
+
+    def merge(self, other):
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean.copy(), other.m2.copy()
+            return
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * other.count / count
+        self.m2 = self.m2 + other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+
+    def result(self):
+        if self.count == 0:
+            raise ValueError('No values were added to the accumulator!')
+
+        var = self.m2 / (self.count - self.ddof) if self.count > self.ddof else np.full_like(self.m2, np.nan)
+
+        return OrderedDict([('count', np.array(self.count)), ('mean', self.mean), ('var', var), ('std', np.sqrt(var))])
+
+
+class MinMaxAccumulator:
+    '''Elementwise minimum and maximum of the values over the repetitions. All values must have the same shape.'''
+
+    def __init__(self):
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        value = np.asarray(value)
+
+        if self.min is None:
+            self.min = value.copy()
+            self.max = value.copy()
+        else:
+            self.min = np.minimum(self.min, value)
+            self.max = np.maximum(self.max, value)
+
+    def merge(self, other):
+        if other.min is not None:
+            self.add(other.min)
+            self.add(other.max)
+
+    def result(self):
+        if self.min is None:
+            raise ValueError('No values were added to the accumulator!')
+
+        return OrderedDict([('min', self.min), ('max', self.max)])
+
+
+class HistogramAccumulator:
+    '''
+    Histogram over all elements of the values of the repetitions with fixed bins, so that the counts of the
+    repetitions can be added.
+
+    :param bins: Edges of the bins, or the number of bins if value_range is given.
+    :param value_range: Tuple (lower, upper) of the range of the bins if bins is a number.
+    '''
+
+    def __init__(self, bins=10, value_range=None):
+        if np.ndim(bins) == 0:
+            if value_range is None:
+                raise ValueError('The value_range is needed for a number of bins!')
+            bins = np.linspace(value_range[0], value_range[1], int(bins) + 1)
+
+        self.bin_edges = np.asarray(bins, dtype=float)
+        self.counts = np.zeros(len(self.bin_edges) - 1, dtype=np.int64)
+
+    def add(self, value):
+        counts, _ = np.histogram(np.ravel(value), bins=self.bin_edges)
+        self.counts += counts
+
+    def merge(self, other):
+        if not np.array_equal(self.bin_edges, other.bin_edges):
+            raise ValueError('Only histograms with the same bins can be merged!')
+        self.counts += other.counts
+
+    def result(self):
+        return OrderedDict([('counts', self.counts.copy()), ('bin_edges', self.bin_edges.copy())])
+
+
+class QuantileAccumulator:
+    '''
+    Approximate quantiles over all elements of the values of the repetitions. A uniform random sample of at most
+    max_samples elements is kept (reservoir sampling), so that the memory does not grow with the number of values.
+    The quantiles are exact as long as fewer elements than max_samples were added.
+
+    :param quantiles: Quantiles in [0, 1] that are calculated.
+    :param max_samples: Maximum number of kept elements.
+    :param seed: Seed of the random sampling.
+    '''
+
+    def __init__(self, quantiles=(0.25, 0.5, 0.75), max_samples=100000, seed=None):
+        self.quantiles = np.asarray(quantiles, dtype=float)
+        self.max_samples = max_samples
+        self.random_state = np.random.RandomState(seed)
+        self.count = 0
+        self.samples = np.zeros(0)
+
+    def add(self, value):
+        self._add_samples(np.ravel(np.asarray(value, dtype=float)), weight_count=None)
+
+    def merge(self, other):
+        self._add_samples(other.samples, weight_count=other.count)
+
+    def _add_samples(self, values, weight_count=None):
+        '''Adds values that represent weight_count elements (default: the number of values).'''
+
+        if weight_count is None:
+            weight_count = len(values)
+
+        if weight_count == 0:
+            return
+
+        total_count = self.count + weight_count
+
+        if total_count <= self.max_samples:
+            self.samples = np.concatenate((self.samples, values))
+
+        else:
+            # each kept sample represents an equal share of the elements of its part
+            n_new_samples = self.random_state.binomial(self.max_samples, weight_count / total_count)
+            n_old_samples = self.max_samples - n_new_samples
+
+            old_samples = self.samples
+            if len(old_samples) > n_old_samples:
+                old_samples = self.random_state.choice(old_samples, n_old_samples, replace=False)
+
+            new_samples = values
+            if len(new_samples) > n_new_samples:
+                new_samples = self.random_state.choice(new_samples, n_new_samples, replace=False)
+
+            self.samples = np.concatenate((old_samples, new_samples))
+
+        self.count = total_count
+
+    def result(self):
+        if self.count == 0:
+            raise ValueError('No values were added to the accumulator!')
+
+        return OrderedDict([('quantiles', self.quantiles.copy()), ('values', np.quantile(self.samples, self.quantiles))])
@@ -1,15 +1,50 @@
 import numpy as np
 import os
 import glob
+import shutil
 import zipfile
+import collections.abc
+import concurrent.futures
+import hashlib
+import json
+import pickle
+import re
+import sys
+import types
+from collections import OrderedDict
 
-def calc_experiment_statistics(statistics, load_experiment_data_func,  *args, statistics_directory='statistics', recalculate_statistics=False, verbose=False):
+# file in each statistics directory with the dependencies (input files and function) of each statistic
+STATISTICS_METADATA_FILENAME = '.statistics_metadata.json'
+
+# file in a consolidated statistics store with the experiment and repetition of each row and the shapes of the values
+STATISTICS_STORE_INDEX_FILENAME = 'index.json'
+
+# suggested file name for a persisted campaign index (see build_campaign_index)
+CAMPAIGN_INDEX_FILENAME = '.campaign_index.json'
+
+# returned by DataCache._load_from_disk if the data is not cached, because the loaded data itself can be None
+_DATA_CACHE_MISS = object()
+
+def calc_experiment_statistics(statistics, load_experiment_data_func,  *args, statistics_directory='statistics', recalculate_statistics=False, verbose=False, n_jobs=None, executor=None, campaign_index=None):
     '''
 
     :param statistics: List with tuples of the form: (statistic name, statistic function)
     :param args: Directoryies in which the experiments are for which the statistics should be computed.
     :param results_directory:
     :param statistics_directory:
+    :param recalculate_statistics: True to recalculate all statistics, False to calculate only missing statistics.
+                                   'outdated' to also recalculate statistics whose dependencies changed (see
+                                   is_statistic_outdated), i.e. the files in the experiment folder or the statistic
+                                   function. Its version can be given via a 'version' key of the statistic definition.
+    :param n_jobs: Number of worker processes that calculate the statistics of different experiment folders in parallel.
+                   None or 1 calculates them serially, -1 uses one process per CPU. The data loading and statistic
+                   functions must be picklable, i.e. defined at the top level of a module.
+    :param executor: Optional concurrent.futures.Executor (for example a ThreadPoolExecutor) that is used instead of
+                     the process pool defined by n_jobs.
+                     If statistics are calculated in parallel, errors are collected and raised together as a
+                     StatisticCalculationError after all experiment folders were processed.
+    :param campaign_index: Optional CampaignIndex (see build_campaign_index) that contains the directories, so that the
+                           folders are not searched again. Otherwise a CampaignIndex is built for each directory.
     :return:
     '''
 
@@ -20,13 +55,6 @@ def calc_experiment_statistics(statistics, load_experiment_data_func,  *args, st
     else:
         experiments = list(args)
 
-    def get_data(data, experiment_folder):
-        '''Loads the data if the data is not already loaded'''
-        if data is None:
-            data = load_experiment_data_func(experiment_folder)
-        return data
-
-
     # identify the experiment folders
     experiment_folders = []
     for folder in experiments:
@@ -37,17 +65,17 @@ def calc_experiment_statistics(statistics, load_experiment_data_func,  *args, st
         # then take the base directory and search in it
         # this makes sure, that also the direct given folder is looked after, e.g. './experiment_000001' would also be identified
         basedir = os.path.dirname(os.path.join(folder, ''))
-        directory_name = os.path.basename(os.path.dirname(basedir))
+        directory_name = os.path.basename(basedir)
 
         # look if directory itself is a repetition experiment
         if directory_name.find('repetition_') >=0 and os.path.isdir(basedir):
             found_folders.append(basedir)
 
         # look if there are repetition folders somewhere inside the directory
+        # the directory tree is only walked if this search is needed
         if not found_folders:
-            for foldername in glob.iglob(os.path.join(basedir,'**','repetition_*'), recursive=True):
-                if os.path.isdir(foldername):
-                    found_folders.append(foldername)
+            folder_index = campaign_index if campaign_index is not None else build_campaign_index(basedir, statistics_directory=statistics_directory)
+            found_folders.extend(folder_index.get_repetition_directories(basedir))
 
         # if there are no repetitions, then search for experiment folder
         if not found_folders:
@@ -55,9 +83,7 @@ def calc_experiment_statistics(statistics, load_experiment_data_func,  *args, st
                 found_folders.append(basedir)
 
         if not found_folders:
-            for foldername in glob.iglob(os.path.join(basedir, '**', 'experiment_*'), recursive=True):
-                if os.path.isdir(foldername):
-                    found_folders.append(foldername)
+            found_folders.extend(folder_index.get_experiment_directories(basedir))
 
         if not found_folders:
             # assume the given folder is the the one
@@ -65,88 +91,594 @@ def calc_experiment_statistics(statistics, load_experiment_data_func,  *args, st
 
         experiment_folders.extend(found_folders)
 
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+
+    own_executor = None
+    if executor is None and n_jobs is not None and n_jobs > 1:
+        own_executor = concurrent.futures.ProcessPoolExecutor(max_workers=n_jobs)
+        executor = own_executor
+
     # calc statistic if it does not exist already
-    for experiment_folder in sorted(experiment_folders):
+    if executor is None:
+        for experiment_folder in sorted(experiment_folders):
+            calc_statistics_of_experiment_folder(experiment_folder, statistics, load_experiment_data_func,
+                                                 statistics_directory=statistics_directory,
+                                                 recalculate_statistics=recalculate_statistics,
+                                                 verbose=verbose)
 
-        data = None
+    else:
+        errors = OrderedDict()
 
-        directory = os.path.join(experiment_folder, statistics_directory)
+        try:
+            futures = [(experiment_folder, executor.submit(calc_statistics_of_experiment_folder, experiment_folder, statistics, load_experiment_data_func,
+                                                           statistics_directory=statistics_directory,
+                                                           recalculate_statistics=recalculate_statistics,
+                                                           verbose=verbose))
+                       for experiment_folder in sorted(experiment_folders)]
 
-        if not os.path.isdir(directory):
-            os.makedirs(directory)
+            for experiment_folder, future in futures:
+                error = future.exception()
+                if error is not None:
+                    errors[experiment_folder] = error
 
-        if verbose:
-            print('Calculate statistics for {!r}:'.format(experiment_folder))
+        finally:
+            if own_executor is not None:
+                own_executor.shutdown()
 
-        for statistic_definition in statistics:
+        if errors:
+            raise StatisticCalculationError(errors)
+
+
+class StatisticCalculationError(Exception):
+    '''
+    Error of a parallel statistic calculation.
+
+    Its errors attribute is a dictionary with key=experiment folder, value=exception of the folder.
+    '''
+
+    def __init__(self, errors):
+        self.errors = errors
+
+        lines = ['Calculation failed for {} experiment folder(s):'.format(len(errors))]
+        for experiment_folder, error in errors.items():
+            lines.append('\t- {!r}: {!r}'.format(experiment_folder, error))
+
+        super().__init__('\n'.join(lines))
+
+
+class DataCache:
+    '''
+    Wrapper around a function that loads experiment data, so that data that was already loaded is reused by later
+    statistic calculations, e.g. by calc_experiment_statistics with other statistics or by
+    calc_statistics_over_repetitions:
+
+        load_data = DataCache(load_experiment_data, max_bytes=4 * 1024**3, cache_directory='./data_cache')
+        calc_experiment_statistics(statistics, load_data, './experiments')
+
+    Loaded data is identified by the loader, the loaded folder(s) and the sizes and modification times of their files
+    (see calc_input_signature), so that changed data is loaded again and caches of different loaders can share a cache
+    directory. The recently used data is kept in memory up to
+    max_bytes. With a cache directory, loaded data is also stored as pickle file per folder(s) and read from there if it
+    is not in memory. With a process pool, each process has its own memory cache, but they share the cache directory.
+    The cache directory should be outside of the experiment folders. Statistic functions must not change the data,
+    because the same data is given to later calls.
+
+    :param load_experiment_data_func: Function that loads the data of a folder or of a set of folders.
+    :param max_bytes: Maximum size of the data in memory in bytes (estimated via the sizes of numpy arrays and python
+                      objects). Data that is larger is not kept in memory. 0 for no memory cache.
+    :param cache_directory: Optional directory for the pickle files.
+    :param statistics_directory: Name of the statistics folders, whose files are not part of the identification.
+    :param name: Optional name that identifies the loader in the cache directory. Default: the qualified name and the
+                 hash of the code of the loader (see calc_function_hash).
+    '''
+
+    def __init__(self, load_experiment_data_func, max_bytes=1024**3, cache_directory=None, statistics_directory='statistics', name=None):
+        self.load_experiment_data_func = load_experiment_data_func
+        if name is None:
+            name = '{}.{}:{}'.format(getattr(load_experiment_data_func, '__module__', None),
+                                     getattr(load_experiment_data_func, '__qualname__', type(load_experiment_data_func).__qualname__),
+                                     calc_function_hash(load_experiment_data_func))
+        self.name = name
+        self.max_bytes = max_bytes
+        self.cache_directory = cache_directory
+        self.statistics_directory = statistics_directory
+
+        # key=(folder key, input signature), value=(data, size in bytes), in the order of their last use
+        self.entries = OrderedDict()
+        self.n_bytes = 0
+
+        self.n_hits = 0
+        self.n_disk_hits = 0
+        self.n_misses = 0
+
+    def __getstate__(self):
+        # the data in memory is not copied to other processes
+        state = self.__dict__.copy()
+        state['entries'] = OrderedDict()
+        state['n_bytes'] = 0
+        return state
+
+    def __call__(self, folders):
+
+        # the same folders given as single path or as set are different keys, because the loader can return other data
+        if isinstance(folders, str):
+            folder_key = ('folder', os.path.abspath(folders))
+            folder_list = [folders]
+        else:
+            folder_list = sorted(folders)
+            folder_key = ('folders',) + tuple(os.path.abspath(folder) for folder in folder_list)
+
+        input_signature = calc_input_signature(folder_list, self.statistics_directory)
+        key = (folder_key, input_signature)
+
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.n_hits += 1
+            return self.entries[key][0]
+
+        data = self._load_from_disk(folder_key, input_signature)
+        if data is not _DATA_CACHE_MISS:
+            self.n_disk_hits += 1
+        else:
+            self.n_misses += 1
+            data = self.load_experiment_data_func(folders)
+            self._save_to_disk(folder_key, input_signature, data)
+
+        self._add_to_memory(key, data)
+
+        return data
+
+    def _add_to_memory(self, key, data):
+
+        size = get_data_size(data)
+        if size > self.max_bytes:
+            return
+
+        # remove the least recently used data until the new data fits
+        while self.entries and self.n_bytes + size > self.max_bytes:
+            _, (_, removed_size) = self.entries.popitem(last=False)
+            self.n_bytes -= removed_size
+
+        self.entries[key] = (data, size)
+        self.n_bytes += size
+
+    def _get_cache_filepath(self, folder_key):
+        return os.path.join(self.cache_directory, hashlib.sha1(repr((self.name, folder_key)).encode()).hexdigest() + '.pkl')
+
+    def _load_from_disk(self, folder_key, input_signature):
+        '''Returns the cached data or _DATA_CACHE_MISS if there is no valid cache file.'''
+
+        if self.cache_directory is None:
+            return _DATA_CACHE_MISS
+
+        filepath = self._get_cache_filepath(folder_key)
+        if not os.path.isfile(filepath):
+            return _DATA_CACHE_MISS
+
+        try:
+            with open(filepath, 'rb') as file:
+                cached_name, cached_folder_key, cached_input_signature, data = pickle.load(file)
+        except Exception:
+            # unreadable or corrupt files, e.g. of an interrupted write, an older format or removed classes, are loaded
+            # again by the loader
+            return _DATA_CACHE_MISS
+
+        # data of changed folders or of another loader is outdated
+        if cached_name != self.name or cached_folder_key != folder_key or cached_input_signature != input_signature:
+            return _DATA_CACHE_MISS
+
+        return data
+
+    def _save_to_disk(self, folder_key, input_signature, data):
+
+        if self.cache_directory is None:
+            return
+
+        os.makedirs(self.cache_directory, exist_ok=True)
+
+        filepath = self._get_cache_filepath(folder_key)
+
+        # the file name is unique per process, because several processes can load the same folders
+        tmp_filepath = '{}.{}.tmp'.format(filepath, os.getpid())
+        with open(tmp_filepath, 'wb') as file:
+            pickle.dump((self.name, folder_key, input_signature, data), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_filepath, filepath)
+
+    def clear(self):
+        '''Removes all data from the memory.'''
+        self.entries.clear()
+        self.n_bytes = 0
+
+
+def get_data_size(data):
+    '''Returns an estimation of the memory size of data in bytes, i.e. of numpy arrays and containers of them.'''
+
+    if isinstance(data, np.ndarray):
+        return data.nbytes + sys.getsizeof(np.empty(0))
+
+    elif isinstance(data, dict):
+        return sys.getsizeof(data) + sum(get_data_size(key) + get_data_size(value) for key, value in data.items())
+
+    elif isinstance(data, (list, tuple, set, frozenset)):
+        return sys.getsizeof(data) + sum(get_data_size(item) for item in data)
+
+    return sys.getsizeof(data)
+
+
+def build_campaign_index(directory='.', statistics_directory='statistics', index_filepath=None):
+    '''
+    Finds the group, experiment and repetition folders of a campaign with a single walk over its directory tree.
+
+    Folders named 'experiment_*' are experiments, folders with experiments are groups, and folders named
+    'repetition_*' are repetitions. Statistics folders, hidden folders (starting with '.') and the content of
+    repetition folders are not searched.
+
+    If an index file is given, the subfolders of each folder are stored in it with the modification time of the folder.
+    When the index is built again, folders whose modification time did not change are not listed again, which only
+    needs a stat call per folder. An unreadable index file, e.g. from an interrupted write, is ignored.
+
+    :param directory: Root directory of the campaign.
+    :param index_filepath: Optional path of a json file for the persisted index, e.g.
+                           os.path.join(directory, CAMPAIGN_INDEX_FILENAME).
+    :return: CampaignIndex
+    '''
+
+    previous_tree = dict()
+    if index_filepath is not None and os.path.isfile(index_filepath):
+        try:
+            with open(index_filepath, 'r') as file:
+                index_content = json.load(file)
+            if index_content.get('statistics_directory') == statistics_directory:
+                previous_tree = index_content['tree']
+        except ValueError:
+            pass
+
+    # the index file is created before the walk and then overwritten in place, because creating or renaming a file
+    # changes the modification time of its folder
+    if index_filepath is not None and not os.path.isfile(index_filepath):
+        open(index_filepath, 'w').close()
+
+    # key=relative path of a searched folder, value=[modification time, names of subfolders]
+    tree = dict()
+
+    experiment_directories = []
+    repetition_directories = []
+
+    # folders that are searched as (relative path, path)
+    folders = [('.', directory)]
+    while folders:
+        relative_path, path = folders.pop()
 
-            if isinstance(statistic_definition, tuple):
-                statistic_name = statistic_definition[0]
-                statistic_func = statistic_definition[1]
-                statistic_type = statistic_definition[2] if len(statistic_definition) > 2 else 'numpy'
-            elif isinstance(statistic_definition, dict):
-                statistic_name = statistic_definition['name']
-                statistic_func = statistic_definition['function']
-                statistic_type = statistic_definition['type'] if 'type' in statistic_definition else 'numpy'
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+
+        previous_entry = previous_tree.get(relative_path)
+        if previous_entry is not None and previous_entry[0] == mtime:
+            subdirectory_names = previous_entry[1]
+        else:
+            try:
+                subdirectory_names = sorted(entry.name for entry in os.scandir(path)
+                                            if entry.name != statistics_directory and not entry.name.startswith('.') and entry.is_dir())
+            except OSError:
+                continue
+
+        tree[relative_path] = [mtime, subdirectory_names]
+
+        for name in subdirectory_names:
+            subdirectory_path = os.path.join(path, name)
+            subdirectory_relative_path = os.path.normpath(os.path.join(relative_path, name))
+
+            if name.startswith('repetition_'):
+                repetition_directories.append(subdirectory_path)
             else:
-                raise ValueError('Unknown format for statistic definition {!r}!'.format(statistic_definition))
+                if name.startswith('experiment_'):
+                    experiment_directories.append(subdirectory_path)
+                folders.append((subdirectory_relative_path, subdirectory_path))
 
-            # calculate statistics if they do not exist
-            filepath_npy = os.path.join(directory, '{}.npy'.format(statistic_name))
-            filepath_npz = os.path.join(directory, '{}.npz'.format(statistic_name))
-            filepath_zip = os.path.join(directory, '{}.zip'.format(statistic_name))
-            directory_path = os.path.join(directory, statistic_name)
+    if index_filepath is not None:
+        with open(index_filepath, 'w') as file:
+            json.dump(dict(statistics_directory=statistics_directory, tree=tree), file)
 
-            if (not os.path.isfile(filepath_npy) and not os.path.isfile(filepath_npz) and not os.path.isfile(filepath_zip) and not os.path.isdir(directory_path)) or recalculate_statistics:
+    return CampaignIndex(directory, experiment_directories, repetition_directories)
+
+
+class CampaignIndex:
+    '''Group, experiment and repetition folders of a campaign (see build_campaign_index).'''
+
+    def __init__(self, directory, experiment_directories, repetition_directories):
+        self.directory = directory
+        self.experiment_directories = sorted(experiment_directories)
+        self.repetition_directories = sorted(repetition_directories)
+        self.group_directories = sorted(set(os.path.dirname(experiment_directory) for experiment_directory in self.experiment_directories))
+
+    @staticmethod
+    def _filter_directories(directories, folder):
+        '''Returns the directories inside a folder.'''
+
+        if folder is None:
+            return list(directories)
+
+        folder_path = os.path.join(os.path.abspath(folder), '')
+        return [directory for directory in directories if os.path.abspath(directory).startswith(folder_path)]
+
+    def get_group_directories(self, folder=None):
+        return self._filter_directories(self.group_directories, folder)
+
+    def get_experiment_directories(self, folder=None):
+        return self._filter_directories(self.experiment_directories, folder)
+
+    def get_repetition_directories(self, folder=None):
+        return self._filter_directories(self.repetition_directories, folder)
+
+
+def calc_statistics_of_experiment_folder(experiment_folder, statistics, load_experiment_data_func, statistics_directory='statistics', recalculate_statistics=False, verbose=False):
+    '''Calculates the statistics of a single experiment folder that do not exist yet (see calc_experiment_statistics).'''
+
+    def get_data(data, experiment_folder):
+        '''Loads the data if the data is not already loaded'''
+        if data is None:
+            data = load_experiment_data_func(experiment_folder)
+        return data
+
+    data = None
+
+    directory = os.path.join(experiment_folder, statistics_directory)
+
+    os.makedirs(directory, exist_ok=True)
+
+    if verbose:
+        print('Calculate statistics for {!r}:'.format(experiment_folder))
+
+    metadata = load_statistics_metadata(directory)
+    input_signature = None
+
+    for statistic_definition in statistics:
+
+        statistic_name, statistic_func, statistic_type, statistic_version = parse_statistic_definition(statistic_definition)
+
+        # calculate statistics if they do not exist
+        filepath_npy = os.path.join(directory, '{}.npy'.format(statistic_name))
+        filepath_npz = os.path.join(directory, '{}.npz'.format(statistic_name))
+        filepath_zip = os.path.join(directory, '{}.zip'.format(statistic_name))
+        directory_path = os.path.join(directory, statistic_name)
+
+        is_existing = os.path.isfile(filepath_npy) or os.path.isfile(filepath_npz) or os.path.isfile(filepath_zip) or os.path.isdir(directory_path)
+
+        # the input files are only collected once per folder and only if needed
+        if input_signature is None and (not is_existing or recalculate_statistics):
+            input_signature = calc_input_signature([experiment_folder], statistics_directory)
+
+        statistic_metadata = dict(inputs=input_signature, function=calc_function_hash(statistic_func, statistic_version))
+
+        if not is_existing or is_recalculation_needed(recalculate_statistics, metadata.get(statistic_name), statistic_metadata):
+
+            if verbose:
+                print('\t{} ...'.format(statistic_name))
+
+            data = get_data(data, experiment_folder)
+
+            if statistic_type == 'numpy':
+                stat = statistic_func(data)
+                save_numpy_statistic(filepath_npy, filepath_npz, stat)
+
+            elif statistic_type == 'zip':
+
+                stat = statistic_func(data)
+
+                if not isinstance(stat, dict):
+                    raise ValueError('Only dictionaries are accepted as data type for zip statistics!')
+
+                save_zip_statistic(filepath_zip, stat)
+
+            elif statistic_type == 'directory':
+                # fill a temporary directory that replaces the statistic directory when the function succeeded
+                tmp_directory_path = directory_path + '.tmp'
+                if os.path.isdir(tmp_directory_path):
+                    shutil.rmtree(tmp_directory_path)
+                os.mkdir(tmp_directory_path)
+
+                statistic_func(data, tmp_directory_path)
+
+                if os.path.isdir(directory_path):
+                    shutil.rmtree(directory_path)
+                os.rename(tmp_directory_path, directory_path)
+
+            else:
+                raise ValueError('Unknown statistic type {!r}!'.format(statistic_type))
+
+            metadata[statistic_name] = statistic_metadata
+            save_statistics_metadata(directory, metadata)
+
+
+def parse_statistic_definition(statistic_definition):
+    '''
+    Returns the name, function, type and version of a statistic definition, which is either a tuple
+    (name, function[, type[, version]]) or a dictionary with the keys 'name', 'function' and optionally 'type' and 'version'.
+    '''
+
+    if isinstance(statistic_definition, tuple):
+        statistic_name = statistic_definition[0]
+        statistic_func = statistic_definition[1]
+        statistic_type = statistic_definition[2] if len(statistic_definition) > 2 else 'numpy'
+        statistic_version = statistic_definition[3] if len(statistic_definition) > 3 else None
+    elif isinstance(statistic_definition, dict):
+        statistic_name = statistic_definition['name']
+        statistic_func = statistic_definition['function']
+        statistic_type = statistic_definition['type'] if 'type' in statistic_definition else 'numpy'
+        statistic_version = statistic_definition['version'] if 'version' in statistic_definition else None
+    else:
+        raise ValueError('Unknown format for statistic definition {!r}!'.format(statistic_definition))
+
+    return statistic_name, statistic_func, statistic_type, statistic_version
+
+
+def is_recalculation_needed(recalculate_statistics, stored_metadata, current_metadata):
+    '''Returns True if an existing statistic is recalculated according to the recalculate_statistics mode.'''
+
+    if recalculate_statistics == 'outdated':
+        return is_statistic_outdated(stored_metadata, current_metadata)
+    elif recalculate_statistics in [True, False]:
+        return recalculate_statistics
+    else:
+        raise ValueError('Unknown recalculate_statistics mode {!r}!'.format(recalculate_statistics))
+
+
+def is_statistic_outdated(stored_metadata, current_metadata):
+    '''
+    A statistic is outdated if the size or modification time of the files in its experiment folders changed, or if
+    the version or code of its function changed. Statistics without stored metadata are also outdated.
+    '''
+    return stored_metadata is None or stored_metadata != current_metadata
+
+
+def calc_input_signature(folders, statistics_directory='statistics'):
+    '''
+    Returns a hash over the paths, sizes and modification times of all files in the folders, without their statistics
+    directories. It changes if the data from which statistics are calculated changes.
+    '''
+
+    file_infos = []
+    for folder in folders:
+        for root, directories, filenames in os.walk(folder):
+            if root == folder and statistics_directory in directories:
+                directories.remove(statistics_directory)
+            for filename in filenames:
+                filepath = os.path.join(root, filename)
+                try:
+                    file_stat = os.stat(filepath)
+                except OSError:
+                    continue
+                file_infos.append((os.path.basename(os.path.normpath(folder)), os.path.relpath(filepath, folder), file_stat.st_size, file_stat.st_mtime_ns))
+
+    return hashlib.sha1(repr(sorted(file_infos)).encode()).hexdigest()
+
+
+def calc_function_hash(statistic_func, version=None):
+    '''
+    Returns the version of a statistic function if it is given, otherwise a hash of the byte code and constants of
+    the function, or None if the function has no code object (e.g. builtins).
+    '''
+
+    if version is not None:
+        return 'version:{}'.format(version)
+
+    code = getattr(statistic_func, '__code__', None)
+    if code is None:
+        return None
+
+    return _calc_code_hash(code)
 
-                if verbose:
-                    print('\t{} ...'.format(statistic_name))
 
-                data = get_data(data, experiment_folder)
+def _calc_code_hash(code):
+    '''
+    Hash of the byte code, names and constants of a code object. Nested code objects (e.g. of comprehensions, lambdas
+    or inner functions) are replaced by their own hash, because their repr contains the memory address.
+    '''
+
+    consts = tuple(_get_canonical_constant(const) for const in code.co_consts)
+
+    return hashlib.sha1(code.co_code + repr((consts, code.co_names)).encode()).hexdigest()
+
+
+def _get_canonical_constant(const):
+    '''
+    Returns a constant of a code object in a form whose repr is the same in each interpreter: code objects are
+    replaced by their hash and frozensets (e.g. of set literals), whose order depends on PYTHONHASHSEED, by the sorted
+    reprs of their elements.
+    '''
+
+    if isinstance(const, types.CodeType):
+        return ('code', _calc_code_hash(const))
+    elif isinstance(const, frozenset):
+        return ('frozenset', tuple(sorted(repr(_get_canonical_constant(element)) for element in const)))
+    elif isinstance(const, tuple):
+        return tuple(_get_canonical_constant(element) for element in const)
+
+    return const
+
+
+def load_statistics_metadata(directory):
+    '''Returns the dictionary with the metadata of the statistics in a statistics directory.'''
+
+    metadata_path = os.path.join(directory, STATISTICS_METADATA_FILENAME)
+
+    if not os.path.isfile(metadata_path):
+        return dict()
+
+    try:
+        with open(metadata_path, 'r') as file:
+            return json.load(file)
+    except ValueError:
+        return dict()
+
+
+def save_statistics_metadata(directory, metadata):
+    '''Writes the metadata of the statistics in a statistics directory.'''
+
+    metadata_path = os.path.join(directory, STATISTICS_METADATA_FILENAME)
+
+    with open(metadata_path + '.tmp', 'w') as file:
+        json.dump(metadata, file, indent=1, sort_keys=True)
+
+    os.replace(metadata_path + '.tmp', metadata_path)
 
-                if statistic_type == 'numpy':
-                    stat = statistic_func(data)
 
-                    if isinstance(stat, dict):
-                        np.savez(filepath_npz, **stat)
-                    else:
-                        np.save(filepath_npy, stat)
+def save_numpy_statistic(filepath_npy, filepath_npz, stat):
+    '''
+    Saves a statistic as npz file if it is a dictionary, otherwise as npy file.
+    The file is written under a temporary name and then renamed, so that it is never left half-written.
+    '''
+
+    filepath = filepath_npz if isinstance(stat, dict) else filepath_npy
 
-                elif statistic_type == 'zip':
+    with open(filepath + '.tmp', 'wb') as file:
+        if isinstance(stat, dict):
+            np.savez(file, **stat)
+        else:
+            np.save(file, stat)
 
-                    stat = statistic_func(data)
+    os.replace(filepath + '.tmp', filepath)
 
-                    if not isinstance(stat, dict):
-                        raise ValueError('Only dictionaries are accepted as data type for zip statistics!')
 
-                    zf = zipfile.ZipFile(filepath_zip,
-                                         mode='w',
-                                         compression=zipfile.ZIP_DEFLATED,
-                                         )
-                    try:
-                        for sub_stat_name, sub_stat in stat.items():
-                            zf.writestr(sub_stat_name, sub_stat)
+def save_zip_statistic(filepath_zip, stat):
+    '''Saves a dictionary with sub statistics as zip file. Like save_numpy_statistic, the file is replaced atomically.'''
 
-                    finally:
-                        zf.close()
+    zf = zipfile.ZipFile(filepath_zip + '.tmp',
+                         mode='w',
+                         compression=zipfile.ZIP_DEFLATED,
+                         )
+    try:
+        for sub_stat_name, sub_stat in stat.items():
+            zf.writestr(sub_stat_name, sub_stat)
 
-                elif statistic_type == 'directory':
-                    if not os.path.isdir(directory_path):
-                        os.mkdir(directory_path)
-                    statistic_func(data, directory_path)
+    finally:
+        zf.close()
 
-                else:
-                    ValueError('Unknown statistic type {!r}!'.format(statistic_type))
+    os.replace(filepath_zip + '.tmp', filepath_zip)
 
 
 
-def calc_statistics_over_repetitions(statistics, load_experiment_data_func, *args, statistics_directory='statistics', recalculate_statistics=False, verbose=False):
+def calc_statistics_over_repetitions(statistics, load_experiment_data_func, *args, statistics_directory='statistics', recalculate_statistics=False, verbose=False, campaign_index=None):
     '''
+    Statistics of type 'streaming' are dictionaries with the keys 'name', 'function', 'type' and 'accumulator'. Their
+    repetitions are loaded one after another (load_experiment_data_func gets a set with one repetition folder). The
+    function calculates the value of a repetition, which is added to the accumulator. The accumulator is a function
+    that returns a new accumulator, e.g. statisticaccumulator.MeanVarianceAccumulator, and its result is saved.
+    All streaming statistics of an experiment share a single pass over the repetitions, so that the memory does not
+    depend on the number of repetitions.
 
     :param statistics: List with tuples of the form: (statistic name, statistic function)
     :param args: Directoryies in which the experiments are for which the statistics should be computed.
     :param results_directory:
     :param statistics_directory:
+    :param recalculate_statistics: True to recalculate all statistics, False to calculate only missing statistics.
+                                   'outdated' to also recalculate statistics whose dependencies changed, i.e. the files
+                                   in the repetition folders or the statistic function (see calc_experiment_statistics).
+    :param campaign_index: Optional CampaignIndex (see build_campaign_index) that contains the directories, so that the
+                           folders are not searched again. Otherwise a CampaignIndex is built for each directory.
     :return:
     '''
 
@@ -172,18 +704,19 @@ def calc_statistics_over_repetitions(statistics, load_experiment_data_func, *arg
         # then take the base directory and search in it
         # this makes sure, that also the direct given folder is looked after, e.g. './experiment_000001' would also be identified
         basedir = os.path.dirname(os.path.join(folder, ''))
-        
+
+        folder_index = campaign_index if campaign_index is not None else build_campaign_index(basedir, statistics_directory=statistics_directory)
+
         # look if there are repetition folders somewhere inside the directory
-        for repetition_directory in glob.iglob(os.path.join(basedir,'**','repetition_*'), recursive=True):
-            if os.path.isdir(repetition_directory):
-                # remember the parent folder, i.e. the experiment folder
-                experiment_directory = os.path.dirname(repetition_directory)
-                
-                if experiment_directory not in experiment_directories:
-                    experiment_directories[experiment_directory] = set()
+        for repetition_directory in folder_index.get_repetition_directories(basedir):
+            # remember the parent folder, i.e. the experiment folder
+            experiment_directory = os.path.dirname(repetition_directory)
+
+            if experiment_directory not in experiment_directories:
+                experiment_directories[experiment_directory] = set()
+
+            experiment_directories[experiment_directory].add(repetition_directory)
 
-                experiment_directories[experiment_directory].add(repetition_directory)
-                
 
     # calc statistic if it does not exist already
     for experiment_directory, repetition_directories in experiment_directories.items():
@@ -198,7 +731,21 @@ def calc_statistics_over_repetitions(statistics, load_experiment_data_func, *arg
         if verbose:
             print('Calculate statistics for {!r}:'.format(experiment_directory))
 
-        for statistic_name, statistic_func in statistics:
+        metadata = load_statistics_metadata(trg_directory)
+        input_signature = None
+
+        # streaming statistics that are calculated, key=statistic name, value=(function, accumulator, file paths, metadata)
+        streaming_statistics = OrderedDict()
+
+        for statistic_definition in statistics:
+
+            statistic_name, statistic_func, statistic_type, statistic_version = parse_statistic_definition(statistic_definition)
+
+            if statistic_type not in ['numpy', 'streaming']:
+                raise ValueError('Only numpy and streaming statistics are supported over repetitions!')
+
+            if statistic_type == 'streaming' and not (isinstance(statistic_definition, dict) and 'accumulator' in statistic_definition):
+                raise ValueError('Streaming statistic {!r} needs an accumulator!'.format(statistic_name))
 
             # calculate statistics if they do not exist
             filename_npy = '{}.npy'.format(statistic_name)
@@ -206,7 +753,23 @@ def calc_statistics_over_repetitions(statistics, load_experiment_data_func, *arg
 
             filepath_npy = os.path.join(trg_directory, filename_npy)
             filepath_npz = os.path.join(trg_directory, filename_npz)
-            if (not os.path.isfile(filepath_npy) and not os.path.isfile(filepath_npz)) or recalculate_statistics:
+
+            is_existing = os.path.isfile(filepath_npy) or os.path.isfile(filepath_npz)
+
+            if input_signature is None and (not is_existing or recalculate_statistics):
+                input_signature = calc_input_signature(sorted(repetition_directories), statistics_directory)
+
+            statistic_metadata = dict(inputs=input_signature, function=calc_function_hash(statistic_func, statistic_version))
+
+            if statistic_type == 'streaming':
+                accumulator_factory = statistic_definition['accumulator']
+                statistic_metadata['accumulator'] = calc_function_hash(accumulator_factory) or getattr(accumulator_factory, '__qualname__', None)
+
+            if not is_existing or is_recalculation_needed(recalculate_statistics, metadata.get(statistic_name), statistic_metadata):
+
+                if statistic_type == 'streaming':
+                    streaming_statistics[statistic_name] = (statistic_func, statistic_definition['accumulator'](), filepath_npy, filepath_npz, statistic_metadata)
+                    continue
 
                 if verbose:
                     print('\t{} ...'.format(statistic_name))
@@ -215,7 +778,407 @@ def calc_statistics_over_repetitions(statistics, load_experiment_data_func, *arg
 
                 stat = statistic_func(data)
 
-                if isinstance(stat, dict):
-                    np.savez(filepath_npz, **stat)
-                else:
-                    np.save(filepath_npy, stat)
\ No newline at end of file
+                save_numpy_statistic(filepath_npy, filepath_npz, stat)
+
+                metadata[statistic_name] = statistic_metadata
+                save_statistics_metadata(trg_directory, metadata)
+
+        if streaming_statistics:
+
+            # free the data of all repetitions before the repetitions are loaded one by one
+            data = None
+
+            if verbose:
+                print('\t{} ...'.format(', '.join(streaming_statistics.keys())))
+
+            for repetition_directory in sorted(repetition_directories):
+                repetition_data = load_experiment_data_func({repetition_directory})
+
+                for statistic_func, accumulator, _, _, _ in streaming_statistics.values():
+                    accumulator.add(statistic_func(repetition_data))
+
+                del repetition_data
+
+            for statistic_name, (_, accumulator, filepath_npy, filepath_npz, statistic_metadata) in streaming_statistics.items():
+                save_numpy_statistic(filepath_npy, filepath_npz, accumulator.result())
+                metadata[statistic_name] = statistic_metadata
+
+            save_statistics_metadata(trg_directory, metadata)
+
+
+def load_experiment_statistics(*args, statistics_directory='statistics', statistic_names=None, allow_pickle=False):
+    '''
+    Finds the stored statistics of experiments and repetitions and returns lazy handles to them, so that only the
+    accessed parts are read from disk.
+
+    npy statistics are LazyNumpyStatistic handles that are memory-mapped on access. npz and zip statistics are
+    LazyArchiveStatistic handles that read a key only when it is accessed. For directory statistics, the path of the
+    directory is given.
+
+    :param args: Directories in which the statistics are searched. Default: current directory.
+    :param statistics_directory: Name of the statistics directories.
+    :param statistic_names: Optional list with the names of the statistics that are returned.
+    :param allow_pickle: If True, arrays of python objects can be loaded, which unpickles the data of the files and is
+                         only safe for trusted files.
+    :return: Dictionary with key=experiment or repetition folder, value=dictionary with key=statistic name,
+             value=handle of the statistic.
+    '''
+
+    if len(args) == 0:
+        folders = ['.']
+    elif len(args) == 1 and isinstance(args[0], list):
+        folders = args[0]
+    else:
+        folders = list(args)
+
+    found_statistics_directories = set()
+    for folder in folders:
+        basedir = os.path.dirname(os.path.join(folder, ''))
+        for directory in glob.iglob(os.path.join(basedir, '**', statistics_directory), recursive=True):
+            if os.path.isdir(directory):
+                found_statistics_directories.add(directory)
+
+    statistics = OrderedDict()
+    for directory in sorted(found_statistics_directories):
+        statistics[os.path.dirname(directory)] = load_statistics_directory(directory, statistic_names=statistic_names, allow_pickle=allow_pickle)
+
+    return statistics
+
+
+def load_statistics_directory(directory, statistic_names=None, allow_pickle=False):
+    '''
+    Returns a dictionary with key=statistic name, value=lazy handle for the statistics in a statistics directory.
+
+    :param allow_pickle: If True, arrays of python objects can be loaded (see load_experiment_statistics).
+    '''
+
+    statistics = OrderedDict()
+
+    for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+
+        # ignore metadata and temporary files
+        if entry.name.startswith('.') or entry.name.endswith('.tmp'):
+            continue
+
+        name, extension = os.path.splitext(entry.name)
+
+        if entry.is_dir():
+            name, statistic = entry.name, entry.path
+        elif extension == '.npy':
+            statistic = LazyNumpyStatistic(entry.path, allow_pickle=allow_pickle)
+        elif extension in ['.npz', '.zip']:
+            statistic = LazyArchiveStatistic(entry.path, allow_pickle=allow_pickle)
+        else:
+            continue
+
+        if statistic_names is None or name in statistic_names:
+            statistics[name] = statistic
+
+    return statistics
+
+
+class LazyNumpyStatistic:
+    '''
+    Handle to a statistic in a npy file. The file is memory-mapped on the first access, so that indexing reads only
+    the needed part of the array. Arrays of objects can not be mapped and are loaded completely if allow_pickle is
+    True, otherwise their access raises a ValueError.
+
+    :param allow_pickle: If True, arrays of python objects are unpickled, which is only safe for trusted files.
+    '''
+
+    def __init__(self, filepath, allow_pickle=False):
+        self.filepath = filepath
+        self.allow_pickle = allow_pickle
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            if self.allow_pickle and self.read_header()[1].hasobject:
+                self._data = np.load(self.filepath, allow_pickle=True)
+            else:
+                self._data = np.load(self.filepath, mmap_mode='r')
+        return self._data
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.data, dtype=dtype)
+
+    def read_header(self):
+        '''Returns the shape and dtype of the statistic from the header of the file without reading the array.'''
+        with open(self.filepath, 'rb') as file:
+            return read_npy_header(file)
+
+    def load(self):
+        '''Returns the statistic as array in memory.'''
+        return np.array(self.data)
+
+    def __repr__(self):
+        return 'LazyNumpyStatistic({!r})'.format(self.filepath)
+
+
+class LazyArchiveStatistic(collections.abc.Mapping):
+    '''
+    Read-only dictionary view on a statistic in a npz or zip file. Each access reads only its key from the archive.
+    Keys of npz files are arrays, keys of zip files are the stored bytes.
+
+    :param allow_pickle: If True, arrays of python objects in npz files are unpickled, which is only safe for trusted
+                         files. Otherwise their access raises a ValueError.
+    '''
+
+    def __init__(self, filepath, allow_pickle=False):
+        self.filepath = filepath
+        self.allow_pickle = allow_pickle
+        self.is_npz = filepath.endswith('.npz')
+        self._keys = None
+
+    def keys_of_archive(self):
+        if self._keys is None:
+            with zipfile.ZipFile(self.filepath, 'r') as zf:
+                names = zf.namelist()
+            # npz files store each array as '<key>.npy'
+            self._keys = [name[:-len('.npy')] if self.is_npz and name.endswith('.npy') else name for name in names]
+        return self._keys
+
+    def __getitem__(self, key):
+        if key not in self.keys_of_archive():
+            raise KeyError(key)
+
+        if self.is_npz:
+            with np.load(self.filepath, allow_pickle=self.allow_pickle) as npz_file:
+                return npz_file[key]
+        else:
+            with zipfile.ZipFile(self.filepath, 'r') as zf:
+                return zf.read(key)
+
+    def read_header(self, key):
+        '''Returns the shape and dtype of a key of a npz statistic without reading its array.'''
+        if not self.is_npz or key not in self.keys_of_archive():
+            raise KeyError(key)
+
+        with zipfile.ZipFile(self.filepath, 'r') as zf:
+            with zf.open(key + '.npy', 'r') as file:
+                return read_npy_header(file)
+
+    def __iter__(self):
+        return iter(self.keys_of_archive())
+
+    def __len__(self):
+        return len(self.keys_of_archive())
+
+    def load(self):
+        '''Returns all keys of the statistic as dictionary in memory.'''
+        return OrderedDict((key, self[key]) for key in self)
+
+    def __repr__(self):
+        return 'LazyArchiveStatistic({!r})'.format(self.filepath)
+
+
+def read_npy_header(file):
+    '''Returns the shape and dtype of the array in an open npy file and reads only its header.'''
+
+    version = np.lib.format.read_magic(file)
+    if version == (1, 0):
+        shape, _, dtype = np.lib.format.read_array_header_1_0(file)
+    else:
+        shape, _, dtype = np.lib.format.read_array_header_2_0(file)
+
+    return shape, dtype
+
+
+def consolidate_statistics(*args, statistics_directory='statistics', store_directory=None, statistic_names=None, default_value=np.nan, verbose=False):
+    '''
+    Packs each statistic of all experiments and repetitions into a single npy file of a statistics store, so that it
+    can be loaded without opening a file per folder (see load_statistics_store).
+
+    Row i of each statistic belongs to the folder i of the store index, which also gives its experiment and repetition
+    id (-1 if the folder has none, e.g. for statistics over repetitions). Values with different shapes are padded with
+    the default value to the largest shape, like misc.numpy_vstack_2d_default does. Folders without the statistic
+    have only default values. Each key of npz statistics is stored as '<statistic name>/<key>'. Zip, directory and
+    object statistics are not consolidated.
+
+    The files are filled via memory-mapping, so that the statistics of a campaign do not need to fit in memory.
+
+    :param args: Directories in which the statistics are searched. Default: current directory.
+    :param store_directory: Directory of the store. Default: 'statistics_store' in the first directory.
+    :param statistic_names: Optional list with the names of the statistics that are consolidated.
+    :param default_value: Value for the padding.
+    :return: Path of the store directory.
+    '''
+
+    if len(args) == 0:
+        folders = ['.']
+    elif len(args) == 1 and isinstance(args[0], list):
+        folders = args[0]
+    else:
+        folders = list(args)
+
+    if store_directory is None:
+        store_directory = os.path.join(folders[0], 'statistics_store')
+
+    statistics = load_experiment_statistics(folders, statistics_directory=statistics_directory, statistic_names=statistic_names)
+    experiment_folders = list(statistics.keys())
+
+    # collect the values of each stored array: key=store name, value=list with (row index, function that reads the
+    # shape and dtype of the value, function that loads the value)
+    sources = OrderedDict()
+    for row_idx, folder_statistics in enumerate(statistics.values()):
+        for statistic_name, statistic in folder_statistics.items():
+            if isinstance(statistic, LazyNumpyStatistic):
+                sources.setdefault(statistic_name, []).append((row_idx,
+                                                               statistic.read_header,
+                                                               lambda statistic=statistic: statistic.data))
+            elif isinstance(statistic, LazyArchiveStatistic) and statistic.is_npz:
+                for key in statistic:
+                    sources.setdefault(statistic_name + '/' + key, []).append((row_idx,
+                                                                               lambda statistic=statistic, key=key: statistic.read_header(key),
+                                                                               lambda statistic=statistic, key=key: statistic[key]))
+
+    os.makedirs(store_directory, exist_ok=True)
+
+    index = OrderedDict()
+    index['folders'] = [os.path.relpath(folder, store_directory) for folder in experiment_folders]
+    index['experiment_ids'] = [get_folder_id(folder, 'experiment') for folder in experiment_folders]
+    index['repetition_ids'] = [get_folder_id(folder, 'repetition') for folder in experiment_folders]
+    index['statistics'] = OrderedDict()
+
+    for store_name, store_sources in sources.items():
+
+        # first pass over the headers of the values for the shape and type of the array
+        shapes = [None] * len(experiment_folders)
+        dtypes = []
+        for row_idx, read_header, _ in store_sources:
+            shapes[row_idx], dtype = read_header()
+            dtypes.append(dtype)
+
+        if any(dtype.hasobject for dtype in dtypes):
+            if verbose:
+                print('\tignore {!r}, because it has objects'.format(store_name))
+            continue
+
+        existing_shapes = [shape for shape in shapes if shape is not None]
+        if len(set(len(shape) for shape in existing_shapes)) > 1:
+            raise ValueError('Statistic {!r} has values with different numbers of dimensions!'.format(store_name))
+
+        max_shape = tuple(int(length) for length in np.max(existing_shapes, axis=0)) if existing_shapes[0] else ()
+        is_padded = any(shape != max_shape for shape in shapes)
+
+        dtype = np.result_type(*dtypes)
+        if is_padded:
+            dtype = np.result_type(dtype, np.asarray(default_value).dtype)
+
+        if verbose:
+            print('consolidate {!r} ...'.format(store_name))
+
+        filepath = os.path.join(store_directory, store_name + '.npy')
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+
+        # second pass that fills the array in the file
+        array = np.lib.format.open_memmap(filepath + '.tmp', mode='w+', dtype=dtype, shape=(len(experiment_folders),) + max_shape)
+        if is_padded:
+            array[:] = default_value
+        for row_idx, _, load_value in store_sources:
+            value = np.asarray(load_value())
+            array[(row_idx,) + tuple(slice(0, length) for length in value.shape)] = value
+        array.flush()
+        del array
+        os.replace(filepath + '.tmp', filepath)
+
+        index['statistics'][store_name] = [None if shape is None else list(shape) for shape in shapes]
+
+    index_filepath = os.path.join(store_directory, STATISTICS_STORE_INDEX_FILENAME)
+    with open(index_filepath + '.tmp', 'w') as file:
+        json.dump(index, file)
+    os.replace(index_filepath + '.tmp', index_filepath)
+
+    return store_directory
+
+
+def get_folder_id(folder, folder_type='experiment'):
+    '''Returns the id of the last '<folder_type>_<id>' folder in a path, or -1 if there is none.'''
+
+    for name in reversed(os.path.normpath(folder).split(os.sep)):
+        match = re.fullmatch(folder_type + r'_(\d+)', name)
+        if match:
+            return int(match.group(1))
+
+    return -1
+
+
+def load_statistics_store(store_directory):
+    '''Returns a StatisticsStore for a directory that was written by consolidate_statistics.'''
+    return StatisticsStore(store_directory)
+
+
+class StatisticsStore:
+    '''
+    Reader of the consolidated statistics of a campaign (see consolidate_statistics).
+    The arrays are memory-mapped, so that reading some rows or a slice does not load the whole statistic.
+    '''
+
+    def __init__(self, store_directory):
+        self.store_directory = store_directory
+
+        with open(os.path.join(store_directory, STATISTICS_STORE_INDEX_FILENAME), 'r') as file:
+            index = json.load(file)
+
+        self.folders = [os.path.normpath(os.path.join(store_directory, folder)) for folder in index['folders']]
+        self.experiment_ids = np.array(index['experiment_ids'], dtype=int)
+        self.repetition_ids = np.array(index['repetition_ids'], dtype=int)
+        self.shapes = index['statistics']
+
+        self._arrays = dict()
+
+    @property
+    def names(self):
+        return list(self.shapes.keys())
+
+    def get_array(self, name):
+        '''Returns the memory-mapped array of a statistic with a row per folder of the index.'''
+        if name not in self.shapes:
+            raise KeyError(name)
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(self.store_directory, name + '.npy'), mmap_mode='r')
+        return self._arrays[name]
+
+    def get_rows(self, experiment_id=None, repetition_id=None):
+        '''Returns the row indexes of the folders of an experiment and/or a repetition.'''
+        is_selected = np.ones(len(self.folders), dtype=bool)
+        if experiment_id is not None:
+            is_selected &= self.experiment_ids == experiment_id
+        if repetition_id is not None:
+            is_selected &= self.repetition_ids == repetition_id
+        return np.flatnonzero(is_selected)
+
+    def get(self, name, experiment_id=None, repetition_id=None):
+        '''
+        Returns the padded values of a statistic. Without ids, the memory-mapped array of all folders, otherwise only
+        the rows of the given experiment and/or repetition are read.
+        '''
+        array = self.get_array(name)
+        if experiment_id is None and repetition_id is None:
+            return array
+        return array[self.get_rows(experiment_id, repetition_id)]
+
+    def get_value(self, name, row_idx):
+        '''Returns the value of a statistic for a row without padding, or None if its folder has no value.'''
+        shape = self.shapes[name][row_idx]
+        if shape is None:
+            return None
+        return np.array(self.get_array(name)[(row_idx,) + tuple(slice(0, length) for length in shape)])
+
+    def __repr__(self):
+        return 'StatisticsStore({!r})'.format(self.store_directory)
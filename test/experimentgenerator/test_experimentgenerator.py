@@ -1,3 +1,4 @@
+import hashlib
 import exputils
 import os
 
@@ -324,3 +325,350 @@ def test_generate_experiments(tmpdir):
         file_content = file.read()
     assert '\'blubb2\'\n' == file_content
 
+
+
+def test_compiled_template():
+
+    template = exputils.experimentgenerator.CompiledTemplate('a: <var_a>\nb: <VAR_B> <var_b>\nid: <experiment_id> <repetition_id>\nunknown: <c>\nif x < 3 and y > 2: <>\n')
+
+    # same result as the sequential substitution
+    variable_sets = [
+        dict(var_a='1', var_b='two'),
+        dict(Var_A='1', var_b='', c='3'),
+        dict(var_a='<var_b>', var_b='x'),
+        dict(var_a='\\t', var_b='x'),
+        dict(var_a='1', var_a_='2', var_b='3'),
+        dict(var_a='1', var_b='2', repetition_id='r'),
+        dict(**{'var.a': '1', 'var_b': '2'}),
+    ]
+
+    for variables in variable_sets:
+        for repetition_id in [None, 0, 3]:
+            assert template.render(variables, 7, repetition_id) == template.render_sequential(variables, 7, repetition_id)
+
+    assert template.render(dict(var_a='1', var_b='two'), 7, 3) == 'a: 1\nb: two two\nid: 7 3\nunknown: <c>\nif x < 3 and y > 2: <>\n'
+
+    # substituted values next to '<' or '>' form new placeholders
+    for content in ['<<a>>', '<<a>', '<a>>', 'x<a>b>', '<<experiment_id>>']:
+        template = exputils.experimentgenerator.CompiledTemplate(content)
+        for variables in [dict(a='b', b='c'), dict(a='<b', b='c'), dict(a='b>', b='c'), {'7': 'seven', 'a': 'b'}]:
+            assert template.render(variables, 7) == template.render_sequential(variables, 7)
+
+    assert exputils.experimentgenerator.CompiledTemplate('<<a>>').render(dict(a='b', b='c'), 7) == 'c'
+
+    # also with other text between the brackets and the placeholder
+    assert exputils.experimentgenerator.CompiledTemplate('<x<a>z>').render({'a': 'y', 'xyz': 'Q'}, 7, 3) == 'Q'
+    assert exputils.experimentgenerator.CompiledTemplate('<v<experiment_id>w>').render({'v7w': 'Q'}, 7, 3) == 'Q'
+    for content in ['<x<a>z>', '<v<experiment_id>w>', '<x <a> <b>z>', '<x> <a> z>', 'x < <a> and y > 2']:
+        template = exputils.experimentgenerator.CompiledTemplate(content)
+        for variables in [{'a': 'y', 'xyz': 'Q'}, {'v7w': 'Q'}, {'a': 'A', 'b': 'B', 'x A Bz': 'Q'}, {'a': '1'}]:
+            assert template.render(variables, 7, 3) == template.render_sequential(variables, 7, 3)
+
+
+def test_generate_experiments_parallel(tmpdir):
+
+    import concurrent.futures
+    import pytest
+
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    os.chdir(dir_path)
+
+    def read_tree(directory):
+        tree = dict()
+        for root, _, files in os.walk(directory):
+            for file in files:
+                with open(os.path.join(root, file), 'rb') as f:
+                    tree[os.path.relpath(os.path.join(root, file), directory)] = f.read()
+        return tree
+
+    extra_files = [os.path.join(dir_path, 'extra_file_01'), os.path.join(dir_path, 'extra_file_02')]
+
+    serial_directory = os.path.join(tmpdir.strpath, 'serial')
+    exputils.generate_experiment_files(os.path.join(dir_path, 'test_03.ods'), directory=serial_directory, extra_files=extra_files)
+
+    thread_directory = os.path.join(tmpdir.strpath, 'thread')
+    exputils.generate_experiment_files(os.path.join(dir_path, 'test_03.ods'), directory=thread_directory, extra_files=extra_files, n_jobs=4)
+
+    process_directory = os.path.join(tmpdir.strpath, 'process')
+    with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
+        exputils.generate_experiment_files(os.path.join(dir_path, 'test_03.ods'), directory=process_directory, extra_files=extra_files, executor=executor)
+
+    assert read_tree(serial_directory)
+    assert read_tree(serial_directory) == read_tree(thread_directory)
+    assert read_tree(serial_directory) == read_tree(process_directory)
+
+    # errors are collected per experiment
+    with pytest.raises(exputils.experimentgenerator.ExperimentGenerationError) as error_info:
+        exputils.generate_experiment_files(os.path.join(dir_path, 'test_03.ods'), directory=os.path.join(tmpdir.strpath, 'error'), extra_files='not_existing_file', n_jobs=2)
+
+    assert [experiment_id for _, experiment_id in error_info.value.errors.keys()] == [1, 3]
+
+
+def test_generate_experiments_incremental(tmpdir):
+
+    import shutil
+
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    os.chdir(dir_path)
+
+    # use copies of the extra files to be able to change them
+    extra_files = [os.path.join(tmpdir.strpath, 'extra_file_01'), os.path.join(tmpdir.strpath, 'extra_file_02')]
+    shutil.copy(os.path.join(dir_path, 'extra_file_01'), extra_files[0])
+    shutil.copy(os.path.join(dir_path, 'extra_file_02'), extra_files[1])
+
+    directory = os.path.join(tmpdir.strpath, 'test03')
+    ods_filepath = os.path.join(dir_path, 'test_03.ods')
+    group_directory = os.path.join(directory, 'group_01')
+    repetition_directory = os.path.join(group_directory, 'experiment_000001', 'repetition_000000')
+
+    report = exputils.generate_experiment_files(ods_filepath, directory=directory, extra_files=extra_files, incremental=True)
+    assert report['added'] == [(group_directory, 1), (group_directory, 3)]
+    assert report['changed'] == [] and report['unchanged'] == []
+
+    # unchanged experiments are skipped
+    os.utime(os.path.join(repetition_directory, 'file_01'), (0, 0))
+    os.utime(os.path.join(repetition_directory, 'extra_file_01'), (0, 0))
+
+    report = exputils.generate_experiment_files(ods_filepath, directory=directory, extra_files=extra_files, incremental=True)
+    assert report['unchanged'] == [(group_directory, 1), (group_directory, 3)]
+    assert os.path.getmtime(os.path.join(repetition_directory, 'file_01')) == 0
+    assert os.path.getmtime(os.path.join(repetition_directory, 'extra_file_01')) == 0
+
+    # only changed files are rewritten
+    with open(extra_files[1], 'a') as file:
+        file.write('changed\n')
+
+    report = exputils.generate_experiment_files(ods_filepath, directory=directory, extra_files=extra_files, incremental=True)
+    assert report['changed'] == [(group_directory, 1), (group_directory, 3)]
+    assert os.path.getmtime(os.path.join(repetition_directory, 'file_01')) == 0
+    assert os.path.getmtime(os.path.join(repetition_directory, 'extra_file_01')) == 0
+
+    with open(os.path.join(repetition_directory, 'extra_file_02'), 'r') as file:
+        assert file.read().endswith('changed\n')
+
+
+def test_generate_experiments_link_mode(tmpdir):
+
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    os.chdir(dir_path)
+
+    extra_files = [os.path.join(dir_path, 'extra_file_01'), os.path.join(dir_path, 'extra_file_02')]
+
+    for link_mode in ['copy', 'hardlink', 'symlink', 'reflink']:
+
+        directory = os.path.join(tmpdir.strpath, link_mode)
+        exputils.generate_experiment_files(os.path.join(dir_path, 'test_03.ods'), directory=directory, extra_files=extra_files, link_mode=link_mode)
+
+        repetition_directory = os.path.join(directory, 'group_01', 'experiment_000001', 'repetition_000001')
+
+        extra_file_path = os.path.join(repetition_directory, 'extra_file_01')
+        assert os.path.isfile(extra_file_path)
+        assert os.path.islink(extra_file_path) == (link_mode == 'symlink')
+        if link_mode in ['hardlink', 'symlink']:
+            assert os.path.samefile(extra_file_path, extra_files[0])
+        else:
+            assert not os.path.samefile(extra_file_path, extra_files[0])
+
+        # templated files are written per folder
+        file_path = os.path.join(repetition_directory, 'file_01')
+        assert not os.path.islink(file_path) and os.stat(file_path).st_nlink == 1
+        with open(file_path, 'r') as file:
+            assert 'file 1:\n1\n1\n1\nguten\n' == file.read()
+
+        # regeneration replaces the links instead of writing through them
+        exputils.generate_experiment_files(os.path.join(dir_path, 'test_03.ods'), directory=directory, extra_files=extra_files, link_mode='copy')
+        assert not os.path.islink(extra_file_path)
+        assert not os.path.samefile(extra_file_path, extra_files[0])
+
+
+def test_load_configuration_cache(tmpdir):
+
+    import shutil
+
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+
+    ods_filepath = os.path.join(tmpdir.strpath, 'experiment_configurations.ods')
+    shutil.copy(os.path.join(dir_path, 'test_01.ods'), ods_filepath)
+
+    cache_filepath = exputils.experimentgenerator.get_configuration_cache_filepath(ods_filepath)
+    assert cache_filepath == os.path.join(tmpdir.strpath, '.experiment_configurations.ods.cache')
+
+    config_data = exputils.experimentgenerator.load_configuration_data_from_ods(ods_filepath)
+    assert not os.path.isfile(cache_filepath)
+
+    # first call creates the cache, second uses it
+    assert exputils.experimentgenerator.load_configuration_data_from_ods(ods_filepath, use_cache=True) == config_data
+    assert os.path.isfile(cache_filepath)
+
+    cache_mtime = os.path.getmtime(cache_filepath)
+    os.utime(cache_filepath, (0, 0))
+    assert exputils.experimentgenerator.load_configuration_data_from_ods(ods_filepath, use_cache=True) == config_data
+    assert os.path.getmtime(cache_filepath) == 0
+
+    # invalidation
+    assert exputils.experimentgenerator.load_configuration_data_from_ods(ods_filepath, use_cache=True, recalculate_cache=True) == config_data
+    assert os.path.getmtime(cache_filepath) >= cache_mtime
+
+    # changed ods file
+    shutil.copy(os.path.join(dir_path, 'test_02.ods'), ods_filepath)
+    assert exputils.experimentgenerator.load_configuration_data_from_ods(ods_filepath, use_cache=True) == exputils.experimentgenerator.load_configuration_data_from_ods(ods_filepath)
+
+
+def test_experiment_configuration_table():
+
+    table = exputils.experimentgenerator.ExperimentConfigurationTable([('file_01', 'file_01', ['a', 'b']),
+                                                                      ('file_02', 'file_{}_02', ['a', 'c', 'a'])])
+    table.add(1, None, None, ['src'], ['1', '2', '3', '4', '5'])
+    table.add(3, 2, ['rep'], None, ['10', '20', '30', '40', '50'])
+
+    assert list(table.keys()) == [1, 3]
+
+    # same form as the configuration dictionaries, duplicate variable names use the later value
+    assert table[1] == dict(files=[dict(template_file_path='file_01', file_name_template='file_01', variables=dict(a='1', b='2')),
+                                   dict(template_file_path='file_02', file_name_template='file_{}_02', variables=dict(a='5', c='4'))],
+                            repetitions=None,
+                            repetition_source_file_locations=None,
+                            experiment_source_file_locations=['src'])
+
+    assert table[3]['repetitions'] == 2
+    assert table[3]['repetition_source_file_locations'] + ['extra'] == ['rep', 'extra']
+    assert list(table[3]['files'][1]['variables'].items()) == [('a', '50'), ('c', '40')]
+
+    # the template metadata is shared by all experiments
+    assert table[1]['files'][0].file is table[3]['files'][0].file
+
+
+def test_generate_experiments_from_sweep(tmpdir):
+
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    os.chdir(dir_path)
+
+    assert list(exputils.experimentgenerator.grid_sweep(a=[1, 2], b=['x', 'y'])) == [dict(a=1, b='x'), dict(a=1, b='y'), dict(a=2, b='x'), dict(a=2, b='y')]
+    assert list(exputils.experimentgenerator.zip_sweep(a=[1, 2, 3], b=['x', 'y'])) == [dict(a=1, b='x'), dict(a=2, b='y')]
+
+    samples = list(exputils.experimentgenerator.random_sweep(5, seed=1, a=[1, 2, 3], b=lambda rng: rng.uniform(0.0, 1.0)))
+    assert len(samples) == 5
+    assert samples == list(exputils.experimentgenerator.random_sweep(5, seed=1, a=[1, 2, 3], b=lambda rng: rng.uniform(0.0, 1.0)))
+    assert all(sample['a'] in [1, 2, 3] and 0.0 <= sample['b'] <= 1.0 for sample in samples)
+
+    # experiments are generated lazily from a generator
+    sweep = exputils.experimentgenerator.ExperimentSweep(exputils.experimentgenerator.grid_sweep(**{'var 1': [1, 2], 'var 2': ['guten', 'tag']}),
+                                                         files=[('template_file_01', 'file_01')],
+                                                         repetitions=2,
+                                                         constants={'var 2': 'unused'},
+                                                         start_id=10)
+
+    directory = os.path.join(tmpdir.strpath, 'sweep')
+    report = exputils.experimentgenerator.generate_files_from_config([dict(directory='', experiments=sweep)], directory, n_jobs=2)
+
+    assert [experiment_id for _, experiment_id in report['added']] == [10, 11, 12, 13]
+
+    with open(os.path.join(directory, 'experiment_000012', 'repetition_000001', 'file_01'), 'r') as file:
+        assert 'file 1:\n12\n1\n2\nguten\n' == file.read()
+
+    # source files can be given as tuples
+    sweep = exputils.experimentgenerator.ExperimentSweep([{'var 1': 1}],
+                                                         files=[('template_file_01', 'file_01')],
+                                                         repetitions=1,
+                                                         repetition_source_file_locations=('extra_file_01',),
+                                                         experiment_source_file_locations=('extra_file_02',))
+
+    directory = os.path.join(tmpdir.strpath, 'sweep_tuples')
+    exputils.experimentgenerator.generate_files_from_config([dict(directory='', experiments=sweep)], directory, extra_files=['files_folder'])
+
+    assert os.path.isfile(os.path.join(directory, 'experiment_000001', 'repetition_000000', 'extra_file_01'))
+    assert os.path.isfile(os.path.join(directory, 'experiment_000001', 'repetition_000000', 'file_03'))
+    assert os.path.isfile(os.path.join(directory, 'experiment_000001', 'extra_file_02'))
+
+
+def test_plan_experiment_files(tmpdir):
+
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    os.chdir(dir_path)
+
+    extra_files = [os.path.join(dir_path, 'extra_file_01'), os.path.join(dir_path, 'extra_file_02')]
+
+    for ods_filename in ['test_01.ods', 'test_03.ods', 'test_05.ods']:
+
+        directory = os.path.join(tmpdir.strpath, ods_filename)
+
+        plan = exputils.experimentgenerator.plan_experiment_files(os.path.join(dir_path, ods_filename), directory=directory, extra_files=extra_files)
+
+        # nothing is written, also no cache of the configuration
+        assert not os.path.exists(directory)
+        assert not os.path.exists(exputils.experimentgenerator.get_configuration_cache_filepath(os.path.join(dir_path, ods_filename)))
+
+        exputils.experimentgenerator.plan_experiment_files(os.path.join(dir_path, ods_filename), directory=directory, extra_files=extra_files, use_config_cache=True)
+        assert not os.path.exists(exputils.experimentgenerator.get_configuration_cache_filepath(os.path.join(dir_path, ods_filename)))
+
+        exputils.generate_experiment_files(os.path.join(dir_path, ods_filename), directory=directory, extra_files=extra_files)
+
+        directories = set()
+        files = dict()
+        for root, _, filenames in os.walk(directory):
+            directories.add(root)
+            for filename in filenames:
+                files[os.path.join(root, filename)] = os.path.getsize(os.path.join(root, filename))
+
+        assert set(plan['directories']) == directories
+        assert {path: n_bytes for path, n_bytes in plan['rendered_files']} == {path: files[path] for path, _ in plan['rendered_files']}
+        assert {path: n_bytes for _, path, n_bytes in plan['copied_files']} == {path: files[path] for _, path, _ in plan['copied_files']}
+        assert plan['n_files'] == len(files)
+        assert plan['total_bytes'] == sum(files.values())
+        assert plan['missing_files'] == []
+
+    # a missing source file is listed once, although all experiments and repetitions use it
+    missing_file = os.path.join(dir_path, 'not_existing_file')
+    plan = exputils.experimentgenerator.plan_experiment_files(os.path.join(dir_path, 'test_01.ods'), directory=tmpdir.strpath, extra_files=[missing_file])
+    assert plan['missing_files'] == [missing_file]
+
+
+def test_source_file_cache(tmpdir, monkeypatch):
+
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    os.chdir(dir_path)
+
+    source_cache = exputils.experimentgenerator.SourceFileCache()
+
+    assert source_cache.resolve_template_file_path('file_04_template', ['extra_file_01', 'files_folder']) == os.path.join('files_folder', 'file_04_template')
+    assert source_cache.resolve_template_file_path('template_file_01', ['files_folder']) == 'template_file_01'
+    assert source_cache.resolve_template_file_path('not_existing', ['files_folder']) is None
+
+    os.mkdir(os.path.join(tmpdir.strpath, 'dst_01'))
+    exputils.experimentgenerator.copy_experiment_files('files_folder', os.path.join(tmpdir.strpath, 'dst_01'), ['file_04_template'], source_cache=source_cache)
+
+    # later copies reuse the directory listings, file kinds and contents
+    def raise_error(*args, **kwargs):
+        raise AssertionError('file system accessed')
+
+    monkeypatch.setattr(os, 'scandir', raise_error)
+    monkeypatch.setattr(os.path, 'isdir', lambda path: path.startswith(tmpdir.strpath) and os.path.exists(path))
+    monkeypatch.setattr(os.path, 'isfile', raise_error)
+
+    assert source_cache.resolve_template_file_path('file_04_template', ['extra_file_01', 'files_folder']) == os.path.join('files_folder', 'file_04_template')
+
+    os.mkdir(os.path.join(tmpdir.strpath, 'dst_02'))
+    exputils.experimentgenerator.copy_experiment_files('files_folder', os.path.join(tmpdir.strpath, 'dst_02'), ['file_04_template'], source_cache=source_cache)
+
+    monkeypatch.undo()
+
+    assert sorted(os.listdir(os.path.join(tmpdir.strpath, 'dst_02'))) == ['file_03']
+    with open(os.path.join(tmpdir.strpath, 'dst_02', 'file_03'), 'rb') as file, open(os.path.join('files_folder', 'file_03'), 'rb') as src_file:
+        assert file.read() == src_file.read()
+    assert os.path.getmtime(os.path.join(tmpdir.strpath, 'dst_02', 'file_03')) == os.path.getmtime(os.path.join('files_folder', 'file_03'))
+
+    # the contents in memory stay within the byte budget, the least recently used are removed
+    source_cache = exputils.experimentgenerator.SourceFileCache()
+    source_cache.max_contents_size = 25
+    for idx in range(3):
+        with open(os.path.join(tmpdir.strpath, 'source_{}'.format(idx)), 'wb') as file:
+            file.write(bytes([idx]) * 10)
+
+    for idx in [0, 1, 0, 2]:
+        assert source_cache.get_content(os.path.join(tmpdir.strpath, 'source_{}'.format(idx))) == bytes([idx]) * 10
+    assert list(source_cache.contents.keys()) == [os.path.join(tmpdir.strpath, 'source_{}'.format(idx)) for idx in [0, 2]]
+    assert source_cache.n_content_bytes == 20
+
+    # hashes of files that are not held in memory are the same
+    source_cache.max_contents_size = 5
+    assert source_cache.get_hash(os.path.join(tmpdir.strpath, 'source_1')) == hashlib.sha1(bytes([1]) * 10).hexdigest()
@@ -58,4 +58,386 @@ def test_experimentstarter(tmpdir):
     assert os.path.isfile(os.path.join(directory, 'job04.txt'))
     assert os.path.isfile(os.path.join(directory, 'job01/job01.txt'))
     assert os.path.isfile(os.path.join(directory, 'job02/job02.txt'))
-    assert not os.path.isfile(os.path.join(directory, 'job03/job03.txt'))
\ No newline at end of file
+    assert not os.path.isfile(os.path.join(directory, 'job03/job03.txt'))
+
+def test_experimentstarter_max_workers(tmpdir):
+
+    def create_scripts(directory, n_scripts):
+        for idx in range(n_scripts):
+            os.makedirs(os.path.join(directory, 'job{:02d}'.format(idx)))
+            script_path = os.path.join(directory, 'job{:02d}'.format(idx), 'start.sh')
+            with open(script_path, 'w') as file:
+                file.write('#!/bin/bash\necho start >> ../log.txt\nsleep 0.2\necho end >> ../log.txt\nexit {}\n'.format(idx % 2))
+            os.chmod(script_path, 0o755)
+
+    def get_max_concurrency(directory):
+        concurrency = 0
+        max_concurrency = 0
+        with open(os.path.join(directory, 'log.txt'), 'r') as file:
+            for line in file.read().splitlines():
+                concurrency += 1 if line == 'start' else -1
+                max_concurrency = max(max_concurrency, concurrency)
+        return max_concurrency
+
+    ############################################################################
+    ## test 01 - max_workers
+
+    directory = os.path.join(tmpdir.strpath, 'test_01')
+    create_scripts(directory, 6)
+
+    results = exputils.start_experiments(directory=directory, max_workers=2)
+
+    assert sorted(results.keys()) == sorted(os.path.join(directory, 'job{:02d}'.format(idx), 'start.sh') for idx in range(6))
+    for script_path, result in results.items():
+        assert result['returncode'] == int(script_path[-10]) % 2
+        assert result['wall_time'] >= 0.2
+
+    assert get_max_concurrency(directory) == 2
+
+    ############################################################################
+    ## test 02 - resources
+
+    directory = os.path.join(tmpdir.strpath, 'test_02')
+    create_scripts(directory, 4)
+
+    exputils.start_experiments(directory=directory, resource_limits=dict(cores=4), job_resources=dict(cores=3))
+
+    assert get_max_concurrency(directory) == 1
+
+
+def test_experimentstarter_async(tmpdir):
+
+    import asyncio
+    import time
+
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    os.chdir(dir_path)
+
+    ############################################################################
+    ## test 01 - events and log files
+
+    directory = os.path.join(tmpdir.strpath, 'test_experimentstarter_async_01')
+    shutil.copytree('./start_scripts', directory)
+
+    async def collect_events():
+        return [event async for event in exputils.experimentstarter.start_experiments_async(directory=directory, max_workers=2)]
+
+    events = asyncio.run(collect_events())
+
+    script_paths = [os.path.join(directory, 'start.sh'), os.path.join(directory, 'job01', 'start.sh'), os.path.join(directory, 'job02', 'start.sh')]
+    assert sorted(event['script_path'] for event in events if event['event'] == 'started') == sorted(script_paths)
+    assert sorted(event['script_path'] for event in events if event['event'] == 'finished') == sorted(script_paths)
+    assert all(event['returncode'] == 0 for event in events if event['event'] == 'finished')
+
+    assert os.path.isfile(os.path.join(directory, 'job01/job01.txt'))
+    assert not os.path.isfile(os.path.join(directory, 'job03/job03.txt'))
+    assert os.path.isfile(os.path.join(directory, 'job01', 'start.sh.out'))
+    assert os.path.isfile(os.path.join(directory, 'job01', 'start.sh.err'))
+
+    ############################################################################
+    ## test 02 - cancellation terminates the running scripts
+
+    directory = os.path.join(tmpdir.strpath, 'test_experimentstarter_async_02')
+    os.makedirs(directory)
+    with open(os.path.join(directory, 'start.sh'), 'w') as file:
+        file.write('#!/bin/bash\necho running\nsleep 30\n')
+    os.chmod(os.path.join(directory, 'start.sh'), 0o755)
+
+    async def start_and_cancel():
+        events = exputils.experimentstarter.start_experiments_async(directory=directory)
+        event = await events.__anext__()
+        await events.aclose()
+        return event
+
+    start_time = time.time()
+    event = asyncio.run(start_and_cancel())
+
+    assert event['event'] == 'started'
+    assert time.time() - start_time < 10
+
+    # process is terminated and reaped
+    try:
+        os.kill(event['pid'], 0)
+        is_process_running = True
+    except ProcessLookupError:
+        is_process_running = False
+    assert not is_process_running
+
+
+def test_start_slurm_job_arrays(tmpdir):
+
+    directory = os.path.join(tmpdir.strpath, 'experiments')
+
+    # scripts with two different resource options, the output options are specific for each script
+    for idx in range(5):
+        os.makedirs(os.path.join(directory, 'job{:02d}'.format(idx)))
+        with open(os.path.join(directory, 'job{:02d}'.format(idx), 'run_experiment.slurm'), 'w') as file:
+            file.write('#!/bin/bash\n'
+                       '#SBATCH --time=00:0{}:00\n'
+                       '#SBATCH -o run_experiment.slurm.out\n'
+                       'echo job{:02d} > job.txt\n'.format(idx % 2, idx))
+
+    # fake sbatch that runs all tasks of an array locally and records its calls
+    sbatch_path = os.path.join(tmpdir.strpath, 'sbatch')
+    with open(sbatch_path, 'w') as file:
+        file.write('#!/bin/bash\n'
+                   'echo "$1" >> "$(dirname "$0")/sbatch_calls.txt"\n'
+                   'RANGE=$(grep -- "--array=" "$1" | sed "s/.*--array=//")\n'
+                   'for i in $(seq ${RANGE%-*} ${RANGE#*-}); do SLURM_ARRAY_TASK_ID=$i bash "$1"; done\n'
+                   'echo "Submitted batch job 42"\n')
+    os.chmod(sbatch_path, 0o755)
+
+    job_arrays = exputils.start_slurm_experiments(directory=directory,
+                                                  is_job_array=True,
+                                                  max_array_size=2,
+                                                  sbatch_command=sbatch_path)
+
+    # 3 scripts with the first options need 2 arrays, 2 scripts with the second options need 1 array
+    assert len(job_arrays) == 3
+    assert [len(job_array['script_paths']) for job_array in job_arrays] == [2, 1, 2]
+    assert all(job_array['returncode'] == 0 and job_array['job_id'] == '42' for job_array in job_arrays)
+
+    with open(os.path.join(tmpdir.strpath, 'sbatch_calls.txt'), 'r') as file:
+        assert len(file.read().splitlines()) == 3
+
+    with open(job_arrays[0]['array_script'], 'r') as file:
+        array_script = file.read()
+    assert '#SBATCH --time=00:00:00' in array_script
+    assert '#SBATCH --array=0-1' in array_script
+    assert 'run_experiment.slurm.out' not in array_script
+
+    # each script was executed in its own directory
+    for idx in range(5):
+        with open(os.path.join(directory, 'job{:02d}'.format(idx), 'job.txt'), 'r') as file:
+            assert file.read().strip() == 'job{:02d}'.format(idx)
+        assert os.path.isfile(os.path.join(directory, 'job{:02d}'.format(idx), 'run_experiment.slurm.out'))
+
+    # arrays that are submitted in the same second do not overwrite the files of earlier arrays
+    job_array_directory = os.path.join(directory, 'slurm_job_arrays')
+    new_job_arrays = exputils.experimentstarter.submit_slurm_job_arrays([job_arrays[0]['script_paths'][0]],
+                                                                       job_array_directory,
+                                                                       max_array_size=2,
+                                                                       sbatch_command=sbatch_path)
+    array_scripts = [job_array['array_script'] for job_array in job_arrays + new_job_arrays]
+    assert len(set(array_scripts)) == 4
+    assert len(os.listdir(job_array_directory)) == 8
+
+
+def test_start_slurm_experiments_skip_queued_jobs(tmpdir):
+
+    directory = os.path.join(tmpdir.strpath, 'experiments')
+
+    for idx in range(3):
+        os.makedirs(os.path.join(directory, 'job{:02d}'.format(idx)))
+        with open(os.path.join(directory, 'job{:02d}'.format(idx), 'run_experiment.slurm'), 'w') as file:
+            file.write('#!/bin/bash\n')
+
+    # fake sbatch that numbers the submitted jobs (submitted one after another), fake squeue that lists job 2 as pending and job 3 as running
+    sbatch_path = os.path.join(tmpdir.strpath, 'sbatch')
+    with open(sbatch_path, 'w') as file:
+        file.write('#!/bin/bash\n'
+                   'COUNTER="$(dirname "$0")/counter.txt"\n'
+                   'echo x >> "$COUNTER"\n'
+                   'echo "Submitted batch job $(wc -l < "$COUNTER")"\n')
+    os.chmod(sbatch_path, 0o755)
+
+    squeue_path = os.path.join(tmpdir.strpath, 'squeue')
+    with open(squeue_path, 'w') as file:
+        file.write('#!/bin/bash\n'
+                   'echo x >> "$(dirname "$0")/squeue_calls.txt"\n'
+                   'echo "2 PD"\n'
+                   'echo "3 R"\n'
+                   'echo "5 CD"\n')
+    os.chmod(squeue_path, 0o755)
+
+    results = exputils.start_slurm_experiments(directory=directory, sbatch_command=sbatch_path, queue_command=squeue_path, is_parallel=False)
+
+    assert sorted(result['job_id'] for result in results.values()) == ['1', '2', '3']
+    for script_path, result in results.items():
+        with open(script_path + '.jobid', 'r') as file:
+            assert file.read().strip() == result['job_id']
+
+    # the queue is not requested if no script has been submitted before
+    assert not os.path.isfile(os.path.join(tmpdir.strpath, 'squeue_calls.txt'))
+
+    # only the script whose job is not in the queue anymore is submitted again
+    job_1_script_path = [script_path for script_path, result in results.items() if result['job_id'] == '1'][0]
+
+    results = exputils.start_slurm_experiments(directory=directory, sbatch_command=sbatch_path, queue_command=squeue_path, is_parallel=False)
+
+    assert list(results.keys()) == [job_1_script_path]
+    assert results[job_1_script_path]['job_id'] == '4'
+
+    with open(os.path.join(tmpdir.strpath, 'squeue_calls.txt'), 'r') as file:
+        assert len(file.read().splitlines()) == 1
+
+
+def test_start_slurm_experiments_skip_queued_array_tasks(tmpdir):
+
+    directory = os.path.join(tmpdir.strpath, 'experiments')
+
+    # tasks of a job array: 10_1 is running, 10_2 has failed, 10_4 is pending; job 7 has completed
+    job_ids = ['10_1', '10_2', '10_4', '7']
+    for idx, job_id in enumerate(job_ids):
+        os.makedirs(os.path.join(directory, 'job{:02d}'.format(idx)))
+        with open(os.path.join(directory, 'job{:02d}'.format(idx), 'run_experiment.slurm'), 'w') as file:
+            file.write('#!/bin/bash\n')
+        with open(os.path.join(directory, 'job{:02d}'.format(idx), 'run_experiment.slurm.jobid'), 'w') as file:
+            file.write(job_id + '\n')
+
+    sbatch_path = os.path.join(tmpdir.strpath, 'sbatch')
+    with open(sbatch_path, 'w') as file:
+        file.write('#!/bin/bash\n'
+                   'echo "Submitted batch job 11"\n')
+    os.chmod(sbatch_path, 0o755)
+
+    # squeue compresses the pending tasks of an array into a range
+    squeue_path = os.path.join(tmpdir.strpath, 'squeue')
+    with open(squeue_path, 'w') as file:
+        file.write('#!/bin/bash\n'
+                   'echo "10_[3-5%2] PD"\n'
+                   'echo "10_1 R"\n'
+                   'echo "10_2 F"\n'
+                   'echo "7 CD"\n')
+    os.chmod(squeue_path, 0o755)
+
+    results = exputils.start_slurm_experiments(directory=directory, sbatch_command=sbatch_path, queue_command=squeue_path)
+
+    assert sorted(results.keys()) == [os.path.join(directory, 'job{:02d}'.format(idx), 'run_experiment.slurm') for idx in [1, 3]]
+
+    assert exputils.experimentstarter.expand_job_ids('123[4].server') == ['123_4']
+    assert exputils.experimentstarter.expand_job_ids('123_[1-3,7%2]') == ['123_1', '123_2', '123_3', '123_7']
+    assert exputils.experimentstarter.is_job_queued('123', {'123_2'})
+    assert exputils.experimentstarter.is_job_queued('123_2', {'123'})
+    assert not exputils.experimentstarter.is_job_queued('123_2', {'123_1'})
+    assert exputils.experimentstarter.get_base_job_ids({'123_1', '123_2', '7'}) == {'123', '7'}
+    assert exputils.experimentstarter.is_job_queued('123', {'123_2'}, queued_base_job_ids={'123'})
+
+
+def test_start_experiments_status_index(tmpdir):
+
+    directory = os.path.join(tmpdir.strpath, 'experiments')
+
+    def create_script(idx):
+        os.makedirs(os.path.join(directory, 'job{:02d}'.format(idx)))
+        script_path = os.path.join(directory, 'job{:02d}'.format(idx), 'start.sh')
+        with open(script_path, 'w') as file:
+            file.write('#!/bin/bash\n'
+                       'echo run >> run.txt\n'
+                       'echo finished >> start.sh.status\n'
+                       'printf "%s\\t%s\\n" "$PWD/start.sh" finished >> "$EXPUTILS_STATUS_INDEX"\n')
+        os.chmod(script_path, 0o755)
+
+    def get_n_runs(idx):
+        run_file_path = os.path.join(directory, 'job{:02d}'.format(idx), 'run.txt')
+        if not os.path.isfile(run_file_path):
+            return 0
+        with open(run_file_path, 'r') as file:
+            return len(file.read().splitlines())
+
+    for idx in range(3):
+        create_script(idx)
+
+    # the index is built from the tree and updated by the scripts
+    exputils.start_experiments(directory=directory, start_scripts='start.sh', use_status_index=True)
+    assert [get_n_runs(idx) for idx in range(3)] == [1, 1, 1]
+
+    index = exputils.experimentstarter.load_status_index(directory, start_scripts='start.sh')
+    assert list(index.values()) == ['finished', 'finished', 'finished']
+    assert set(index.keys()) == set(os.path.join(directory, 'job{:02d}'.format(idx), 'start.sh') for idx in range(3))
+
+    # finished scripts in the index are not started and their status files are not needed
+    os.remove(os.path.join(directory, 'job00', 'start.sh.status'))
+    exputils.start_experiments(directory=directory, start_scripts='start.sh', use_status_index=True)
+    assert [get_n_runs(idx) for idx in range(3)] == [1, 1, 1]
+
+    # new scripts are only found after a rebuild of the index from the tree
+    create_script(3)
+    exputils.start_experiments(directory=directory, start_scripts='start.sh', use_status_index=True)
+    assert get_n_runs(3) == 0
+
+    exputils.start_experiments(directory=directory, start_scripts='start.sh', use_status_index=True, rebuild_status_index=True)
+    assert [get_n_runs(idx) for idx in range(4)] == [2, 1, 1, 1]
+
+
+def test_read_last_line(tmpdir):
+
+    file_path = os.path.join(tmpdir.strpath, 'file.status')
+
+    with open(file_path, 'w') as file:
+        file.write(''.join('line {}\n'.format(idx) for idx in range(1000)) + 'last line\n\n')
+    assert exputils.experimentstarter.read_last_line(file_path, block_size=7) == 'last line'
+
+    with open(file_path, 'w') as file:
+        file.write('single line')
+    assert exputils.experimentstarter.read_last_line(file_path) == 'single line'
+
+    with open(file_path, 'w') as file:
+        pass
+    assert exputils.experimentstarter.read_last_line(file_path) == ''
+
+
+def test_start_torque_experiments_concurrent_submission(tmpdir):
+
+    directory = os.path.join(tmpdir.strpath, 'experiments')
+
+    for idx in range(8):
+        os.makedirs(os.path.join(directory, 'job{:02d}'.format(idx)))
+        with open(os.path.join(directory, 'job{:02d}'.format(idx), 'run_experiment.torque'), 'w') as file:
+            file.write('#!/bin/bash\n')
+
+    # fake qsub that answers with a job id made of the name of the directory in which it was called
+    qsub_path = os.path.join(tmpdir.strpath, 'qsub')
+    with open(qsub_path, 'w') as file:
+        file.write('#!/bin/bash\n'
+                   'sleep 0.1\n'
+                   'test -f "$1" || exit 1\n'
+                   'echo "$(basename "$PWD" | tr -d job).server"\n')
+    os.chmod(qsub_path, 0o755)
+
+    cwd = os.getcwd()
+
+    results = exputils.start_torque_experiments(directory=directory, qsub_command=qsub_path, n_jobs=4)
+
+    assert os.getcwd() == cwd
+    assert len(results) == 8
+    for script_path, result in results.items():
+        assert result['returncode'] == 0
+        assert result['job_id'] == '{}.server'.format(os.path.basename(os.path.dirname(script_path))[3:])
+
+    # without is_parallel the jobs are submitted one after another, the fake qsub fails if it is called concurrently
+    for script_path in results.keys():
+        os.remove(script_path + '.jobid')
+
+    with open(qsub_path, 'w') as file:
+        file.write('#!/bin/bash\n'
+                   'mkdir "$(dirname "$0")/qsub.lock" || exit 1\n'
+                   'sleep 0.05\n'
+                   'rmdir "$(dirname "$0")/qsub.lock"\n'
+                   'echo "$(basename "$PWD" | tr -d job).server"\n')
+
+    results = exputils.start_torque_experiments(directory=directory, qsub_command=qsub_path, n_jobs=4, is_parallel=False)
+
+    assert len(results) == 8
+    assert all(result['returncode'] == 0 for result in results.values())
+
+    # by default the jobs are submitted at the same time, the fake qsub records how many submissions are running
+    for script_path in results.keys():
+        os.remove(script_path + '.jobid')
+
+    os.mkdir(os.path.join(tmpdir.strpath, 'running'))
+    with open(qsub_path, 'w') as file:
+        file.write('#!/bin/bash\n'
+                   'RUNNING="$(dirname "$0")/running"\n'
+                   'touch "$RUNNING/$$"\n'
+                   'sleep 0.2\n'
+                   'ls "$RUNNING" | wc -l >> "$(dirname "$0")/n_running.txt"\n'
+                   'rm "$RUNNING/$$"\n'
+                   'echo "$(basename "$PWD" | tr -d job).server"\n')
+
+    results = exputils.start_torque_experiments(directory=directory, qsub_command=qsub_path)
+
+    assert len(results) == 8
+    assert all(result['returncode'] == 0 for result in results.values())
+    with open(os.path.join(tmpdir.strpath, 'n_running.txt'), 'r') as file:
+        assert max(int(line) for line in file.read().split()) > 1
@@ -58,4 +58,41 @@ def test_numpy_vstack_2d_default():
 
     trg = np.array([10, 20, 30])
 
-    np.testing.assert_equal(result, trg)
\ No newline at end of file
+    np.testing.assert_equal(result, trg)
+
+def test_numpy_vstack_2d_default_batch():
+
+    arrays = [[1, 2, 3], [10, 20, 30, 40], [], [[5, 6], [7, 8]], [100]]
+
+    # same result as repeated calls of numpy_vstack_2d_default
+    trg = arrays[0]
+    for array in arrays[1:]:
+        trg = exputils.misc.numpy_vstack_2d_default(trg, array)
+
+    result = exputils.misc.numpy_vstack_2d_default_batch(array for array in arrays)
+
+    assert result.shape == (5, 4)
+    assert np.array_equal(result, trg, equal_nan=True)
+
+    #################
+
+    # without padding the type is kept
+    result = exputils.misc.numpy_vstack_2d_default_batch([np.array([1, 2], dtype=np.int32), np.array([3, 4], dtype=np.int32)])
+    assert result.dtype == np.int32
+    assert np.all(result == [[1, 2], [3, 4]])
+
+    #################
+
+    # masked output keeps the type
+    result = exputils.misc.numpy_vstack_2d_default_batch([np.array([1, 2, 3]), np.array([4])], is_masked=True)
+    assert result.dtype == np.array([1]).dtype
+    assert np.all(result.mask == [[False, False, False], [False, True, True]])
+    assert result.sum() == 10
+
+    #################
+
+    # pre-allocated output
+    out = np.zeros((2, 3))
+    result = exputils.misc.numpy_vstack_2d_default_batch([[1, 2, 3], [4]], default_value=-1, out=out)
+    assert result is out
+    assert np.all(out == [[1, 2, 3], [4, -1, -1]])
@@ -0,0 +1,33 @@
+import exputils.odsreader
+import os
+
+def test_streaming_ods_reader():
+
+    dir_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'experimentgenerator')
+
+    for filename in ['test_01.ods', 'test_02.ods', 'test_03.ods', 'test_04.ods', 'test_05.ods', 'test_06.ods']:
+
+        filepath = os.path.join(dir_path, filename)
+
+        for clonespannedcolumns in [None, False]:
+
+            doc = exputils.odsreader.ODSReader(filepath, clonespannedcolumns=clonespannedcolumns)
+            streaming_doc = exputils.odsreader.StreamingODSReader(filepath, clonespannedcolumns=clonespannedcolumns)
+
+            assert list(streaming_doc.sheets.keys()) == list(doc.sheets.keys())
+            assert streaming_doc.sheets == doc.sheets
+
+    #################
+    # single sheet and row range
+
+    filepath = os.path.join(dir_path, 'test_01.ods')
+
+    doc = exputils.odsreader.ODSReader(filepath)
+
+    streaming_doc = exputils.odsreader.StreamingODSReader(filepath, sheet_names='group_02')
+    assert list(streaming_doc.sheets.keys()) == ['group_02']
+    assert streaming_doc.sheets['group_02'] == doc.sheets['group_02']
+
+    streaming_doc = exputils.odsreader.StreamingODSReader(filepath, row_range=(1, 5))
+    for sheet_name, sheet_data in doc.sheets.items():
+        assert streaming_doc.sheets[sheet_name] == sheet_data[1:5]
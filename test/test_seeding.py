@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+import exputils.seeding
+
+
+def test_independent_generators():
+
+    # the same ids give the same random numbers
+    assert np.all(exputils.seeding.get_generator(42, 1, 2).random(5) == exputils.seeding.get_generator(42, 1, 2).random(5))
+
+    # different experiments, repetitions, workers and levels give different random numbers
+    samples = [exputils.seeding.get_generator(42, 1, 2).random(5),
+               exputils.seeding.get_generator(42, 1, 3).random(5),
+               exputils.seeding.get_generator(42, 2, 2).random(5),
+               exputils.seeding.get_generator(42, 1, 2, 0).random(5),
+               exputils.seeding.get_generator(42, repetition_id=1).random(5),
+               exputils.seeding.get_generator(42, experiment_id=1).random(5),
+               exputils.seeding.get_generator(43, 1, 2).random(5)]
+    for idx_a in range(len(samples)):
+        for idx_b in range(idx_a + 1, len(samples)):
+            assert not np.any(samples[idx_a] == samples[idx_b])
+
+    workers = exputils.seeding.spawn_generators(3, 42, 1, 2)
+    assert np.all(workers[0].random(5) == exputils.seeding.get_generator(42, 1, 2, 0).random(5))
+
+    # generators spawned from the generator of an experiment differ from the generators of its repetitions
+    generator = exputils.seeding.set_experiment_seed(42, experiment_id=1)
+    assert not np.any(generator.spawn(3)[2].random(5) == exputils.seeding.get_generator(42, 1, 2).random(5))
+    assert not np.any(exputils.seeding.get_seed_sequence(42, 1).spawn(2)[1].spawn(3)[2].generate_state(4) ==
+                      exputils.seeding.get_seed_sequence(42, 1, 2).generate_state(4))
+
+    with pytest.raises(ValueError):
+        exputils.seeding.get_generator(42, experiment_id=-1)
+
+
+def test_rng_state_numpy():
+
+    generator = exputils.seeding.set_experiment_seed(42, experiment_id=1, repetition_id=2)
+
+    state = exputils.seeding.get_rng_state([generator])
+    values = (np.random.rand(), generator.random())
+
+    exputils.seeding.set_rng_state(state, [generator])
+    assert (np.random.rand(), generator.random()) == values
+
+
+def test_rng_state():
+
+    torch = pytest.importorskip('torch')
+
+    generator = exputils.seeding.set_experiment_seed(42, experiment_id=1, repetition_id=2)
+
+    state = exputils.seeding.get_rng_state([generator])
+    values = (np.random.rand(), torch.rand(1).item(), generator.random())
+
+    exputils.seeding.set_rng_state(state, [generator])
+    assert (np.random.rand(), torch.rand(1).item(), generator.random()) == values
+
+    # seeding again gives the same random numbers
+    generator = exputils.seeding.set_experiment_seed(42, experiment_id=1, repetition_id=2)
+    assert (np.random.rand(), torch.rand(1).item(), generator.random()) == values
@@ -0,0 +1,439 @@
+import os
+import subprocess
+import sys
+import exputils
+import exputils.statisticcalculator
+import numpy as np
+import pytest
+
+
+def create_experiments(directory, n_experiments=2, n_repetitions=3):
+    for experiment_idx in range(n_experiments):
+        for repetition_idx in range(n_repetitions):
+            repetition_directory = os.path.join(directory, 'experiment_{:06d}'.format(experiment_idx), 'repetition_{:06d}'.format(repetition_idx))
+            os.makedirs(repetition_directory)
+            np.save(os.path.join(repetition_directory, 'data.npy'), np.arange(5) + 10 * experiment_idx + repetition_idx)
+
+
+def load_data(experiment_folder):
+    if 'repetition_000001' in experiment_folder and 'experiment_000001' in experiment_folder:
+        raise ValueError('corrupt data')
+    return np.load(os.path.join(experiment_folder, 'data.npy'))
+
+
+def calc_sum(data):
+    return np.sum(data)
+
+
+def calc_min_max(data):
+    return dict(min=np.min(data), max=np.max(data))
+
+
+def test_calc_experiment_statistics_parallel(tmpdir):
+
+    statistics = [('sum', calc_sum), ('min_max', calc_min_max)]
+
+    directory = os.path.join(tmpdir.strpath, 'experiments')
+    create_experiments(directory)
+
+    with pytest.raises(exputils.statisticcalculator.StatisticCalculationError) as error_info:
+        exputils.calc_experiment_statistics(statistics, load_data, directory, n_jobs=2)
+
+    # the error of one folder does not stop the calculation of the others
+    failed_folder = os.path.join(directory, 'experiment_000001', 'repetition_000001')
+    assert list(error_info.value.errors.keys()) == [failed_folder]
+    assert isinstance(error_info.value.errors[failed_folder], ValueError)
+
+    for experiment_idx in range(2):
+        for repetition_idx in range(3):
+            statistics_directory = os.path.join(directory, 'experiment_{:06d}'.format(experiment_idx), 'repetition_{:06d}'.format(repetition_idx), 'statistics')
+
+            if experiment_idx == 1 and repetition_idx == 1:
+                assert os.listdir(statistics_directory) == []
+                continue
+
+            # no temporary files are left
+            assert sorted(os.listdir(statistics_directory)) == ['.statistics_metadata.json', 'min_max.npz', 'sum.npy']
+
+            offset = 10 * experiment_idx + repetition_idx
+            assert np.load(os.path.join(statistics_directory, 'sum.npy')) == 10 + 5 * offset
+            assert np.load(os.path.join(statistics_directory, 'min_max.npz'))['max'] == 4 + offset
+
+    # serial calculation raises the error directly
+    with pytest.raises(ValueError):
+        exputils.calc_experiment_statistics(statistics, load_data, directory, recalculate_statistics=True)
+
+
+def calc_mean_over_repetitions(data):
+    return np.mean(data, axis=0)
+
+
+def load_repetition_data(repetition_folders):
+    return np.array([np.load(os.path.join(folder, 'data.npy')) for folder in sorted(repetition_folders)])
+
+
+def test_recalculate_outdated_statistics(tmpdir):
+
+    directory = os.path.join(tmpdir.strpath, 'experiments')
+    create_experiments(directory, n_experiments=2, n_repetitions=2)
+
+    def get_mtimes(filename):
+        return [os.stat(os.path.join(directory, 'experiment_{:06d}'.format(experiment_idx), 'statistics', filename)).st_mtime_ns
+                for experiment_idx in range(2)]
+
+    statistics = [dict(name='mean', function=calc_mean_over_repetitions, version=1)]
+
+    exputils.calc_statistics_over_repetitions(statistics, load_repetition_data, directory, recalculate_statistics='outdated')
+    mtimes = get_mtimes('mean.npy')
+
+    # nothing changed
+    exputils.calc_statistics_over_repetitions(statistics, load_repetition_data, directory, recalculate_statistics='outdated')
+    assert get_mtimes('mean.npy') == mtimes
+
+    # changed data of one experiment
+    data_path = os.path.join(directory, 'experiment_000001', 'repetition_000000', 'data.npy')
+    np.save(data_path, np.zeros(5))
+    os.utime(data_path, ns=(0, 0))
+
+    exputils.calc_statistics_over_repetitions(statistics, load_repetition_data, directory, recalculate_statistics='outdated')
+    new_mtimes = get_mtimes('mean.npy')
+    assert new_mtimes[0] == mtimes[0] and new_mtimes[1] != mtimes[1]
+    assert np.all(np.load(os.path.join(directory, 'experiment_000001', 'statistics', 'mean.npy')) == (np.arange(5) + 11) / 2)
+
+    # changed version of the function
+    statistics = [dict(name='mean', function=calc_mean_over_repetitions, version=2)]
+    exputils.calc_statistics_over_repetitions(statistics, load_repetition_data, directory, recalculate_statistics='outdated')
+    assert all(mtime != new_mtime for mtime, new_mtime in zip(get_mtimes('mean.npy'), new_mtimes))
+
+    # changed code of the function
+    new_mtimes = get_mtimes('mean.npy')
+    statistics = [dict(name='mean', function=lambda data: np.mean(data, axis=0) + 1)]
+    exputils.calc_statistics_over_repetitions(statistics, load_repetition_data, directory, recalculate_statistics=False)
+    assert get_mtimes('mean.npy') == new_mtimes
+    exputils.calc_statistics_over_repetitions(statistics, load_repetition_data, directory, recalculate_statistics='outdated')
+    assert all(mtime != new_mtime for mtime, new_mtime in zip(get_mtimes('mean.npy'), new_mtimes))
+
+
+def test_calc_function_hash_nested_code():
+
+    source = (
+        'def calc_statistic(data):\n'
+        '    squares = [value ** 2 for value in data]\n'
+        '    return sum(value for value in squares) + (lambda x: x)(1)\n'
+    )
+
+    # the function is created twice, so that its nested code objects have different memory addresses
+    hashes = []
+    for _ in range(2):
+        namespace = dict()
+        exec(source, namespace)
+        hashes.append(exputils.statisticcalculator.calc_function_hash(namespace['calc_statistic']))
+    assert hashes[0] == hashes[1]
+
+    namespace = dict()
+    exec(source.replace('value ** 2', 'value ** 3'), namespace)
+    assert exputils.statisticcalculator.calc_function_hash(namespace['calc_statistic']) != hashes[0]
+
+
+def run_with_hash_seed(tmpdir, expression, hash_seed):
+    '''Evaluates an expression in a new interpreter with a PYTHONHASHSEED and with the module calc_module.py.'''
+
+    with open(os.path.join(tmpdir.strpath, 'calc_module.py'), 'w') as file:
+        file.write('def calc_statistic(data):\n'
+                   '    names = [name for name in data if name in {\'alpha\', \'beta\', \'gamma\', \'delta\'}]\n'
+                   '    return len(names) + (data[0] in {\'epsilon\', \'zeta\', (1, frozenset({\'eta\', \'theta\'}))})\n')
+
+    env = dict(os.environ,
+               PYTHONHASHSEED=str(hash_seed),
+               PYTHONPATH=os.pathsep.join([tmpdir.strpath, os.path.dirname(os.path.dirname(exputils.__file__))]))
+    process = subprocess.run([sys.executable, '-c', 'import calc_module, exputils.statisticcalculator; print({})'.format(expression)],
+                             stdout=subprocess.PIPE, universal_newlines=True, env=env, check=True)
+    return process.stdout.strip()
+
+
+def test_calc_function_hash_set_constants(tmpdir):
+
+    # the order of the elements of set literals depends on the hash seed, the hash of the function does not
+    hashes = [run_with_hash_seed(tmpdir, 'exputils.statisticcalculator.calc_function_hash(calc_module.calc_statistic)', hash_seed)
+              for hash_seed in range(4)]
+    assert len(set(hashes)) == 1
+
+
+def test_data_cache_name_stable(tmpdir):
+
+    # the default name of the cache identifies the loader in the cache directory over several runs
+    names = [run_with_hash_seed(tmpdir, 'exputils.statisticcalculator.DataCache(calc_module.calc_statistic).name', hash_seed)
+             for hash_seed in range(4)]
+    assert len(set(names)) == 1
+    assert names[0].startswith('calc_module.calc_statistic:')
+
+
+def load_repetition_data_file(repetition_folder):
+    return np.load(os.path.join(repetition_folder, 'data.npy'))
+
+
+def calc_zip_statistic(data):
+    return dict(text=str(np.sum(data)))
+
+
+def test_load_experiment_statistics(tmpdir):
+
+    directory = os.path.join(tmpdir.strpath, 'experiments')
+    create_experiments(directory, n_experiments=2, n_repetitions=2)
+
+    statistics = [('sum', calc_sum), ('min_max', calc_min_max), ('text', calc_zip_statistic, 'zip')]
+    exputils.calc_experiment_statistics(statistics, load_repetition_data_file, directory)
+
+    loaded_statistics = exputils.load_experiment_statistics(directory)
+
+    repetition_folder = os.path.join(directory, 'experiment_000001', 'repetition_000000')
+    assert len(loaded_statistics) == 4
+    assert list(loaded_statistics[repetition_folder].keys()) == ['min_max', 'sum', 'text']
+
+    # npy files are memory-mapped
+    sum_statistic = loaded_statistics[repetition_folder]['sum']
+    assert isinstance(sum_statistic.data, np.memmap)
+    assert sum_statistic.load() == 10 + 5 * 10
+    assert np.asarray(sum_statistic) == 60
+
+    # npz and zip files are read per key
+    min_max_statistic = loaded_statistics[repetition_folder]['min_max']
+    assert sorted(min_max_statistic.keys()) == ['max', 'min']
+    assert min_max_statistic['max'] == 14
+    assert loaded_statistics[repetition_folder]['text']['text'] == b'60'
+
+    # selection of statistics
+    loaded_statistics = exputils.load_experiment_statistics(directory, statistic_names=['sum'])
+    assert all(list(folder_statistics.keys()) == ['sum'] for folder_statistics in loaded_statistics.values())
+
+
+def test_lazy_numpy_statistic_slice(tmpdir):
+
+    filepath = os.path.join(tmpdir.strpath, 'large.npy')
+    np.save(filepath, np.arange(10000).reshape(100, 100))
+
+    statistic = exputils.statisticcalculator.LazyNumpyStatistic(filepath)
+    assert statistic.shape == (100, 100)
+    assert np.all(statistic[5, 10:12] == [510, 511])
+
+
+def test_lazy_statistics_allow_pickle(tmpdir):
+
+    filepath = os.path.join(tmpdir.strpath, 'objects.npy')
+    np.save(filepath, np.array([dict(a=1), None], dtype=object))
+    archive_filepath = os.path.join(tmpdir.strpath, 'objects.npz')
+    np.savez(archive_filepath, objects=np.array([dict(a=1), None], dtype=object))
+
+    # arrays of objects are not unpickled by default
+    with pytest.raises(ValueError):
+        exputils.statisticcalculator.LazyNumpyStatistic(filepath).data
+    with pytest.raises(ValueError):
+        exputils.statisticcalculator.LazyArchiveStatistic(archive_filepath)['objects']
+
+    assert exputils.statisticcalculator.LazyNumpyStatistic(filepath, allow_pickle=True)[0] == dict(a=1)
+    assert exputils.statisticcalculator.LazyArchiveStatistic(archive_filepath, allow_pickle=True)['objects'][0] == dict(a=1)
+
+
+def calc_values(data):
+    # ragged lengths over the repetitions
+    return data[:int(data[0]) % 10 + 1]
+
+
+def test_consolidate_statistics(tmpdir):
+
+    directory = os.path.join(tmpdir.strpath, 'experiments')
+    create_experiments(directory, n_experiments=2, n_repetitions=3)
+
+    statistics = [('sum', calc_sum), ('min_max', calc_min_max), ('values', calc_values), ('text', calc_zip_statistic, 'zip')]
+    exputils.calc_experiment_statistics(statistics, load_repetition_data_file, directory)
+
+    store_directory = exputils.consolidate_statistics(directory)
+    store = exputils.load_statistics_store(store_directory)
+
+    assert sorted(store.names) == ['min_max/max', 'min_max/min', 'sum', 'values']
+    assert list(store.experiment_ids) == [0, 0, 0, 1, 1, 1]
+    assert list(store.repetition_ids) == [0, 1, 2, 0, 1, 2]
+
+    # the same values as stored per folder
+    assert isinstance(store.get('sum'), np.memmap)
+    assert np.all(store.get('sum') == [10 + 5 * (10 * experiment_idx + repetition_idx) for experiment_idx in range(2) for repetition_idx in range(3)])
+    assert np.all(store.get('min_max/max', experiment_id=1) == [14, 15, 16])
+
+    # ragged values are padded like numpy_vstack_2d_default
+    values = [np.load(os.path.join(directory, 'experiment_000001', 'repetition_{:06d}'.format(repetition_idx), 'statistics', 'values.npy')) for repetition_idx in range(3)]
+    target = exputils.misc.numpy_vstack_2d_default(exputils.misc.numpy_vstack_2d_default(values[0], values[1]), values[2])
+    assert np.array_equal(store.get('values', experiment_id=1), target, equal_nan=True)
+
+    assert np.all(store.get_value('values', 4) == values[1])
+
+    # shapes and types for the store are read from the headers of the files
+    folder_statistics = exputils.load_experiment_statistics(os.path.join(directory, 'experiment_000001', 'repetition_000001'))
+    folder_statistics = list(folder_statistics.values())[0]
+    assert folder_statistics['values'].read_header() == (values[1].shape, values[1].dtype)
+    assert folder_statistics['min_max'].read_header('max') == ((), np.dtype(int))
+    assert store.get('values', experiment_id=0, repetition_id=2).shape == (1, 3)
+
+
+def test_streaming_statistics_over_repetitions(tmpdir):
+
+    directory = os.path.join(tmpdir.strpath, 'experiments')
+    create_experiments(directory, n_experiments=1, n_repetitions=4)
+
+    loaded_folders = []
+
+    def load_counted_repetition_data(repetition_folders):
+        loaded_folders.append(sorted(repetition_folders))
+        return load_repetition_data(repetition_folders)
+
+    statistics = [dict(name='mean_var', function=lambda data: data[0], type='streaming', accumulator=exputils.statisticaccumulator.MeanVarianceAccumulator),
+                  dict(name='min_max', function=lambda data: data[0], type='streaming', accumulator=exputils.statisticaccumulator.MinMaxAccumulator),
+                  dict(name='histogram', function=lambda data: data[0], type='streaming', accumulator=lambda: exputils.statisticaccumulator.HistogramAccumulator(bins=4, value_range=(0, 8))),
+                  dict(name='quantiles', function=lambda data: data[0], type='streaming', accumulator=lambda: exputils.statisticaccumulator.QuantileAccumulator(quantiles=[0.5]))]
+
+    exputils.calc_statistics_over_repetitions(statistics, load_counted_repetition_data, directory)
+
+    # the repetitions were loaded one by one
+    assert [len(folders) for folders in loaded_folders] == [1, 1, 1, 1]
+
+    all_data = load_repetition_data(sum(loaded_folders, []))
+    statistics_directory = os.path.join(directory, 'experiment_000000', 'statistics')
+
+    mean_var = np.load(os.path.join(statistics_directory, 'mean_var.npz'))
+    assert mean_var['count'] == 4
+    assert np.allclose(mean_var['mean'], np.mean(all_data, axis=0))
+    assert np.allclose(mean_var['var'], np.var(all_data, axis=0))
+
+    min_max = np.load(os.path.join(statistics_directory, 'min_max.npz'))
+    assert np.all(min_max['min'] == np.min(all_data, axis=0)) and np.all(min_max['max'] == np.max(all_data, axis=0))
+
+    histogram = np.load(os.path.join(statistics_directory, 'histogram.npz'))
+    assert np.all(histogram['counts'] == np.histogram(all_data, bins=4, range=(0, 8))[0])
+
+    quantiles = np.load(os.path.join(statistics_directory, 'quantiles.npz'))
+    assert np.allclose(quantiles['values'], np.median(all_data))
+
+
+def test_accumulator_merge():
+
+    values = np.random.RandomState(1).normal(size=(20, 3))
+
+    accumulators = [exputils.statisticaccumulator.MeanVarianceAccumulator(ddof=1) for _ in range(2)]
+    for idx, value in enumerate(values):
+        accumulators[idx % 2].add(value)
+    accumulators[0].merge(accumulators[1])
+
+    result = accumulators[0].result()
+    assert result['count'] == 20
+    assert np.allclose(result['mean'], np.mean(values, axis=0))
+    assert np.allclose(result['var'], np.var(values, axis=0, ddof=1))
+
+    # approximate quantiles of many values with a bounded sample
+    quantile_accumulator = exputils.statisticaccumulator.QuantileAccumulator(quantiles=[0.5], max_samples=1000, seed=1)
+    for value in np.random.RandomState(2).uniform(size=(50, 1000)):
+        quantile_accumulator.add(value)
+    assert len(quantile_accumulator.samples) == 1000
+    assert abs(quantile_accumulator.result()['values'][0] - 0.5) < 0.05
+
+
+def test_build_campaign_index(tmpdir, monkeypatch):
+
+    directory = os.path.join(tmpdir.strpath, 'campaign')
+    create_experiments(os.path.join(directory, 'group_a'), n_experiments=2, n_repetitions=2)
+    create_experiments(os.path.join(directory, 'group_b'), n_experiments=1, n_repetitions=3)
+    os.makedirs(os.path.join(directory, 'group_a', 'experiment_000000', 'statistics', 'repetition_000099'))
+    os.makedirs(os.path.join(directory, '.backup', 'experiment_000000', 'repetition_000000'))
+
+    index_filepath = os.path.join(directory, exputils.statisticcalculator.CAMPAIGN_INDEX_FILENAME)
+    campaign_index = exputils.build_campaign_index(directory, index_filepath=index_filepath)
+
+    assert campaign_index.get_group_directories() == [os.path.join(directory, 'group_a'), os.path.join(directory, 'group_b')]
+    assert len(campaign_index.get_experiment_directories()) == 3
+    assert len(campaign_index.get_repetition_directories()) == 7
+    assert len(campaign_index.get_repetition_directories(os.path.join(directory, 'group_b'))) == 3
+
+    # both calculators can use the same index
+    exputils.calc_experiment_statistics([('sum', calc_sum)], load_repetition_data_file, directory, campaign_index=campaign_index)
+    exputils.calc_statistics_over_repetitions([('mean', calc_mean_over_repetitions)], load_repetition_data, directory, campaign_index=campaign_index)
+    assert os.path.isfile(os.path.join(directory, 'group_b', 'experiment_000000', 'repetition_000002', 'statistics', 'sum.npy'))
+    assert os.path.isfile(os.path.join(directory, 'group_b', 'experiment_000000', 'statistics', 'mean.npy'))
+
+    # the tree is not walked for a folder that is a repetition itself
+    def build_campaign_index(*args, **kwargs):
+        raise AssertionError('the campaign index is not needed')
+    monkeypatch.setattr(exputils.statisticcalculator, 'build_campaign_index', build_campaign_index)
+    exputils.calc_experiment_statistics([('min_max', calc_min_max)], load_repetition_data_file,
+                                        os.path.join(directory, 'group_b', 'experiment_000000', 'repetition_000000'))
+    assert os.path.isfile(os.path.join(directory, 'group_b', 'experiment_000000', 'repetition_000000', 'statistics', 'min_max.npz'))
+    monkeypatch.undo()
+
+    # a refresh lists only the folders that changed
+    campaign_index = exputils.build_campaign_index(directory, index_filepath=index_filepath)
+    os.makedirs(os.path.join(directory, 'group_b', 'experiment_000000', 'repetition_000003'))
+
+    listed_paths = []
+    original_scandir = os.scandir
+    def scandir(path):
+        listed_paths.append(path)
+        return original_scandir(path)
+    monkeypatch.setattr(os, 'scandir', scandir)
+
+    campaign_index = exputils.build_campaign_index(directory, index_filepath=index_filepath)
+
+    assert len(campaign_index.get_repetition_directories()) == 8
+    assert listed_paths == [os.path.join(directory, 'group_b', 'experiment_000000')]
+
+
+def load_data_none(experiment_folder):
+    return None
+
+
+def test_data_cache(tmpdir):
+
+    directory = os.path.join(tmpdir.strpath, 'experiments')
+    create_experiments(directory, n_experiments=1, n_repetitions=3)
+
+    load_data = exputils.statisticcalculator.DataCache(load_repetition_data_file, cache_directory=os.path.join(tmpdir.strpath, 'cache'))
+
+    exputils.calc_experiment_statistics([('sum', calc_sum)], load_data, directory)
+    assert (load_data.n_misses, load_data.n_hits) == (3, 0)
+
+    # a second pass with other statistics reuses the loaded data
+    exputils.calc_experiment_statistics([('min_max', calc_min_max)], load_data, directory)
+    assert (load_data.n_misses, load_data.n_hits) == (3, 3)
+
+    # changed data is loaded again
+    data_path = os.path.join(directory, 'experiment_000000', 'repetition_000000', 'data.npy')
+    np.save(data_path, np.zeros(5))
+    os.utime(data_path, ns=(0, 0))
+    exputils.calc_experiment_statistics([('sum', calc_sum)], load_data, directory, recalculate_statistics='outdated')
+    assert load_data.n_misses == 4
+    assert np.load(os.path.join(directory, 'experiment_000000', 'repetition_000000', 'statistics', 'sum.npy')) == 0
+
+    # a new cache reads the data from the disk
+    new_load_data = exputils.statisticcalculator.DataCache(load_repetition_data_file, cache_directory=os.path.join(tmpdir.strpath, 'cache'))
+    exputils.calc_experiment_statistics([('sum', calc_sum)], new_load_data, directory, recalculate_statistics=True)
+    assert (new_load_data.n_misses, new_load_data.n_disk_hits) == (0, 3)
+
+    # another loader does not read the data of the first loader from the shared cache directory
+    other_load_data = exputils.statisticcalculator.DataCache(load_data_none, cache_directory=os.path.join(tmpdir.strpath, 'cache'))
+    other_load_data(os.path.join(directory, 'experiment_000000'))
+    assert (other_load_data.n_misses, other_load_data.n_disk_hits) == (1, 0)
+
+    # loaded data that is None is also read from the disk
+    other_load_data = exputils.statisticcalculator.DataCache(load_data_none, cache_directory=os.path.join(tmpdir.strpath, 'cache'))
+    assert other_load_data(os.path.join(directory, 'experiment_000000')) is None
+    assert (other_load_data.n_misses, other_load_data.n_disk_hits) == (0, 1)
+
+    # corrupt cache files are loaded again
+    for filename in os.listdir(os.path.join(tmpdir.strpath, 'cache')):
+        with open(os.path.join(tmpdir.strpath, 'cache', filename), 'wb') as file:
+            file.write(b'\x80\x04corrupt')
+    corrupt_load_data = exputils.statisticcalculator.DataCache(load_repetition_data_file, cache_directory=os.path.join(tmpdir.strpath, 'cache'))
+    exputils.calc_experiment_statistics([('sum', calc_sum)], corrupt_load_data, directory, recalculate_statistics=True)
+    assert (corrupt_load_data.n_misses, corrupt_load_data.n_disk_hits) == (3, 0)
+
+    # the least recently used data is removed if the memory budget is exceeded
+    small_load_data = exputils.statisticcalculator.DataCache(load_repetition_data_file, max_bytes=2 * exputils.statisticcalculator.get_data_size(np.zeros(5, dtype=int)))
+    exputils.calc_experiment_statistics([('sum', calc_sum)], small_load_data, directory, recalculate_statistics=True)
+    assert len(small_load_data.entries) == 2
+    assert small_load_data.n_bytes <= small_load_data.max_bytes